@@ -0,0 +1,197 @@
+"""
+Batch elevation -> outflow conversion for many gages.
+
+    python batch_convert.py gages_manifest.json
+    python batch_convert.py gages_manifest.json --workers 4 --output-rule C="RES FLOW-OUT" E=IR-CENTURY
+
+The manifest is a JSON file:
+
+    {
+      "dss_file": "gages.dss",
+      "out_dss_file": "gages.dss",                      (optional, defaults to dss_file)
+      "output_rule": {"C": "RES FLOW-OUT", "E": "IR-CENTURY"},   (optional)
+      "gages": [
+        {"pathname": "/.../ELEVATION//IR-CENTURY/USGS/",
+         "workbook": "LAKE DISCHARGE CALCULATOR.xlsx", "sheet": "LAWTONKA DISCHARGE RATES"},
+        {"pathname": "...", "curve": "rating.csv", "elev_column": "Elevation (ft)", "value_column": "Q (CFS)",
+         "method": "linear", "output": "/explicit/output/pathname///IR-CENTURY//", "dense_step": 0.01}
+      ]
+    }
+
+Each gage is read and converted in its own worker process, which streams the converted windows to its own
+temporary DSS file, so a worker holds one window at a time and nothing big goes back through pickling.
+The output DSS file is only opened after every worker has finished (it is usually the same file the
+workers read, and DSS locking is single-user); the temporary records are then copied into it window by
+window and the temporary files removed.
+The D-part of a pathname is ignored, each record is converted over the range of the values stored in it.
+With "dense_step" (or --dense-step for every gage) the rating is compiled to a dense lookup table on that
+step, see dense_table.py, which is built once and kept in .curve_cache/ next to the manifest.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from pydsstools.heclib.dss import HecDss
+
+from dense_table import CACHE_DIR as DENSE_CACHE_DIR, compile_table
+from discharge_sheets import ELEV_COLUMN, Q_COLUMN, load_discharge_sheet
+from rating_table import RatingTable
+from stream_convert import delete_record, iter_converted, read_window, record_windows, with_part, write_irregular
+
+DEFAULT_OUTPUT_RULE = {"C": "RES FLOW-OUT", "E": "IR-CENTURY"}
+
+
+def output_pathname(elev_path, rule):
+    """Apply an output rule {part: value} to an ELEVATION pathname."""
+    out = elev_path
+    for part, value in rule.items():
+        out = with_part(out, part, value)
+    return out
+
+
+def load_rating(gage, base_dir="."):
+    """
+    Build the RatingTable for a manifest entry, from a discharge workbook sheet or a csv curve,
+    compiled to a DenseTable if the entry has a dense_step.
+    """
+    rating = _load_rating(gage, base_dir)
+    if gage.get("dense_step"):
+        rating = compile_table(rating, gage.get("method", "nearest"), gage["dense_step"],
+                               cache_dir=os.path.join(base_dir, DENSE_CACHE_DIR))
+    return rating
+
+
+def _load_rating(gage, base_dir):
+    if "workbook" in gage:
+        curve = load_discharge_sheet(os.path.join(base_dir, gage["workbook"]), gage["sheet"])
+        return RatingTable.from_dataframe(curve, ELEV_COLUMN, Q_COLUMN)
+    if "curve" in gage:
+        curve = pd.read_csv(os.path.join(base_dir, gage["curve"]))
+        return RatingTable.from_dataframe(curve, gage.get("elev_column", ELEV_COLUMN),
+                                          gage.get("value_column", Q_COLUMN))
+    raise ValueError(f"{gage['pathname']}: manifest entry needs either 'workbook' and 'sheet' or 'curve'")
+
+
+def load_manifest(path, output_rule=None, dense_step=None):
+    with open(path) as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    manifest["dss_file"] = os.path.join(base_dir, manifest["dss_file"])
+    manifest["out_dss_file"] = os.path.join(base_dir, manifest.get("out_dss_file", manifest["dss_file"]))
+    rule = output_rule or manifest.get("output_rule") or DEFAULT_OUTPUT_RULE
+    for gage in manifest["gages"]:
+        gage.setdefault("output", output_pathname(gage["pathname"], rule))
+        if dense_step:
+            gage["dense_step"] = dense_step
+        gage["base_dir"] = base_dir
+    return manifest
+
+
+def convert_gage(dss_file, gage, tmp_file, block_years=1):
+    """
+    Worker: read and convert one gage, writing each window to the output record in tmp_file
+    as soon as it is converted. Returns the number of values and the time spent.
+    """
+    start = time.perf_counter()
+    rating = load_rating(gage, gage.get("base_dir", "."))
+    n = 0
+    with HecDss.Open(dss_file) as dss, HecDss.Open(tmp_file) as tmp:
+        windows = record_windows(gage["pathname"], block_years=block_years, dss=dss)
+        for _, flows in iter_converted(dss, gage["pathname"], rating, windows, gage.get("method", "nearest")):
+            write_irregular(tmp, gage["output"], flows)
+            n += len(flows)
+    return {"pathname": gage["pathname"], "output": gage["output"], "tmp_file": tmp_file, "n": n,
+            "convert_s": time.perf_counter() - start}
+
+
+def copy_record(src, out, pathname, windows):
+    """Copy an irregular record from one open DSS file to another, one window at a time."""
+    delete_record(out, pathname)
+    for i, window in enumerate(windows):
+        series = read_window(src, pathname, *window, last=i == len(windows) - 1)
+        if len(series):
+            write_irregular(out, pathname, series)
+
+
+def run(manifest, workers=None, block_years=1, log=print):
+    """Convert every gage in the manifest, returns one timing report dict per gage."""
+    gages = manifest["gages"]
+    reports = []
+    results = []
+    # next to the output so the copies don't cross file systems
+    tmp_dir = tempfile.mkdtemp(prefix=".batch_convert-", dir=os.path.dirname(os.path.abspath(manifest["out_dss_file"])))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(convert_gage, manifest["dss_file"], gage, os.path.join(tmp_dir, f"gage{i}.dss"),
+                                   block_years): gage for i, gage in enumerate(gages)}
+            for future in as_completed(futures):
+                gage = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    log(f"FAILED {gage['pathname']}: {e}")
+                    reports.append({"pathname": gage["pathname"], "error": str(e)})
+
+        # every worker is done with the input, now the output file can be opened for writing
+        with HecDss.Open(manifest["out_dss_file"]) as out:
+            for result in results:
+                start = time.perf_counter()
+                with HecDss.Open(result["tmp_file"]) as tmp:
+                    # the windows of the converted values, none if the gage had no readings
+                    windows = record_windows(result["output"], block_years=block_years, dss=tmp) if result["n"] else []
+                    copy_record(tmp, out, result["output"], windows)
+                write_s = time.perf_counter() - start
+                total_s = result["convert_s"] + write_s
+                report = {"pathname": result["pathname"], "output": result["output"], "n": result["n"],
+                          "convert_s": round(result["convert_s"], 4), "write_s": round(write_s, 4),
+                          "values_per_s": round(result["n"] / total_s) if total_s > 0 else None}
+                reports.append(report)
+                log(f"{report['output']}: {report['n']} values, convert {report['convert_s']:.2f}s, "
+                    f"write {report['write_s']:.2f}s, {report['values_per_s']} values/s")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return reports
+
+
+def parse_rule(items):
+    rule = {}
+    for item in items:
+        part, _, value = item.partition("=")
+        if part.upper() not in "ABCDEF" or len(part) != 1:
+            raise argparse.ArgumentTypeError(f"bad output rule {item!r}, expected PART=value e.g. C=RES FLOW-OUT")
+        rule[part.upper()] = value
+    return rule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSON manifest of gages and rating curves")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("--block-years", type=int, default=1, help="years of data read per window")
+    parser.add_argument("--output-rule", nargs="+", default=None, metavar="PART=VALUE",
+                        help="pathname parts to replace for the output record, e.g. C=\"RES FLOW-OUT\" E=IR-CENTURY")
+    parser.add_argument("--dense-step", type=float, default=None,
+                        help="compile every rating to a dense lookup table on this elevation step, e.g. 0.01")
+    parser.add_argument("--report", default=None, help="write the per-gage timing report to this JSON file")
+    args = parser.parse_args()
+
+    rule = parse_rule(args.output_rule) if args.output_rule else None
+    manifest = load_manifest(args.manifest, rule, args.dense_step)
+    start = time.perf_counter()
+    reports = run(manifest, workers=args.workers, block_years=args.block_years)
+    elapsed = time.perf_counter() - start
+    n = sum(report.get("n", 0) for report in reports)
+    print(f"{len(reports)} gages, {n} values in {elapsed:.2f}s ({n / elapsed if elapsed else np.nan:.0f} values/s)")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"elapsed_s": elapsed, "gages": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark the vectorized RatingTable lookup against the original per-row get_flow_from_elevation loop.
+
+    python bench_rating_table.py
+    python bench_rating_table.py --sizes 1000 10000 600000 --legacy-max 10000
+
+If "LAKE DISCHARGE CALCULATOR.xlsx" is not available a synthetic gated-spillway rating table is used.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from rating_table import RatingTable
+
+
+# the original implementation from elev-q_to_flow.py, kept here as the reference for timing and results
+def legacy_get_flow_from_elevation(df, excel_df):
+    # create a new column for flow
+    df["Outflow (cfs)"] = np.nan
+    for i, row in df.iterrows():
+        elevation = row["value"]
+        # find the closest elevation in the excel dataframe
+        closest_elevation = excel_df["Elevation (ft NAVD88)"].iloc[(excel_df["Elevation (ft NAVD88)"] - elevation).abs().argsort()[:1]]
+        # get the corresponding flow value
+        flow_value = excel_df.loc[excel_df["Elevation (ft NAVD88)"] == closest_elevation.values[0], "Q (CFS)"].values[0]
+        df.at[i, "Outflow (cfs)"] = flow_value
+    return df
+
+
+def synthetic_rating(n=58, bottom=1343.35, top=1355.55):
+    # zero flow up to the gate sill, then a weir-like power curve above it
+    elevations = np.round(np.linspace(bottom, top, n), 3)
+    head = np.clip(elevations - elevations[1], 0, None)
+    q = np.round(300.0 * head ** 1.5, 2)
+    return pd.DataFrame({"Elevation (ft NAVD88)": elevations, "Q (CFS)": q})
+
+
+def load_rating(excel_file="LAKE DISCHARGE CALCULATOR.xlsx", sheet_name="LAWTONKA DISCHARGE RATES"):
+    try:
+        excel = pd.read_excel(excel_file, sheet_name=sheet_name)
+    except (FileNotFoundError, ImportError, ValueError):
+        return synthetic_rating()
+    excel = excel.iloc[13:, :10].iloc[:, [1, -1]]
+    excel.columns = ["Elevation (ft NAVD88)", "Q (CFS)"]
+    return excel
+
+
+def synthetic_elevations(n, rating, seed=0):
+    rng = np.random.default_rng(seed)
+    lo = float(pd.to_numeric(rating["Elevation (ft NAVD88)"]).min())
+    hi = float(pd.to_numeric(rating["Elevation (ft NAVD88)"]).max())
+    # a slow random walk over the table range, a little past both ends
+    walk = np.cumsum(rng.normal(0, 0.01, n))
+    span = walk.max() - walk.min() or 1.0
+    values = (lo - 0.5) + (walk - walk.min()) / span * (hi - lo + 1.0)
+    times = pd.date_range("2007-10-01", periods=n, freq="15min", tz="UTC")
+    return pd.DataFrame({"value": values}, index=times)
+
+
+def best_of(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 600_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000,
+                        help="largest series the legacy loop is timed on, larger sizes are extrapolated")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rating = load_rating()
+    table = RatingTable.from_dataframe(rating)
+    print(f"rating table: {table}")
+    print(f"{'n':>10} {'legacy (s)':>12} {'nearest (s)':>12} {'linear (s)':>12} {'loglog (s)':>12} {'speedup':>10}  match")
+
+    legacy_rate = None
+    for n in args.sizes:
+        df = synthetic_elevations(n, rating)
+        t_nearest = best_of(lambda: table.lookup(df["value"].to_numpy(), "nearest"), args.repeat)
+        t_linear = best_of(lambda: table.lookup(df["value"].to_numpy(), "linear"), args.repeat)
+        t_loglog = best_of(lambda: table.lookup(df["value"].to_numpy(), "loglog"), args.repeat)
+
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            legacy = legacy_get_flow_from_elevation(df.copy(), rating)["Outflow (cfs)"].to_numpy(dtype=np.float64)
+            t_legacy = time.perf_counter() - start
+            legacy_rate = t_legacy / n
+            match = "yes" if np.array_equal(legacy, table.lookup(df["value"].to_numpy())) else "NO"
+            legacy_text = f"{t_legacy:12.3f}"
+        else:
+            # the legacy loop is linear in n, so extrapolate from the largest size that was run
+            t_legacy = legacy_rate * n if legacy_rate else np.nan
+            match = "-"
+            legacy_text = f"{t_legacy:11.1f}*"
+        print(f"{n:>10} {legacy_text} {t_nearest:12.4f} {t_linear:12.4f} {t_loglog:12.4f} "
+              f"{t_legacy / t_nearest:10.0f}x  {match}")
+    print("* extrapolated from the largest legacy run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark storage_discharge.build_curve against the original create_storage_discharge_curve loop.
+
+    python bench_storage_discharge.py
+    python bench_storage_discharge.py --sizes 1000 100000 1000000 --legacy-max 2000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_rating_table import best_of, load_rating
+from rating_table import RatingTable
+from storage_discharge import build_curve, build_curves
+
+
+# the original implementation from elev-stor-q.py, kept here as the reference for timing and results
+def legacy_create_storage_discharge_curve(elev_storage_df, elev_discharge_df):
+    storage_discharge_list = []
+    for i, row in elev_storage_df.iterrows():
+        elevation = row["Elevation (ft)"]
+        storage = row["Storage (ac-ft)"]
+        closest_elevation = elev_discharge_df["Elevation (ft NAVD88)"].iloc[
+            (elev_discharge_df["Elevation (ft NAVD88)"] - elevation).abs().argsort()[:1]]
+        discharge_value = elev_discharge_df.loc[
+            elev_discharge_df["Elevation (ft NAVD88)"] == closest_elevation.values[0], "Q (CFS)"].values[0]
+        storage_discharge_list.append({"Storage (ac-ft)": storage, "Q (CFS)": discharge_value})
+    return pd.DataFrame(storage_discharge_list)
+
+
+def synthetic_survey(n, rating):
+    # a dense elevation-storage survey over the rating table's elevation range
+    elevations = pd.to_numeric(rating["Elevation (ft NAVD88)"])
+    elev = np.linspace(elevations.min() - 2.0, elevations.max(), n)
+    depth = elev - (elevations.min() - 40.0)
+    return pd.DataFrame({"Elevation (ft)": elev, "Storage (ac-ft)": np.round(15.0 * depth ** 2.2, 2)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=2_000,
+                        help="largest survey the legacy loop is timed on, larger sizes are extrapolated")
+    parser.add_argument("--reservoirs", type=int, default=20, help="reservoirs in the build_curves timing")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rating = load_rating()
+    print(f"{'n':>10} {'legacy (s)':>12} {'build (s)':>12} {'speedup':>10} {'x' + str(args.reservoirs) + ' (s)':>12}  match")
+    legacy_rate = None
+    for n in args.sizes:
+        survey = synthetic_survey(n, rating)
+        t_new = best_of(lambda: build_curve(survey, rating, decimals=None), args.repeat)
+        many = {f"reservoir {i}": (survey, rating) for i in range(args.reservoirs)}
+        t_many = best_of(lambda: build_curves(many), 1)
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            legacy = legacy_create_storage_discharge_curve(survey, rating)
+            t_legacy = time.perf_counter() - start
+            legacy_rate = t_legacy / n
+            # before the monotonic repair and thinning, the join gives exactly the legacy Q for every survey point
+            joined = RatingTable.from_dataframe(rating).lookup(survey["Elevation (ft)"].to_numpy())
+            match = "yes" if np.array_equal(legacy["Q (CFS)"].to_numpy(dtype=float), joined) else "NO"
+            legacy_text = f"{t_legacy:12.3f}"
+        else:
+            t_legacy = legacy_rate * n if legacy_rate else np.nan
+            legacy_text = f"{t_legacy:11.1f}*"
+            match = "-"
+        print(f"{n:>10} {legacy_text} {t_new:12.4f} {t_legacy / t_new:10.0f}x {t_many:12.3f}  {match}")
+    print("* extrapolated from the largest legacy run")
+
+
+if __name__ == "__main__":
+    main()
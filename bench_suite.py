@@ -0,0 +1,208 @@
+"""
+Benchmark suite for the curve and conversion hot paths, on synthetic data from synthetic_data.py.
+
+    python bench_suite.py                                    # sizes 1e3 .. 1e7, results to bench_results.json
+    python bench_suite.py --sizes 1000 100000 --output new.json --compare bench_results.json
+
+Benchmarks (size is the number of rows going through the step):
+
+    get_flow_from_elevation         elevation series -> outflow with RatingTable, as in elev-q_to_flow.py
+    create_storage_discharge_curve  storage_discharge.build_curve of an n point elevation-storage survey
+    extrapolate_elev_storage        elev_storage.extend_curve adding n points above the survey
+    parse_discharge_sheet           cleaning a raw n row discharge sheet (sizes up to the Excel row limit)
+    load_discharge_sheets           reading an n row workbook with openpyxl, then from the .npz cache
+                                    (only up to --excel-max, writing big workbooks is slow)
+    dss_write_irregular / dss_read  put_ts of an irregular record and reading it back in yearly windows,
+                                    recorded as skipped if pydsstools can't be used here
+
+The JSON has the machine, package versions and git commit next to the timings so runs from different
+versions can be compared with --compare, which prints the ratio per benchmark and size.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from bench_rating_table import best_of
+from discharge_sheets import load_discharge_sheets, parse_discharge_sheet
+from elev_storage import extend_curve
+from rating_table import RatingTable
+from storage_discharge import build_curve
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+EXCEL_ROW_LIMIT = 1_048_576
+
+
+def bench_get_flow_from_elevation(n, repeat):
+    elev, q = synthetic_data.rating_curve(1221)
+    rating_df = pd.DataFrame({"Elevation (ft NAVD88)": elev, "Q (CFS)": q})
+    df = synthetic_data.elevation_series(n).clean().to_pandas("value").to_frame()
+
+    def run():
+        rating = RatingTable.from_dataframe(rating_df, "Elevation (ft NAVD88)", "Q (CFS)")
+        df["Outflow (cfs)"] = rating.lookup(df["value"].to_numpy())
+
+    return {"get_flow_from_elevation": best_of(run, repeat)}
+
+
+def bench_create_storage_discharge_curve(n, repeat):
+    survey = synthetic_data.elev_storage_curve(n)
+    elev, q = synthetic_data.rating_curve(1221)
+    rating = pd.DataFrame({"Elevation (ft NAVD88)": elev, "Q (CFS)": q})
+    return {"create_storage_discharge_curve": best_of(lambda: build_curve(survey, rating), repeat)}
+
+
+def bench_extrapolate_elev_storage(n, repeat):
+    survey = synthetic_data.elev_storage_curve(200, top=synthetic_data.SILL)
+    step = 0.001
+    max_elev = survey["Elevation (ft)"].iloc[-1] + n * step
+    return {"extrapolate_elev_storage": best_of(lambda: extend_curve(survey, max_elev, step), repeat)}
+
+
+def bench_parse_discharge_sheet(n, repeat):
+    if n > EXCEL_ROW_LIMIT:
+        return {"parse_discharge_sheet": None}
+    raw = synthetic_data.discharge_sheet(n)
+    return {"parse_discharge_sheet": best_of(lambda: parse_discharge_sheet(raw, "SYNTHETIC"), repeat)}
+
+
+def bench_load_discharge_sheets(n, repeat, excel_max):
+    if n > excel_max:
+        return {"load_discharge_sheets": None, "load_discharge_sheets_cached": None}
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook = synthetic_data.write_discharge_workbook(os.path.join(tmp, "synthetic.xlsx"),
+                                                           {"SYNTHETIC DISCHARGE RATES": n})
+        cache_dir = os.path.join(tmp, ".curve_cache")
+        cold = best_of(lambda: load_discharge_sheets(workbook, cache_dir, refresh=True), repeat)
+        warm = best_of(lambda: load_discharge_sheets(workbook, cache_dir), repeat)
+    return {"load_discharge_sheets": cold, "load_discharge_sheets_cached": warm}
+
+
+def bench_dss(n, repeat):
+    names = ("dss_write_irregular", "dss_read")
+    try:
+        from pydsstools.heclib.dss import HecDss
+        from stream_convert import delete_record, read_window, write_irregular, yearly_windows
+    except ImportError as e:
+        return {name: {"skipped": f"pydsstools not available: {e}"} for name in names}
+
+    series = synthetic_data.elevation_series(n)
+    start = series.datetimes[0].astype(object)
+    end = series.datetimes[-1].astype(object)
+    windows = yearly_windows(datetime(start.year, 1, 1), end)
+    pathname = "/SYNTHETIC/00000000/ELEVATION//IR-CENTURY/BENCH/"
+    with tempfile.TemporaryDirectory() as tmp:
+        dss_file = os.path.join(tmp, "bench.dss")
+        try:
+            with HecDss.Open(dss_file) as dss:
+                def write():
+                    delete_record(dss, pathname)
+                    write_irregular(dss, pathname, series, units="ft")
+
+                def read():
+                    for i, window in enumerate(windows):
+                        read_window(dss, pathname, *window, last=i == len(windows) - 1)
+
+                return {"dss_write_irregular": best_of(write, repeat), "dss_read": best_of(read, repeat)}
+        except Exception as e:
+            # e.g. a pydsstools version with a different API than the one these scripts are written for
+            return {name: {"skipped": f"{type(e).__name__}: {e}"} for name in names}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(sizes=SIZES, repeat=3, excel_max=10_000, dss=True, log=print):
+    """Returns {"meta": {...}, "results": [{"benchmark", "size", "seconds", "rows_per_s"}, ...]}."""
+    results = []
+    for n in sizes:
+        timings = {}
+        timings.update(bench_get_flow_from_elevation(n, repeat))
+        timings.update(bench_create_storage_discharge_curve(n, repeat))
+        timings.update(bench_extrapolate_elev_storage(n, repeat))
+        timings.update(bench_parse_discharge_sheet(n, repeat))
+        timings.update(bench_load_discharge_sheets(n, repeat, excel_max))
+        if dss:
+            timings.update(bench_dss(n, repeat))
+        for name, seconds in timings.items():
+            if seconds is None:
+                continue
+            row = {"benchmark": name, "size": n}
+            if isinstance(seconds, dict):
+                row.update(seconds)
+            else:
+                row.update(seconds=seconds, rows_per_s=n / seconds if seconds > 0 else None)
+            results.append(row)
+            if log:
+                timing = row.get("skipped") or f"{row['seconds']:10.4f}s {row['rows_per_s']:14,.0f} rows/s"
+                log(f"{name:>32} {n:>10}  {timing}")
+
+    meta = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(new, baseline):
+    """Rows of (benchmark, size, baseline s, new s, new / baseline) for the timings present in both runs."""
+    old = {(r["benchmark"], r["size"]): r.get("seconds") for r in baseline["results"]}
+    rows = []
+    for r in new["results"]:
+        before = old.get((r["benchmark"], r["size"]))
+        if before and r.get("seconds"):
+            rows.append((r["benchmark"], r["size"], before, r["seconds"], r["seconds"] / before))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--excel-max", type=int, default=10_000, help="largest workbook written and read")
+    parser.add_argument("--no-dss", action="store_true", help="skip the DSS read/write benchmarks")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="an earlier results json to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="with --compare, exit with status 1 if anything got slower than this ratio")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.repeat, args.excel_max, dss=not args.no_dss)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"compared to {args.compare} (commit {baseline['meta'].get('commit')}):")
+        slower = 0
+        for name, n, before, after, ratio in compare(report, baseline):
+            flag = "  SLOWER" if ratio > args.tolerance else ""
+            slower += bool(flag)
+            print(f"{name:>32} {n:>10} {before:10.4f}s -> {after:10.4f}s {ratio:6.2f}x{flag}")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
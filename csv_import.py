@@ -0,0 +1,130 @@
+"""
+Incremental import of USGS gage CSVs into DSS.
+
+    python csv_import.py gages.dss "07309500 - Lake Lawtonka near Lawton, OK.csv" [more.csv ...]
+
+Each CSV is read in chunks. The last timestamp already stored in the target record is looked up first
+and only newer readings are written, appended chunk by chunk, so a daily refresh only costs the new data.
+Timestamps repeated in the CSV are written once. Rows don't have to be in time order: a reading that
+turns up after later ones were written is merged into the record unless its time is already stored.
+The target pathname is built from the file name "<site number> - <site name>.csv" as
+/<site name>/<site number>/ELEVATION//IR-CENTURY/USGS/ unless --pathname is given.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dss_catalog import DssCatalog
+from gage_series import GageSeries
+from stream_convert import read_window, with_part
+
+TIME_COLUMN = "datetime"
+VALUE_COLUMN = "Gage height, feet"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S+00:00"
+
+
+def csv_pathname(csv_file, parameter="ELEVATION", interval="IR-CENTURY", source="USGS"):
+    """DSS pathname for a "<site number> - <site name>.csv" file."""
+    stem = os.path.splitext(os.path.basename(csv_file))[0]
+    site, sep, name = stem.partition(" - ")
+    if not sep:
+        raise ValueError(f"can't get the site number and name from {csv_file!r}, give the pathname explicitly")
+    return f"/{name.strip()}/{site.strip()}/{parameter}//{interval}/{source}/"
+
+
+def last_stored_time(dss, pathname):
+    """
+    Epoch seconds of the last value in the record, None if it has no data.
+    Only the last block in the record's D-parts is decoded (the one before it if that is empty, and so on).
+    """
+    blocks = dss.getPathnameList(with_part(pathname, "D", "*"))
+    if not blocks:
+        return None
+    return DssCatalog(blocks).last_time(dss, pathname)
+
+
+def unstored(dss, pathname, series):
+    """The readings of a sorted series whose times aren't in the record yet."""
+    epoch = datetime(1970, 1, 1)
+    stored = read_window(dss, pathname, epoch + timedelta(seconds=int(series.times[0])),
+                         epoch + timedelta(seconds=int(series.times[-1])), last=True)
+    new = ~np.isin(series.times, stored.times)
+    return GageSeries(series.times[new], series.values[new])
+
+
+def read_chunks(csv_file, chunksize=100_000, time_column=TIME_COLUMN, value_column=VALUE_COLUMN,
+                time_format=TIME_FORMAT):
+    """Yield the CSV as GageSeries chunks."""
+    for chunk in pd.read_csv(csv_file, usecols=[time_column, value_column], chunksize=chunksize):
+        times = pd.to_datetime(chunk[time_column], format=time_format).to_numpy(dtype="datetime64[s]")
+        values = pd.to_numeric(chunk[value_column], errors="coerce").to_numpy(dtype=np.float32)
+        yield GageSeries.from_datetime64(times, values)
+
+
+def import_csv(dss, csv_file, pathname, units="feet", chunksize=100_000, log=print, **csv_options):
+    """
+    Append the readings of csv_file newer than the last value stored at pathname before the import.
+    Readings older than what an earlier chunk already wrote are merged in if their time isn't stored yet.
+    Returns (values written, values skipped).
+    """
+    stored = last = last_stored_time(dss, pathname)
+    written = skipped = merged = 0
+    for chunk in read_chunks(csv_file, chunksize, **csv_options):
+        chunk = chunk.clean()
+        # stable sort, then keep the first of any repeated timestamp and only what is newer than the record
+        order = np.argsort(chunk.times, kind="stable")
+        times, values = chunk.times[order], chunk.values[order]
+        keep = np.concatenate(([True], np.diff(times) > 0)) if len(times) else np.zeros(0, dtype=bool)
+        if stored is not None:
+            keep &= times > stored
+        # rows that go back behind what this import has written, the record decides if they are repeats
+        late = keep & (times <= last) if last is not None else np.zeros(len(times), dtype=bool)
+        new = GageSeries(times[keep & ~late], values[keep & ~late])
+        if late.any():
+            behind = unstored(dss, pathname, GageSeries(times[late], values[late]))
+            merged += len(behind)
+            new = GageSeries(np.concatenate((behind.times, new.times)), np.concatenate((behind.values, new.values)))
+        skipped += len(times) - len(new)
+        if not len(new):
+            continue
+        dss.put_ts(new.to_container(pathname, units=units, data_type="INST"))
+        written += len(new)
+        last = max(last, int(new.times[-1])) if last is not None else int(new.times[-1])
+    if log:
+        log(f"{os.path.basename(csv_file)} -> {pathname}: {written} new values"
+            + (f" ({merged} out of time order)" if merged else "") + f", {skipped} already stored or repeated")
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dss_file")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--pathname", default=None, help="target pathname (only with a single csv)")
+    parser.add_argument("--parameter", default="ELEVATION", help="C-part of the target pathname")
+    parser.add_argument("--column", default=VALUE_COLUMN, help="value column in the csv")
+    parser.add_argument("--units", default="feet")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+    if args.pathname and len(args.csv_files) > 1:
+        parser.error("--pathname can only be used with a single csv file")
+
+    from pydsstools.heclib.dss import HecDss
+
+    start = time.perf_counter()
+    total = 0
+    with HecDss.Open(args.dss_file) as dss:
+        for csv_file in args.csv_files:
+            pathname = args.pathname or csv_pathname(csv_file, parameter=args.parameter)
+            written, _ = import_csv(dss, csv_file, pathname, units=args.units, chunksize=args.chunksize,
+                                    value_column=args.column)
+            total += written
+    print(f"{len(args.csv_files)} files, {total} new values in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
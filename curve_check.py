@@ -0,0 +1,338 @@
+"""
+Validation and repair of the curves that go into HMS: elevation-storage, elevation-discharge and
+storage-discharge.
+
+check_curves runs every check on all curves at once. The curves are concatenated into flat arrays with
+a curve id per point, so a survey of thousands of points costs a few array passes, not a Python loop.
+Each curve gets:
+
+    points, nan_rows                        rows and rows with a missing x or y
+    x_decreasing, duplicate_knots           x steps that go down / repeat, conflicting_duplicates is the
+                                            number of repeated x values with more than one distinct y
+    y_decreasing, max_y_drop                y steps that go down with x (storage and Q must not)
+    plateau_points                          interior points of flat y runs
+    max_dx, max_dy_fraction                 the widest x gap and the biggest single y jump as a fraction
+                                            of the y range, e.g. a sparse discharge table
+    covers                                  whether the curve covers a required x range, e.g. the
+                                            elevation-storage curve against the discharge table elevations
+
+repair_curve applies repair strategies in order:
+
+    dropna      drop rows with a missing x or y
+    dedupe      one knot per x: keep="mean" (the default) averages the rows of a repeated x, "first" is the
+                original drop_duplicates and "last" the other end. The action counts the "conflicting"
+                x values that had more than one distinct y, which "first" and "last" throw away
+    isotonic    least-squares non-decreasing fit of y (pool adjacent violators) instead of clipping, after
+                "mean" each knot is weighted by the number of rows it stands for
+    interpolate insert linearly interpolated knots so no x gap is wider than max_dx
+    thin        drop knots while the curve stays within max_error of the original (linear interpolation),
+                down to max_points if given, e.g. the number of points HMS should get
+
+    python curve_check.py Ellsworth_Elev-Stor_Curve.csv Lawtonka_Elev-Stor_Curve.csv --report curve_diagnostics.json
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ("dropna", "dedupe", "isotonic", "interpolate", "thin")
+
+
+def _segment_max(ids, values, k, empty=0.0):
+    out = np.full(k, empty, dtype=np.float64)
+    np.maximum.at(out, ids, values)
+    return out
+
+
+def check_curves(curves, required=None, max_gap=None, max_jump=0.25):
+    """
+    Diagnostics for {name: (x, y)} (or {name: dataframe} using its first two columns).
+    required is {name: (x_min, x_max)} the curve has to cover. A curve is flagged for a gap when
+    an x step is wider than max_gap (if given) or one y step is more than max_jump of the y range.
+    Returns {name: diagnostics dict}, JSON serializable.
+    """
+    names = list(curves)
+    xs, ys = [], []
+    for name in names:
+        curve = curves[name]
+        if isinstance(curve, pd.DataFrame):
+            curve = (curve.iloc[:, 0], curve.iloc[:, 1])
+        xs.append(np.asarray(curve[0], dtype=np.float64))
+        ys.append(np.asarray(curve[1], dtype=np.float64))
+    k = len(names)
+    lengths = np.array([len(x) for x in xs], dtype=np.intp)
+    ids = np.repeat(np.arange(k), lengths)
+    x = np.concatenate(xs) if k else np.empty(0)
+    y = np.concatenate(ys) if k else np.empty(0)
+
+    nan = np.isnan(x) | np.isnan(y)
+    nan_rows = np.bincount(ids[nan], minlength=k)
+    ids, x, y = ids[~nan], x[~nan], y[~nan]
+    points = np.bincount(ids, minlength=k)
+
+    # steps within a curve only
+    same = ids[1:] == ids[:-1]
+    step_ids = ids[1:][same]
+    dx = np.diff(x)[same]
+    dy = np.diff(y)[same]
+    count = lambda mask: np.bincount(step_ids[mask], minlength=k)
+
+    x_min = _segment_max(ids, -x, k, -np.inf) * -1
+    x_max = _segment_max(ids, x, k, -np.inf)
+    y_min = _segment_max(ids, -y, k, -np.inf) * -1
+    y_max = _segment_max(ids, y, k, -np.inf)
+    y_range = np.where(y_max > y_min, y_max - y_min, 1.0)
+    rising = dx > 0
+    # runs of the same x as groups, to count x values with conflicting y once
+    group = np.cumsum(np.concatenate(([True], (dx[1:] != 0) | (step_ids[1:] != step_ids[:-1]))))[:len(dx)]
+    conflict = (dx == 0) & (dy != 0)
+    _, first_conflict = np.unique(group[conflict], return_index=True)
+    flat_before = np.concatenate(([False], (dy[:-1] == 0) & rising[:-1] & (step_ids[1:] == step_ids[:-1])))
+
+    stats = {
+        "points": points,
+        "nan_rows": nan_rows,
+        "x_decreasing": count(dx < 0),
+        "duplicate_knots": count(dx == 0),
+        "conflicting_duplicates": np.bincount(step_ids[conflict][first_conflict], minlength=k),
+        "y_decreasing": count(rising & (dy < 0)),
+        "max_y_drop": _segment_max(step_ids, np.where(rising, -dy, 0.0), k),
+        "plateau_points": count(flat_before & (dy == 0) & rising),
+        "max_dx": _segment_max(step_ids, dx, k),
+        "max_dy_fraction": _segment_max(step_ids, np.where(rising, dy, 0.0), k) / y_range,
+    }
+
+    report = {}
+    for i, name in enumerate(names):
+        d = {key: (int(values[i]) if values.dtype.kind in "iu" else float(values[i])) for key, values in stats.items()}
+        if points[i]:
+            d.update(x_min=float(x_min[i]), x_max=float(x_max[i]), y_min=float(y_min[i]), y_max=float(y_max[i]))
+        issues = []
+        if points[i] < 2:
+            issues.append("too_few_points")
+        if d["nan_rows"]:
+            issues.append("missing_values")
+        if d["x_decreasing"]:
+            issues.append("x_not_increasing")
+        if d["duplicate_knots"]:
+            issues.append("duplicate_knots")
+        if d["y_decreasing"]:
+            issues.append("y_not_monotonic")
+        if (max_gap is not None and d["max_dx"] > max_gap) or d["max_dy_fraction"] > max_jump:
+            issues.append("gap")
+        if required and name in required and points[i]:
+            lo, hi = required[name]
+            d["covers"] = bool(x_min[i] <= lo and x_max[i] >= hi)
+            d["required_range"] = [float(lo), float(hi)]
+            if not d["covers"]:
+                issues.append("range_not_covered")
+        d["issues"] = issues
+        d["ok"] = not issues
+        report[name] = d
+    return report
+
+
+def dedupe(x, y, keep="mean", counts=False):
+    """
+    One knot per x value, x sorted (stable so "first" is the first row in the source).
+    With counts=True also returns the number of rows behind each knot and the number of x values
+    that had conflicting y values.
+    """
+    if keep not in ("first", "last", "mean"):
+        raise ValueError(f"keep must be 'first', 'last' or 'mean', got {keep!r}")
+    if len(x) == 0:
+        return (x, y) if not counts else (x, y, np.zeros(0, dtype=np.intp), 0)
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    starts = np.flatnonzero(np.concatenate(([True], x[1:] != x[:-1])))
+    sizes = np.diff(np.append(starts, len(x)))
+    if keep == "first":
+        out = y[starts]
+    elif keep == "last":
+        out = y[starts + sizes - 1]
+    else:
+        out = np.add.reduceat(y, starts) / sizes
+    if not counts:
+        return x[starts], out
+    conflicting = int(np.count_nonzero(np.maximum.reduceat(y, starts) != np.minimum.reduceat(y, starts)))
+    return x[starts], out, sizes, conflicting
+
+
+def isotonic(y, weights=None):
+    """
+    Non-decreasing least-squares fit of y (pool adjacent violators). Unlike a running max, a dip is
+    averaged with the points around it instead of raising everything after it to the peak.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    w = np.ones_like(y) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(y) < 2 or np.all(np.diff(y) >= 0):
+        return y.copy()
+    # blocks as (mean, weight, count) stacks, merged while the last two are out of order
+    means = np.empty(len(y))
+    block_w = np.empty(len(y))
+    counts = np.empty(len(y), dtype=np.intp)
+    top = -1
+    for value, weight in zip(y.tolist(), w.tolist()):
+        top += 1
+        means[top], block_w[top], counts[top] = value, weight, 1
+        while top > 0 and means[top - 1] > means[top]:
+            total = block_w[top - 1] + block_w[top]
+            means[top - 1] = (means[top - 1] * block_w[top - 1] + means[top] * block_w[top]) / total
+            block_w[top - 1] = total
+            counts[top - 1] += counts[top]
+            top -= 1
+    return np.repeat(means[:top + 1], counts[:top + 1])
+
+
+def fill_gaps(x, y, max_dx):
+    """Insert linearly interpolated knots so no step in x is wider than max_dx."""
+    if len(x) < 2:
+        return x, y
+    pieces = np.maximum(np.ceil(np.diff(x) / max_dx - 1e-9).astype(np.intp), 1)
+    if np.all(pieces == 1):
+        return x, y
+    # every step split into `pieces` equal parts, then the last point
+    seg = np.repeat(np.arange(len(x) - 1), pieces)
+    frac = (np.arange(len(seg)) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / np.repeat(pieces, pieces)
+    new_x = np.append(x[seg] + frac * (x[seg + 1] - x[seg]), x[-1])
+    return new_x, np.interp(new_x, x, y)
+
+
+def collinear(x, y):
+    """Mask of the interior points that lie on the line through their two neighbours."""
+    mask = np.zeros(len(x), dtype=bool)
+    cross = (x[1:-1] - x[:-2]) * (y[2:] - y[:-2]) - (x[2:] - x[:-2]) * (y[1:-1] - y[:-2])
+    mask[1:-1] = cross == 0
+    return mask
+
+
+def thin(x, y, max_error=0.0, max_points=None):
+    """
+    Drop knots while linear interpolation through the rest stays within max_error of every original
+    point, keeping at most max_points knots. Returns (mask of kept knots, max error of the thinned curve).
+
+    max_error=0 only drops collinear points, found in one vectorized pass. Otherwise the curve is split
+    Douglas-Peucker style: each round every segment whose worst point is off by more than max_error is
+    split at that point, all segments at once, so a round is a few array passes over the curve. When a
+    round would go past max_points only the worst splits are made.
+    """
+    n = len(x)
+    if n <= 2:
+        return np.ones(n, dtype=bool), 0.0
+    limit = n if max_points is None else max(2, max_points)
+    if max_error == 0:
+        keep = ~collinear(x, y)
+        if np.count_nonzero(keep) <= limit:
+            return keep, float(np.abs(np.interp(x, x[keep], y[keep]) - y).max())
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    while True:
+        knots = np.flatnonzero(keep)
+        error = np.abs(np.interp(x, x[knots], y[knots]) - y)
+        worst = float(error.max())
+        room = limit - len(knots)
+        if worst <= max_error or room <= 0:
+            return keep, worst
+        # worst point of every segment [knots[i], knots[i + 1])
+        segment_worst = np.maximum.reduceat(error[:-1], knots[:-1])
+        segment = np.repeat(np.arange(len(knots) - 1), np.diff(knots))
+        candidates = np.flatnonzero((error[:-1] == segment_worst[segment]) & (error[:-1] > max_error))
+        _, first = np.unique(segment[candidates], return_index=True)
+        split = candidates[first]
+        if len(split) > room:
+            split = split[np.argsort(-error[split], kind="stable")[:room]]
+        keep[split] = True
+
+
+def repair_curve(x, y, strategies=("dropna", "dedupe", "isotonic"), keep="mean", max_dx=None, max_error=0.0,
+                 max_points=None):
+    """
+    Apply the repair strategies in order. Returns (x, y, actions) where actions is a list of
+    {"strategy", ...counts} dicts for the report.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    actions = []
+    # rows behind each knot, set by dedupe with keep="mean" for isotonic
+    weights = None
+    for strategy in strategies:
+        before = len(x)
+        if strategy != "isotonic":
+            weights = None
+        if strategy == "dropna":
+            ok = ~(np.isnan(x) | np.isnan(y))
+            x, y = x[ok], y[ok]
+            actions.append({"strategy": strategy, "removed": before - len(x)})
+        elif strategy == "dedupe":
+            x, y, sizes, conflicting = dedupe(x, y, keep, counts=True)
+            if keep == "mean":
+                weights = sizes.astype(np.float64)
+            actions.append({"strategy": strategy, "keep": keep, "removed": before - len(x), "conflicting": conflicting})
+        elif strategy == "isotonic":
+            fitted = isotonic(y, weights)
+            changed = fitted != y
+            actions.append({"strategy": strategy, "changed": int(changed.sum()),
+                            "max_change": float(np.abs(fitted - y).max(initial=0.0))})
+            y = fitted
+        elif strategy == "interpolate":
+            if max_dx is None:
+                raise ValueError("the interpolate strategy needs max_dx")
+            x, y = fill_gaps(x, y, max_dx)
+            actions.append({"strategy": strategy, "max_dx": max_dx, "added": len(x) - before})
+        elif strategy == "thin":
+            kept, error = thin(x, y, max_error, max_points)
+            x, y = x[kept], y[kept]
+            actions.append({"strategy": strategy, "removed": before - len(x), "max_error": error,
+                            "within_tolerance": error <= max_error})
+        else:
+            raise ValueError(f"unknown strategy {strategy!r}, expected one of {STRATEGIES}")
+    return x, y, actions
+
+
+def repair_dataframe(df, x_col, y_col, **kwargs):
+    """repair_curve on two dataframe columns, returns (repaired dataframe, actions)."""
+    x, y, actions = repair_curve(df[x_col].to_numpy(), df[y_col].to_numpy(), **kwargs)
+    return pd.DataFrame({x_col: x, y_col: y}), actions
+
+
+def write_report(path, diagnostics, repairs=None):
+    with open(path, "w") as f:
+        json.dump({"curves": diagnostics, "repairs": repairs or {}}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("curves", nargs="+", help="csv files, the first two columns are x and y")
+    parser.add_argument("--max-gap", type=float, default=None, help="flag x steps wider than this")
+    parser.add_argument("--max-jump", type=float, default=0.25, help="flag y steps bigger than this fraction of the range")
+    parser.add_argument("--repair", nargs="*", choices=STRATEGIES, default=None,
+                        help="repair strategies to apply in order, the repaired curve is written next to the input")
+    parser.add_argument("--keep", choices=("first", "last", "mean"), default="mean",
+                        help="value kept for a repeated x by 'dedupe'")
+    parser.add_argument("--max-dx", type=float, default=None, help="widest x step after 'interpolate'")
+    parser.add_argument("--max-error", type=float, default=0.0, help="largest y error allowed by 'thin'")
+    parser.add_argument("--max-points", type=int, default=None, help="most knots left by 'thin'")
+    parser.add_argument("--report", default="curve_diagnostics.json")
+    args = parser.parse_args()
+
+    frames = {path: pd.read_csv(path).iloc[:, :2] for path in args.curves}
+    diagnostics = check_curves(frames, max_gap=args.max_gap, max_jump=args.max_jump)
+    repairs = {}
+    if args.repair:
+        for path, df in frames.items():
+            x_col, y_col = df.columns
+            repaired, repairs[path] = repair_dataframe(df, x_col, y_col, strategies=args.repair, keep=args.keep,
+                                                       max_dx=args.max_dx, max_error=args.max_error,
+                                                       max_points=args.max_points)
+            out = path[:-4] + "_repaired.csv" if path.lower().endswith(".csv") else path + "_repaired.csv"
+            repaired.to_csv(out, index=False)
+            print(f"{path}: {len(df)} -> {len(repaired)} points, written to {out}")
+    for path, d in diagnostics.items():
+        print(f"{path}: {d['points']} points, " + ("ok" if d["ok"] else "issues: " + ", ".join(d["issues"])))
+    write_report(args.report, diagnostics, repairs)
+
+
+if __name__ == "__main__":
+    main()
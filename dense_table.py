@@ -0,0 +1,229 @@
+"""
+Dense uniform-step lookup tables compiled from a RatingTable.
+
+The discharge sheets and the elevation-storage curves sit on regular 0.01 - 0.1 ft grids over a narrow
+band, so a curve can be evaluated once on a uniform grid and every later lookup is a single index
+
+    index = round((elevation - start) / step)
+
+with no search at all. The grid is aligned to multiples of the step, so elevations recorded at that
+resolution (USGS gage heights are to 0.01 ft, the default step) land exactly on grid points.
+
+compile_table checks the compiled table against the source curve before it is used:
+
+    nearest         the cells that hold a knot midpoint are marked, and readings that land in one are
+                    resolved by the RatingTable itself, so every reading (float32 from DSS or float64) gets
+                    exactly the knot RatingTable.lookup would pick. The table is compared with the
+                    RatingTable on the float64 and float32 grid points, the cell edges and both sides of
+                    every midpoint, and any difference raises DenseTableError.
+    linear, loglog  the error is measured at every cell edge, knot and knot midpoint, where the largest
+                    difference inside a cell can be, and the step is halved until it is within
+                    `tolerance` (or DenseTableError is raised).
+
+Compiled tables are saved in .curve_cache/ next to the discharge sheet cache, keyed on a hash of the
+curve, method and step, so they are only built once.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from rating_table import METHODS, RatingTable
+
+CACHE_DIR = ".curve_cache"
+DEFAULT_STEP = 0.01
+MAX_POINTS = 50_000_000
+DECIMALS = 9
+
+
+class DenseTableError(ValueError):
+    pass
+
+
+class DenseTable:
+    """
+    Values of a curve at start + i * step, looked up by rounding. Elevations outside are clamped.
+    For nearest tables `rating` is the source RatingTable and `ambiguous` marks the cells with a knot
+    midpoint in them, which are looked up in the rating instead.
+    """
+
+    def __init__(self, start, step, values, method="nearest", max_error=0.0, rating=None, ambiguous=None):
+        self.start = float(start)
+        self.step = float(step)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.method = method
+        self.max_error = float(max_error)
+        self.rating = rating
+        self.ambiguous = None if ambiguous is None else np.asarray(ambiguous, dtype=bool)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return (f"DenseTable({len(self)} points, elevation {self.start:g} - {self.stop:g} step {self.step:g}, "
+                f"{self.method}, max error {self.max_error:g})")
+
+    @property
+    def stop(self):
+        return self.start + (len(self.values) - 1) * self.step
+
+    def index(self, elevations):
+        """Grid index of each elevation, clamped to the table. NaN elevations give a meaningless index."""
+        x = np.asarray(elevations, dtype=np.float64)
+        # in place so a big array only costs one temporary
+        idx = np.subtract(x, self.start)
+        np.divide(idx, self.step, out=idx)
+        np.rint(idx, out=idx)
+        np.clip(idx, 0, len(self.values) - 1, out=idx)
+        with np.errstate(invalid="ignore"):
+            return idx.astype(np.intp)
+
+    def lookup(self, elevations, method=None):
+        """Same interface as RatingTable.lookup, method has to be the one the table was compiled with."""
+        if method is not None and method != self.method:
+            raise ValueError(f"table was compiled for method {self.method!r}, not {method!r}")
+        x = np.asarray(elevations, dtype=np.float64)
+        idx = self.index(x)
+        # mode="clip" only matters for the NaN elevations, which are set back to NaN below
+        out = self.values.take(idx, mode="clip")
+        if self.ambiguous is not None:
+            near_midpoint = self.ambiguous.take(idx, mode="clip")
+            if near_midpoint.any():
+                out[near_midpoint] = self.rating.lookup(x[near_midpoint], self.method)
+        nan = np.isnan(x)
+        if nan.any():
+            out[nan] = np.nan
+        return out
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # unique per process, batch_convert workers may compile the same table at once
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        extra = {}
+        if self.ambiguous is not None:
+            extra = {"ambiguous": self.ambiguous, "knots": self.rating.elevations, "knot_values": self.rating.values,
+                     "datum": self.rating.datum}
+        np.savez(tmp, start=self.start, step=self.step, values=self.values, method=np.str_(self.method),
+                 max_error=self.max_error, **extra)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            rating = ambiguous = None
+            if "ambiguous" in npz:
+                rating = RatingTable(npz["knots"], npz["knot_values"], float(npz["datum"]))
+                ambiguous = npz["ambiguous"]
+            return cls(float(npz["start"]), float(npz["step"]), npz["values"], str(npz["method"]),
+                       float(npz["max_error"]), rating, ambiguous)
+
+
+def check_points(rating, start, step, n):
+    """Cell edges (from inside), knots and knot midpoints (both sides), where the error peaks."""
+    grid = start + step * np.arange(n)
+    inside = 0.5 * step * (1 - 1e-9)
+    knots = rating.elevations
+    mid = 0.5 * (knots[1:] + knots[:-1])
+    eps = 1e-9 * max(1.0, abs(knots[-1]))
+    return np.concatenate((grid - inside, grid + inside, knots, mid - eps, mid + eps))
+
+
+def max_error(table, rating):
+    x = check_points(rating, table.start, table.step, len(table))
+    if table.method == "nearest":
+        # the whole range and the float32 readings DSS returns, nearest has to match everywhere
+        grid = table.start + table.step * np.arange(len(table))
+        mid = 0.5 * (rating.elevations[1:] + rating.elevations[:-1])
+        x = np.concatenate((x, grid.astype(np.float32).astype(np.float64), mid, mid.astype(np.float32)))
+    else:
+        x = x[(x >= rating.elevations[0]) & (x <= rating.elevations[-1])]
+    return float(np.max(np.abs(table.lookup(x) - rating.lookup(x, table.method)), initial=0.0))
+
+
+def ambiguous_cells(table, rating):
+    """
+    Cells that hold a knot midpoint. index() never decreases with the elevation, so every reading in any
+    other cell has the same knots below and above it as the cell's grid point and the same nearest knot.
+    """
+    mid = 0.5 * (rating.elevations[1:] + rating.elevations[:-1])
+    ambiguous = np.zeros(len(table), dtype=bool)
+    ambiguous[table.index(mid)] = True
+    return ambiguous
+
+
+def table_grid(rating, step):
+    """Multiples of step covering the knots, the first at or below the bottom knot and the last at or above the top."""
+    first = np.floor(rating.elevations[0] / step + 1e-9)
+    last = np.ceil(rating.elevations[-1] / step - 1e-9)
+    n = int(last - first) + 1
+    if n > MAX_POINTS:
+        raise DenseTableError(f"a step of {step:g} needs {n} points, more than {MAX_POINTS}")
+    return np.round((first + np.arange(n)) * step, DECIMALS)
+
+
+def build_table(rating, step, method="nearest"):
+    grid = table_grid(rating, step)
+    table = DenseTable(grid[0], step, rating.lookup(grid, method), method)
+    # the grid points themselves, indexed the way a reading would be
+    if not np.array_equal(table.index(grid), np.arange(len(grid))):
+        raise DenseTableError(f"grid points don't index back to themselves with step {step:g}")
+    if method == "nearest":
+        table.rating = rating
+        table.ambiguous = ambiguous_cells(table, rating)
+    table.max_error = max_error(table, rating)
+    if method == "nearest" and table.max_error != 0:
+        raise DenseTableError(f"nearest table with step {step:g} differs from the rating by {table.max_error:g}")
+    return table
+
+
+def cache_key(rating, method, step, tolerance):
+    digest = hashlib.sha256()
+    for array in (rating.elevations, rating.values):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    digest.update(f"v2|{rating.datum!r}|{method}|{step!r}|{tolerance!r}".encode())
+    return digest.hexdigest()[:24]
+
+
+def compile_table(rating, method="nearest", step=None, tolerance=None, cache_dir=CACHE_DIR, max_halvings=12):
+    """
+    Compile a RatingTable into a DenseTable for `method`.
+
+    step defaults to 0.01 ft. For "linear" and "loglog", tolerance is the largest allowed difference
+    from rating.lookup(x, method) for any x in the table range, 0.1 % of the value range by default,
+    and the step is halved until the table is within it. "nearest" tables give exactly what
+    rating.lookup(x, "nearest") gives for any x and ignore tolerance. cache_dir=None turns off the on-disk cache.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+    step = DEFAULT_STEP if step is None else float(step)
+    if step <= 0:
+        raise ValueError("step must be positive")
+    if method == "nearest":
+        tolerance = 0.0
+    elif tolerance is None:
+        tolerance = 0.001 * float(np.ptp(rating.values))
+
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"dense-{cache_key(rating, method, step, tolerance)}.npz")
+        if os.path.exists(path):
+            try:
+                return DenseTable.load(path)
+            except (OSError, ValueError, KeyError):
+                pass
+
+    for _ in range(max_halvings + 1):
+        table = build_table(rating, step, method)
+        if table.max_error <= tolerance:
+            break
+        step /= 2
+    else:
+        raise DenseTableError(f"no step down to {step * 2:g} keeps the {method} table within {tolerance:g}, "
+                              f"max error {table.max_error:g}")
+    if path is not None:
+        table.save(path)
+    return table
+
+
+def compile_dataframe(df, elev_col="Elevation (ft NAVD88)", value_col="Q (CFS)", method="nearest", **kwargs):
+    return compile_table(RatingTable.from_dataframe(df, elev_col, value_col), method, **kwargs)
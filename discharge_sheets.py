@@ -0,0 +1,159 @@
+"""
+Loader for the "... DISCHARGE RATES" sheets in "LAKE DISCHARGE CALCULATOR.xlsx".
+
+Each sheet is parsed once and the cleaned Elevation / Q arrays are cached in a .npz file next to the
+workbook. The cache is keyed on the workbook's mtime and sha256, so later runs skip openpyxl entirely
+until the workbook is edited. The sheet layout is checked before slicing so a shifted header raises
+DischargeSheetLayoutError instead of silently producing the wrong curve.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from run_report import span
+
+SHEET_SUFFIX = "DISCHARGE RATES"
+ELEV_COLUMN = "Elevation (ft NAVD88)"
+Q_COLUMN = "Q (CFS)"
+CACHE_DIR = ".curve_cache"
+
+# layout of the sheets when read with header=None (0-based rows/columns)
+HEADER_ROW = 12      # "TOP OF GATE EL." | "LAKE ELEVATION" | ... | "TOTAL"
+UNITS_ROW = 13       # "(NGVD FT)." | "(NGVD FT)" | ... | "Q (cfs)"
+DATA_ROW = 14
+ELEV_COL = 1
+Q_COL = 9
+EXPECTED_CELLS = {
+    (HEADER_ROW, ELEV_COL): "LAKE ELEVATION",
+    (HEADER_ROW, Q_COL): "TOTAL",
+    (UNITS_ROW, Q_COL): "Q (CFS)",
+}
+
+
+class DischargeSheetLayoutError(ValueError):
+    pass
+
+
+def _cell_text(raw, row, col):
+    if row >= raw.shape[0] or col >= raw.shape[1]:
+        return ""
+    value = raw.iat[row, col]
+    return "" if pd.isna(value) else " ".join(str(value).split()).upper()
+
+
+def parse_discharge_sheet(raw, sheet_name=""):
+    """
+    Clean a discharge sheet read with header=None into a two column Elevation / Q dataframe.
+    Raises DischargeSheetLayoutError if the header cells are not where they are expected.
+    """
+    for (row, col), expected in EXPECTED_CELLS.items():
+        found = _cell_text(raw, row, col)
+        if found != expected:
+            raise DischargeSheetLayoutError(
+                f"{sheet_name}: expected {expected!r} at row {row + 1}, column {col + 1} but found {found!r}; "
+                f"the sheet layout has changed")
+
+    data = raw.iloc[DATA_ROW:, [ELEV_COL, Q_COL]]
+    data.columns = [ELEV_COLUMN, Q_COLUMN]
+    # blank rows at the bottom of the sheet are dropped, anything else that isn't a number is an error
+    data = data.dropna(how="all")
+    numeric = data.apply(pd.to_numeric, errors="coerce")
+    bad = numeric.isna() & data.notna()
+    if bad.to_numpy().any():
+        row = int(np.flatnonzero(bad.any(axis=1).to_numpy())[0])
+        raise DischargeSheetLayoutError(
+            f"{sheet_name}: non-numeric value in the rating table at row {data.index[row] + 1}")
+    numeric = numeric.dropna(subset=[ELEV_COLUMN]).reset_index(drop=True)
+    if numeric.empty:
+        raise DischargeSheetLayoutError(f"{sheet_name}: no rating table rows found")
+    return numeric.astype(np.float64)
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(excel_file, cache_dir=None):
+    excel_file = os.path.abspath(excel_file)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(excel_file), CACHE_DIR)
+    return os.path.join(cache_dir, os.path.basename(excel_file) + ".npz")
+
+
+def _read_cache(path, excel_file):
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            cached = {key: npz[key] for key in npz.files}
+    except (OSError, ValueError):
+        return None
+    mtime = os.path.getmtime(excel_file)
+    if float(cached["mtime"]) != mtime:
+        # touched but maybe not edited, only re-parse if the content changed
+        if str(cached["sha256"]) != file_sha256(excel_file):
+            return None
+        cached["mtime"] = np.float64(mtime)
+        _write_cache(path, cached)
+    return cached
+
+
+def _write_cache(path, arrays):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def _to_frames(cached):
+    sheets = {}
+    for name in cached["sheets"]:
+        name = str(name)
+        sheets[name] = pd.DataFrame({
+            ELEV_COLUMN: cached[f"{name}/elevation"],
+            Q_COLUMN: cached[f"{name}/q"],
+        })
+    return sheets
+
+
+def load_discharge_sheets(excel_file, cache_dir=None, refresh=False):
+    """
+    Return {sheet name: Elevation / Q dataframe} for every "... DISCHARGE RATES" sheet in the workbook.
+    """
+    path = cache_path(excel_file, cache_dir)
+    if not refresh:
+        cached = _read_cache(path, excel_file)
+        if cached is not None:
+            return _to_frames(cached)
+
+    mtime = os.path.getmtime(excel_file)
+    arrays = {"mtime": np.float64(mtime), "sha256": np.str_(file_sha256(excel_file))}
+    names = []
+    with pd.ExcelFile(excel_file) as workbook:
+        for name in workbook.sheet_names:
+            if not name.strip().upper().endswith(SHEET_SUFFIX):
+                continue
+            with span("excel_parse", sheet=name) as s:
+                curve = parse_discharge_sheet(workbook.parse(name, header=None), name)
+                s.rows = len(curve)
+            arrays[f"{name}/elevation"] = curve[ELEV_COLUMN].to_numpy()
+            arrays[f"{name}/q"] = curve[Q_COLUMN].to_numpy()
+            names.append(name)
+    if not names:
+        raise DischargeSheetLayoutError(f"{excel_file}: no '... {SHEET_SUFFIX}' sheets found")
+    arrays["sheets"] = np.array(names)
+    _write_cache(path, arrays)
+    return _to_frames(arrays)
+
+
+def load_discharge_sheet(excel_file, sheet_name, cache_dir=None, refresh=False):
+    sheets = load_discharge_sheets(excel_file, cache_dir=cache_dir, refresh=refresh)
+    if sheet_name not in sheets:
+        raise KeyError(f"{sheet_name!r} not in {excel_file}, available: {sorted(sheets)}")
+    return sheets[sheet_name]
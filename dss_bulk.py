@@ -0,0 +1,131 @@
+"""
+Bulk writer for regular time series that share a start time and length, such as the frequency-event
+hydrographs in lake_inflow_frequency_events.dss.
+
+Events are a 2-D NumPy array (events x timesteps) and the pathnames come from a template, e.g.
+
+    write_events("lake_inflow_frequency_events.dss", events,
+                 "/Lake Lawtonka near Lawton, OK/07309500/RES FLOW-IN//1HOUR/SSP {year}yr/",
+                 [{"year": y} for y in years])
+
+Every record is written in one DSS session. With skip_unchanged=True a record is only rewritten if
+the content hash of its values differs from what is already in the file. read_events reads the same
+kind of records back into a 2-D array and write_paired writes paired data (curves) records.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from pydsstools.heclib.dss import HecDss
+from pydsstools.core import PairedDataContainer, TimeSeriesContainer
+
+from stream_convert import delete_record
+
+DSS_TIME_FORMAT = "%d%b%Y %H:%M:%S"
+
+
+def pad_events(series, n_steps, dtype=np.float32):
+    """
+    Stack 1-D series of different lengths into an (events x n_steps) array, zero padded at the end.
+    Series longer than n_steps are cut.
+    """
+    events = np.zeros((len(series), n_steps), dtype=dtype)
+    for i, values in enumerate(series):
+        values = np.asarray(values, dtype=dtype)[:n_steps]
+        events[i, :len(values)] = values
+    return events
+
+
+def values_hash(values):
+    # DSS stores time series values as float32, hash them the same way so re-read records compare equal
+    return hashlib.sha1(np.ascontiguousarray(values, dtype=np.float32).tobytes()).hexdigest()
+
+
+def read_regular(dss, pathname, n_steps, start, step):
+    """Values of a regular record over n_steps from start, None if the record isn't there."""
+    first = datetime.strptime(start, DSS_TIME_FORMAT)
+    last = first + step * (n_steps - 1)
+    try:
+        ts = dss.read_ts(pathname, window=(start, last.strftime(DSS_TIME_FORMAT)), trim_missing=False)
+    except Exception:
+        return None
+    if ts is None or getattr(ts, "empty", False):
+        return None
+    values = np.asarray(ts.values)
+    return values if len(values) == n_steps else None
+
+
+def existing_hash(dss, pathname, n_steps, start, step):
+    """Hash of the record already stored at pathname over the same window, None if there isn't one."""
+    values = read_regular(dss, pathname, n_steps, start, step)
+    return None if values is None else values_hash(values)
+
+
+def read_events(dss_file, pathname_template, keys, n_steps, start="01JAN2000 00:00:00", step=timedelta(hours=1),
+                dtype=np.float64):
+    """
+    Read the records pathname_template.format(**keys[i]) into an (events x n_steps) array.
+    Missing records raise KeyError, missing values (DSS UNDEFINED) are read as 0.
+    """
+    events = np.zeros((len(keys), n_steps), dtype=dtype)
+    with HecDss.Open(dss_file) as dss:
+        for i, key in enumerate(keys):
+            pathname = pathname_template.format(**key)
+            values = read_regular(dss, pathname, n_steps, start, step)
+            if values is None:
+                raise KeyError(f"{pathname} not found in {dss_file}")
+            events[i] = np.where(values > -3.4e+38, values, 0)
+    return events
+
+
+def write_paired(dss, pathname, x, curves, labels, x_units, y_units, x_type="Linear", y_type="Linear"):
+    """Write a paired data record, curves is (n curves x len(x))."""
+    curves = np.atleast_2d(np.asarray(curves, dtype=np.float32))
+    pdc = PairedDataContainer()
+    pdc.pathname = pathname
+    pdc.curve_no = curves.shape[0]
+    pdc.independent_axis = np.asarray(x, dtype=np.float32).tolist()
+    pdc.data_no = curves.shape[1]
+    pdc.curves = curves
+    pdc.labels_list = list(labels)
+    pdc.independent_units = x_units
+    pdc.independent_type = x_type
+    pdc.dependent_units = y_units
+    pdc.dependent_type = y_type
+    dss.put_pd(pdc)
+
+
+def write_events(dss_file, events, pathname_template, keys, start="01JAN2000 00:00:00", step=timedelta(hours=1),
+                 units="cfs", data_type="INST", skip_unchanged=False, replace=True, log=print):
+    """
+    Write each row of `events` as a regular time series to pathname_template.format(**keys[i]).
+    `step` is the interval of the E-part and is only used to read back existing records for skip_unchanged.
+    Returns {"written": n, "skipped": n}.
+    """
+    events = np.asarray(events)
+    if events.ndim != 2 or events.shape[0] != len(keys):
+        raise ValueError("events must be a 2-D array with one row per entry in keys")
+    n_steps = events.shape[1]
+
+    counts = {"written": 0, "skipped": 0}
+    with HecDss.Open(dss_file) as dss:
+        for row, key in zip(events, keys):
+            pathname = pathname_template.format(**key)
+            if skip_unchanged and existing_hash(dss, pathname, n_steps, start, step) == values_hash(row):
+                counts["skipped"] += 1
+                continue
+            tsc = TimeSeriesContainer()
+            tsc.pathname = pathname
+            tsc.startDateTime = start
+            tsc.numberValues = n_steps
+            tsc.values = row
+            tsc.units = units
+            tsc.type = data_type
+            tsc.interval = 1
+            if replace:
+                delete_record(dss, pathname)
+            dss.put_ts(tsc)
+            counts["written"] += 1
+    if log:
+        log(f"{dss_file}: {counts['written']} records written, {counts['skipped']} unchanged")
+    return counts
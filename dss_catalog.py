@@ -0,0 +1,251 @@
+"""
+Catalog index for DSS files.
+
+The pathname list is read once with getPathnameList("*") and kept as a table of A-F parts. The table is
+saved next to the .dss file (gages.dss -> gages.dss.catalog.npz) and rebuilt only when the .dss file's
+mtime or size changes. Queries are done part by part with fnmatch wildcards on the distinct values of
+each part, so they stay fast on files with thousands of records.
+
+    catalog = DssCatalog.open("gages.dss")
+    catalog.condensed(B="07309500", C="ELEVATION")
+    # ['/Lake Lawtonka near Lawton, OK/07309500/ELEVATION/01Jan1900 - 01Jan2000/IR-CENTURY/USGS/']
+
+Query values are fnmatch patterns, so names that come from data rather than the user (a site name with
+"[" in it) go through escape() first.
+"""
+import fnmatch
+import os
+import re
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from stream_convert import read_window, split_pathname
+
+PARTS = "ABCDEF"
+
+# years in one record block for the irregular E-parts longer than a month, used to turn the last block's
+# D-part into an end time. IR-DAY and IR-MONTH blocks end within their month, see block_end
+IRREGULAR_BLOCK_YEARS = {"IR-YEAR": 1, "IR-DECADE": 10, "IR-CENTURY": 100}
+
+
+def escape(value):
+    """Escape the fnmatch wildcards in a literal part value, e.g. rows(A=escape(name))."""
+    return re.sub(r"([*?[])", r"[\1]", value)
+
+
+def catalog_path(dss_file):
+    return dss_file + ".catalog.npz"
+
+
+def parse_dpart(dpart):
+    return datetime.strptime(dpart.strip(), "%d%b%Y")
+
+
+def _format_dpart(date):
+    return date.astype(datetime).strftime("%d%b%Y")
+
+
+def _dpart_or_nat(dpart):
+    try:
+        return np.datetime64(parse_dpart(dpart), "s")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def block_end(block_start, epart):
+    """Upper bound on the end of the record block starting at block_start for the E-part interval."""
+    epart = epart.upper()
+    if epart == "IR-DAY":
+        return block_start.replace(hour=23, minute=59, second=59)
+    if epart == "IR-MONTH":
+        return block_start.replace(day=monthrange(block_start.year, block_start.month)[1], hour=23, minute=59, second=59)
+    years = IRREGULAR_BLOCK_YEARS.get(epart)
+    if years is None:
+        # regular intervals: sub-daily blocks are <= 1 year, daily 1 decade, longer intervals 1 century
+        if "DAY" in epart:
+            years = 10
+        elif any(unit in epart for unit in ("WEEK", "MON", "YEAR", "TRI", "SEMI")):
+            years = 100
+        else:
+            years = 1
+    return datetime(block_start.year + years, 1, 1)
+
+
+class DssCatalog:
+    def __init__(self, paths):
+        paths = list(paths)
+        self._index(np.array([split_pathname(p) for p in paths], dtype=str).reshape(len(paths), 6))
+
+    def _index(self, parts):
+        # N x 6 array of parts, plus the distinct values and integer codes of each part for fast queries
+        # and the rows grouped by code (order/starts) so a query only touches the rows it selects
+        self.parts = parts
+        self._uniques = []
+        self._upper = []
+        self._codes = []
+        self._order = []
+        self._starts = []
+        for i in range(6):
+            uniques, codes = np.unique(parts[:, i], return_inverse=True)
+            codes = codes.reshape(-1)
+            self._uniques.append(uniques)
+            self._upper.append({j: value.upper() for j, value in enumerate(uniques)})
+            self._codes.append(codes)
+            self._order.append(np.argsort(codes, kind="stable"))
+            self._starts.append(np.searchsorted(codes[self._order[-1]], np.arange(len(uniques) + 1)))
+        # D-part block start of every distinct D value, NaT where the D-part isn't a date
+        self._dates = np.array([_dpart_or_nat(value) for value in self._uniques[3]], dtype="datetime64[s]")
+
+    @classmethod
+    def open(cls, dss_file, refresh=False):
+        """Load the saved catalog for dss_file, or read the pathname list and save it if it is stale."""
+        stat = os.stat(dss_file)
+        path = catalog_path(dss_file)
+        if not refresh and os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as npz:
+                    if float(npz["mtime"]) == stat.st_mtime and int(npz["size"]) == stat.st_size:
+                        return cls.from_parts(npz["parts"])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        from pydsstools.heclib.dss import HecDss
+        with HecDss.Open(dss_file) as dss:
+            catalog = cls(dss.getPathnameList("*"))
+        catalog.save(path, stat.st_mtime, stat.st_size)
+        return catalog
+
+    @classmethod
+    def from_parts(cls, parts):
+        catalog = cls.__new__(cls)
+        catalog._index(np.asarray(parts, dtype=str).reshape(-1, 6))
+        return catalog
+
+    def save(self, path, mtime, size):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, parts=self.parts, mtime=np.float64(mtime), size=np.int64(size))
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def _hits(self, i, pattern):
+        pattern = pattern.upper()
+        if not any(ch in pattern for ch in "*?["):
+            return [j for j, value in self._upper[i].items() if value == pattern]
+        return [j for j, value in self._upper[i].items() if fnmatch.fnmatchcase(value, pattern)]
+
+    def rows(self, **patterns):
+        """
+        Indices of the records matching the given part patterns, e.g. rows(B="07309500", C="ELEV*").
+        Matching is case-insensitive like DSS pathnames.
+        """
+        candidates = None
+        for part, pattern in patterns.items():
+            if pattern is None or pattern == "*":
+                continue
+            i = PARTS.index(part.upper())
+            hits = self._hits(i, pattern)
+            if candidates is None:
+                order, starts = self._order[i], self._starts[i]
+                candidates = np.sort(np.concatenate(
+                    [order[starts[j]:starts[j + 1]] for j in hits] or [np.empty(0, dtype=np.intp)]))
+            else:
+                candidates = candidates[np.isin(self._codes[i][candidates], hits)]
+            if len(candidates) == 0:
+                break
+        return np.arange(len(self.parts)) if candidates is None else candidates
+
+    def mask(self, **patterns):
+        selected = np.zeros(len(self.parts), dtype=bool)
+        selected[self.rows(**patterns)] = True
+        return selected
+
+    def find(self, **patterns):
+        """Full record pathnames (one per block) matching the part patterns."""
+        return ["/" + "/".join(row) + "/" for row in self.parts[self.rows(**patterns)]]
+
+    def groups(self, **patterns):
+        """
+        Collapse the D-part of the matching records.
+        Returns {(A, B, C, E, F): sorted datetime64 array of the D-part block starts}.
+        """
+        rows = self.rows(**patterns)
+        keys = np.stack([self._codes[i][rows] for i in (0, 1, 2, 4, 5)], axis=1)
+        dates = self._dates[self._codes[3][rows]]
+        groups = {}
+        if len(rows):
+            unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            for k, key in enumerate(unique_keys):
+                key_dates = dates[inverse == k]
+                name = tuple(str(self._uniques[i][code]) for i, code in zip((0, 1, 2, 4, 5), key))
+                # paired data and other records without a date D-part give an empty array
+                groups[name] = np.sort(key_dates[~np.isnat(key_dates)])
+        return groups
+
+    def condensed(self, **patterns):
+        """Pathnames with the D-part collapsed to "first block - last block", like the HEC-DSSVue condensed catalog."""
+        out = []
+        for (a, b, c, e, f), dates in sorted(self.groups(**patterns).items()):
+            d = f"{_format_dpart(dates[0])} - {_format_dpart(dates[-1])}" if len(dates) else ""
+            out.append(f"/{a}/{b}/{c}/{d}/{e}/{f}/")
+        return out
+
+    def block_starts(self, pathname):
+        """Sorted datetime64 D-part block starts of the record, ignoring the D-part of `pathname`."""
+        a, b, c, _, e, f = (escape(part) for part in split_pathname(pathname))
+        dates = np.concatenate(list(self.groups(A=a, B=b, C=c, E=e, F=f).values()) or [np.empty(0, "datetime64[s]")])
+        if len(dates) == 0:
+            raise KeyError(f"no dated records for {pathname}")
+        return np.sort(dates)
+
+    def time_range(self, pathname, dss=None):
+        """
+        (start, end) covering every block of the record, ignoring the D-part of `pathname`.
+        The end is the end of the last block so it can be later than the last value in the record,
+        a century past it for IR-CENTURY. With the open `dss` the range of an irregular record is
+        narrowed to its first and last values, see value_range.
+        """
+        if dss is not None and split_pathname(pathname)[4].upper().startswith("IR-"):
+            found = self.value_range(dss, pathname)
+            if found is None:
+                raise KeyError(f"no values in {pathname}")
+            return found
+        dates = self.block_starts(pathname)
+        return dates[0].astype(datetime), block_end(dates[-1].astype(datetime), split_pathname(pathname)[4])
+
+    def value_range(self, dss, pathname):
+        """
+        (first, last) datetime of the values stored in an irregular record, None if it has none.
+        Blocks are read whole, one window each, from either end until one has values, so usually
+        only the first and last blocks are decoded.
+        """
+        epart = split_pathname(pathname)[4]
+        blocks = [(start, block_end(start, epart)) for start in self.block_starts(pathname).astype(datetime)]
+        first = last = None
+        for i, block in enumerate(blocks):
+            times = read_window(dss, pathname, *block, last=True).times
+            if len(times):
+                first, last = times.min(), times.max()
+                break
+        if first is None:
+            return None
+        for block in reversed(blocks[i + 1:]):
+            times = read_window(dss, pathname, *block, last=True).times
+            if len(times):
+                last = times.max()
+                break
+        epoch = datetime(1970, 1, 1)
+        return epoch + timedelta(seconds=int(first)), epoch + timedelta(seconds=int(last))
+
+    def last_time(self, dss, pathname):
+        """Epoch seconds of the last value in an irregular record, None if it has none. Blocks are read from the last."""
+        epart = split_pathname(pathname)[4]
+        for start in self.block_starts(pathname).astype(datetime)[::-1]:
+            times = read_window(dss, pathname, start, block_end(start, epart), last=True).times
+            if len(times):
+                return int(times.max())
+        return None
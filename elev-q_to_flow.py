@@ -3,76 +3,73 @@ This script is used to convert the Elevation data from USGS gages in the DSS for
 """
 # %%
 from pydsstools.heclib.dss import HecDss
-from pydsstools.core import TimeSeriesContainer,UNDEFINED
 
 # DSS Elevation data has been reieved for the following locations:
 # Lake Lawtonka and Lake Ellsworth, upstream of lawton Oklahoma.
 dss_file = "gages.dss"
 excel_file = "LAKE DISCHARGE CALCULATOR.xlsx"
 
+# every stage below runs in a timing span (wall time, rows, rows/s, peak RSS).
+# set RUN_REPORT=runs.jsonl to append them to a JSON-lines run report,
+# RUN_PROFILE=<stage> or RUN_TRACEMALLOC=<stage> to dump a cProfile / tracemalloc of one stage (see run_report.py)
+from run_report import report, span
+
+# plots are off when run as `python elev-q_to_flow.py` so batch runs never import matplotlib,
+# --plots png writes them to --plot-dir in the background, --plots show (the default in Jupyter) shows them.
+# long series are min/max decimated to screen resolution first (see plots.py)
+from plots import Plotter
+
+plotter = Plotter.from_args()
+
 # %%
-# List all paths in the DSS file
+# List all paths in the DSS file with the D-part condensed to the range of record blocks.
+# the catalog is saved next to the dss file and only re-read when the dss file changes
+from dss_catalog import DssCatalog
+
+with span("catalog") as s:
+    catalog = DssCatalog.open(dss_file)
+    s.rows = len(catalog)
+for path in catalog.condensed():
+    print(path)
+
+# find the elevation records by USGS gage number instead of hard-coding the D-part date range
+lawtonka_path = catalog.condensed(B="07309500", C="ELEVATION", E="IR-CENTURY")[0]
+ellsworth_path = catalog.condensed(B="07308990", C="ELEVATION", E="15Minute")[0]
+
+# the cleaned elevation records are kept in a local cache (.gage_cache/) keyed by pathname,
+# only readings newer than the last cached one are decoded from the dss file and appended
+from gage_cache import GageCache
+
+gage_cache = GageCache(dss_file)
 with HecDss.Open(dss_file) as dss:
-    paths = dss.getPathnameList("*")
-    # remove D-part by slicing the path. The D-part is at path.split("/")[4]
-    before_D_paths = [path.split("/")[0:4] for path in paths]
-    after_D_paths = [path.split("/")[5:] for path in paths]
-    # join and add 2 forward slashes to the end of the before_D_paths to represent the blank dpart
-    before_D_paths = ["/".join(path) + "//" for path in before_D_paths]
-    # join the after_D_paths with a forward slash
-    after_D_paths = ["/".join(path) for path in after_D_paths]
-    # use list comprhension to join the before_D_paths and after_D_paths to create the full path
-    noDpaths = [before + after for before, after in zip(before_D_paths, after_D_paths)]
-    # for before, after in zip(before_D_paths, after_D_paths):
-    #     print(before, after)
-    # remove duplicates by converting to a set and back to a list
-    noDpaths = list(set(noDpaths))
-
-    for path in noDpaths:
-        print(path)
-    
-    # lawtonka_path = "/Lake Lawtonka near Lawton, OK/07309500/ELEVATION//IR-CENTURY/USGS/"
-    # ellsworth_path = "/Lake Ellsworth near Lawton, OK/07310000/STAGE//15Minute/USGS/"
-    lawtonka_path = "/Lake Lawtonka near Lawton, OK/07309500/ELEVATION/01Oct2007 - 25Jun2025/IR-CENTURY/USGS/"
-    ellsworth_path = "/Lake Ellsworth near Elgin, OK/07308990/ELEVATION/01Oct2007 - 18Jun2025/15Minute/USGS/"
-
-    # # get the data for the two paths
-    lawtonka_data = dss.read_ts(lawtonka_path)
-    ellsworth_data = dss.read_ts(ellsworth_path)
+    # the span of the values actually in the irregular record, not the century its block covers
+    lawtonka_range = catalog.time_range(lawtonka_path, dss)
+    ellsworth_range = catalog.time_range(ellsworth_path, dss)
+    for path, (start, end) in [(lawtonka_path, lawtonka_range), (ellsworth_path, ellsworth_range)]:
+        with span("gage_cache_update", pathname=path) as s:
+            n = s.rows = gage_cache.update_from_dss(dss, path, start=start, end=end)
+        print(f"{n} new values cached for {path}")
 
 
 # %%
 
 # get times and values
-import numpy as np
-import pandas as pd
-#  create a pandas dataframe using np.array(lawtonka_data.pytimes) & lawtonka_data.values
-# has a noData value of -3.4028235e+38
-lawtonka_df = pd.DataFrame({
-    "time": np.array(lawtonka_data.pytimes),
-    "value": lawtonka_data.values
-})
-
-ellsworth_df = pd.DataFrame({
-    "time": np.array(ellsworth_data.pytimes),
-    "value": ellsworth_data.values
-})
-
-# %%
-# get the length of the dataframes
-print(f"Lake Lawtonka data length: {len(lawtonka_df)}")
-print(f"Lake Ellsworth data length: {len(ellsworth_df)}")
-
-# %%
-# remove noData values
-lawtonka_df = lawtonka_df[lawtonka_df["value"] > -3.4e+38]
-ellsworth_df = ellsworth_df[ellsworth_df["value"] > -3.4e+38]
-# convert time to datetime
-lawtonka_df["time"] = pd.to_datetime(lawtonka_df["time"], unit='s', utc=True)
-ellsworth_df["time"] = pd.to_datetime(ellsworth_df["time"], unit='s', utc=True)
-# # set time as index
-lawtonka_df.set_index("time", inplace=True)
-ellsworth_df.set_index("time", inplace=True)
+# the cache is opened with mmap: int64 epoch seconds + float32 values, noData values (-3.4028235e+38)
+# were already removed when the readings were cached.
+# no Python lists of datetimes or floats are built on the way to pandas
+lawtonka_series = gage_cache.open(lawtonka_path)
+ellsworth_series = gage_cache.open(ellsworth_path)
+
+# %%
+# get the length of the series
+print(f"Lake Lawtonka data length: {len(lawtonka_series)}")
+print(f"Lake Ellsworth data length: {len(ellsworth_series)}")
+
+# %%
+# convert to dataframes with a UTC time index
+with span("to_datetime", rows=len(lawtonka_series) + len(ellsworth_series)):
+    lawtonka_df = lawtonka_series.to_pandas("value").to_frame()
+    ellsworth_df = ellsworth_series.to_pandas("value").to_frame()
 
 lawtonka_df
 
@@ -86,50 +83,22 @@ the data should be written as 'irregular' data,\nwhich means that the time inter
 
 # %%
 # plot the data
-import matplotlib.pyplot as plt
-plt.figure(figsize=(10, 5))
-plt.plot(lawtonka_df.index, lawtonka_df["value"], label="Lake Lawtonka Elevation (NAVD88)")
-plt.title("Lake Lawtonka Elevation (NAVD88)")
-plt.xlabel("Time")
-plt.ylabel("Elevation (ft NAVD88)")
-plt.legend()
-plt.grid()
-plt.show()
+plotter.line(lawtonka_df.index, lawtonka_df["value"], "Lake Lawtonka Elevation (NAVD88)", "Time",
+             "Elevation (ft NAVD88)", "Lake Lawtonka Elevation (NAVD88)")
 
 # %%
 # plot ellsworth data
-plt.figure(figsize=(10, 5))
-plt.plot(ellsworth_df.index, ellsworth_df["value"], label="Lake Ellsworth Elevation (NAVD88)")
-plt.title("Lake Ellsworth Elevation (NAVD88)")
-plt.xlabel("Time")
-plt.ylabel("Elevation (ft NAVD88)")
-plt.legend()
-plt.grid()
-plt.show()
+plotter.line(ellsworth_df.index, ellsworth_df["value"], "Lake Ellsworth Elevation (NAVD88)", "Time",
+             "Elevation (ft NAVD88)", "Lake Ellsworth Elevation (NAVD88)")
 
 #%%
-# read the elevation-discharge relationships from a excel file
-
-lawtonka_excel = pd.read_excel(excel_file, sheet_name="LAWTONKA DISCHARGE RATES")
-ellsworth_excel = pd.read_excel(excel_file, sheet_name="ELLSWORTH DISCHARGE RATES")
-
-# remove the first 12 rows
-lawtonka_excel = lawtonka_excel.iloc[11:]
-ellsworth_excel = ellsworth_excel.iloc[11:]
-# set the first row as the header
-lawtonka_excel.columns = lawtonka_excel.iloc[0]
-# remove any columns after the 11th
-lawtonka_excel = lawtonka_excel.iloc[:, :10]
-ellsworth_excel = ellsworth_excel.iloc[:, :10]
-# remove the first two rows
-lawtonka_excel = lawtonka_excel.iloc[2:]
-ellsworth_excel = ellsworth_excel.iloc[2:]
-# drop all columns except the 2nd and the last column
-lawtonka_excel = lawtonka_excel.iloc[:, [1, -1]]
-ellsworth_excel = ellsworth_excel.iloc[:, [1, -1]]
-# rename the columns to Elevation (ft NAVd88) and Q (CFS)
-lawtonka_excel.columns = ["Elevation (ft NAVD88)", "Q (CFS)"]
-ellsworth_excel.columns = ["Elevation (ft NAVD88)", "Q (CFS)"]
+# read the elevation-discharge relationships from the excel file.
+# the "... DISCHARGE RATES" sheets are parsed once and cached in .curve_cache/ until the workbook changes,
+# the sheet layout is checked so a shifted header raises an error instead of giving the wrong curve
+from discharge_sheets import load_discharge_sheet
+
+lawtonka_excel = load_discharge_sheet(excel_file, "LAWTONKA DISCHARGE RATES")
+ellsworth_excel = load_discharge_sheet(excel_file, "ELLSWORTH DISCHARGE RATES")
 
 lawtonka_excel
 # %%
@@ -138,17 +107,15 @@ ellsworth_excel
 # %%
 # for each elevation in the timeseries dataframes, 
 # find the corresponding discharge value in the excel dataframe by looking for the closest elevation value
-# and then use that value to create a new column named Flow (cfs) in the timeseries dataframe.
-def get_flow_from_elevation(df, excel_df):
-    # create a new column for flow
-    df["Outflow (cfs)"] = np.nan
-    for i, row in df.iterrows():
-        elevation = row["value"]
-        # find the closest elevation in the excel dataframe
-        closest_elevation = excel_df["Elevation (ft NAVD88)"].iloc[(excel_df["Elevation (ft NAVD88)"] - elevation).abs().argsort()[:1]]
-        # get the corresponding flow value
-        flow_value = excel_df.loc[excel_df["Elevation (ft NAVD88)"] == closest_elevation.values[0], "Q (CFS)"].values[0]
-        df.at[i, "Outflow (cfs)"] = flow_value
+# and then use that value to create a new column named Outflow (cfs) in the timeseries dataframe.
+# the rating table is sorted once and all elevations are resolved in one vectorized pass.
+# method can be "nearest" (closest elevation in the table), "linear" or "loglog"
+from rating_table import RatingTable
+
+@report.stage("get_flow_from_elevation", rows=len)
+def get_flow_from_elevation(df, excel_df, method="nearest"):
+    rating = RatingTable.from_dataframe(excel_df, "Elevation (ft NAVD88)", "Q (CFS)")
+    df["Outflow (cfs)"] = rating.lookup(df["value"].to_numpy(), method=method)
     return df
 
 lawtonka_df = get_flow_from_elevation(lawtonka_df, lawtonka_excel)
@@ -157,25 +124,13 @@ ellsworth_df = get_flow_from_elevation(ellsworth_df, ellsworth_excel)
 lawtonka_df
 # %%
 # plot the flow data for Lake Lawtonka
-plt.figure(figsize=(10, 5))
-plt.plot(lawtonka_df.index, lawtonka_df["Outflow (cfs)"], label="Lake Lawtonka Outlow (cfs)")
-plt.title("Lake Lawtonka Flow (cfs)")
-plt.xlabel("Time")
-plt.ylabel("Outlow (cfs)")
-plt.legend()
-plt.grid()
-plt.show()
+plotter.line(lawtonka_df.index, lawtonka_df["Outflow (cfs)"], "Lake Lawtonka Flow (cfs)", "Time",
+             "Outlow (cfs)", "Lake Lawtonka Outlow (cfs)")
 
 # %%
 # plot the flow data for Lake Ellsworth
-plt.figure(figsize=(10, 5))
-plt.plot(ellsworth_df.index, ellsworth_df["Outflow (cfs)"], label="Lake Ellsworth Outflow (cfs)")
-plt.title("Lake Ellsworth Outflow (cfs)")
-plt.xlabel("Time")
-plt.ylabel("Outflow (cfs)")
-plt.legend()
-plt.grid()
-plt.show()
+plotter.line(ellsworth_df.index, ellsworth_df["Outflow (cfs)"], "Lake Ellsworth Outflow (cfs)", "Time",
+             "Outflow (cfs)", "Lake Ellsworth Outflow (cfs)")
 
 # %%
 lawtonka_df
@@ -187,23 +142,35 @@ lawtonka_path_outflow = lawtonka_path.replace("ELEVATION", "RES FLOW-OUT")
 ellsworth_path_outflow = ellsworth_path.replace("ELEVATION", "RES FLOW-OUT")
 ellsworth_path_outflow = ellsworth_path_outflow.replace("15Minute", "IR-CENTURY")
 
-for (pathname, df) in zip([lawtonka_path_outflow, ellsworth_path_outflow], [lawtonka_df, ellsworth_df]):
-    # convert the dataframe to a timeseries container
-    tsc = TimeSeriesContainer()
-    tsc.pathname = pathname
-    tsc.startDateTime = df.index.min().strftime("%d%b%Y %H:%M:%S")
-    tsc.numberValues = len(df)
-    tsc.units = "cfs"
-    tsc.type = "INST"
-    tsc.interval = -1
-    tsc.values = df["Outflow (cfs)"].values.tolist()
-    tsc.times = df.index.to_pydatetime().tolist()  # list of datetime objects
-    with HecDss.Open(dss_file) as fid:
-        # delete the existing path if it exists
-        fid.deletePathname(tsc.pathname)
-        # print(f"Writing data to {pathname}...")
-        # put the timeseries container into the dss file
-        fid.put_ts(tsc)
+# the conversion is streamed through the DSS file in yearly windows: each block of elevations is read,
+# cleaned of noData values, run through the rating table and written before the next block is read,
+# so memory stays flat no matter how long the record is.
+# the rating tables are compiled to dense 0.01 ft lookup tables (index = round((elev - min) / 0.01)) and cached
+# in .curve_cache/. readings in the few cells that hold a knot midpoint go through the RatingTable, so every
+# reading, including the float32 values DSS returns, gets the same knot as RatingTable.lookup (see dense_table.py)
+from stream_convert import convert_record
+from dense_table import compile_table
+
+for (elev_path, out_path, excel_df, (start, end)) in zip([lawtonka_path, ellsworth_path],
+                                                         [lawtonka_path_outflow, ellsworth_path_outflow],
+                                                         [lawtonka_excel, ellsworth_excel],
+                                                         [lawtonka_range, ellsworth_range]):
+    rating = RatingTable.from_dataframe(excel_df, "Elevation (ft NAVD88)", "Q (CFS)")
+    rating = compile_table(rating, "nearest", step=0.01)
+    with span("convert_record", pathname=out_path) as s:
+        n = s.rows = convert_record(dss_file, elev_path, out_path, rating, start=start, end=end, block_years=1)
+    print(f"Wrote {n} values to {out_path}")
+
+# %%
+# also write regular 15 minute copies of the outflow (E-part 15Minute), HMS and DSSVue read those much faster.
+# readings up to 1 hour apart are interpolated, longer outages stay missing (UNDEFINED) in the regular record
+from regularize import regularize_record
+
+for out_path, (start, end) in zip([lawtonka_path_outflow, ellsworth_path_outflow], [lawtonka_range, ellsworth_range]):
+    with span("regularize", pathname=out_path) as s:
+        s.rows, missing = regularize_record(dss_file, out_path, interval="15MIN", max_gap="1HOUR", units="cfs",
+                                            start=start, end=end)
+    print(f"Wrote {s.rows} regular values ({missing} missing) for {out_path}")
 
 # %%
 # check the data types of the time column
@@ -211,3 +178,9 @@ print("Data type of the time column in Lake Lawtonka DataFrame:", lawtonka_df.in
 print("Data type of the time column in Lake Ellsworth DataFrame:", ellsworth_df.index.dtype)
 
 # %%
+# wait for any PNGs still rendering, then show where the time went
+for path in plotter.close():
+    print(f"Saved {path}")
+print(report.summary())
+
+# %%
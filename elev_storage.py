@@ -0,0 +1,101 @@
+"""
+Extension of elevation-storage curves above the top of the survey.
+
+The extension is built in one pass on an exact grid (last elevation + k * step, or any target grid of
+elevations) instead of adding 0.1 ft at a time, so fine grids cost no Python time per point and the
+elevations don't pick up floating point drift. The storage above the survey comes from a pluggable model:
+
+    "slope"  - storage keeps rising at the slope of the last two points (the original behaviour)
+    "power"  - S = a * (E - E0) ** b fitted to the top of the curve, E0 is the zero-storage elevation
+    "prism"  - surface area taken from the top of the curve and grown linearly with elevation
+
+A model is a function (elevations, storages, fit_points) -> callable(new_elevations) -> storages,
+so others can be passed directly as `model`.
+"""
+import numpy as np
+import pandas as pd
+
+ELEV_COLUMN = "Elevation (ft)"
+STORAGE_COLUMN = "Storage (ac-ft)"
+
+
+def slope_model(elev, stor, fit_points=None):
+    # only the last segment is used, fit_points is accepted so every model has the same signature
+    slope = (stor[-1] - stor[-2]) / (elev[-1] - elev[-2])
+    return lambda new_elev: stor[-1] + slope * (new_elev - elev[-1])
+
+
+def power_model(elev, stor, fit_points=10, datum=None):
+    if datum is None:
+        # zero-storage elevation from a straight line through the bottom two points of the survey
+        bottom_slope = (stor[1] - stor[0]) / (elev[1] - elev[0])
+        datum = elev[0] - stor[0] / bottom_slope if bottom_slope > 0 else elev[0] - 1.0
+    datum = min(datum, elev[0] - 1e-6)
+    top = slice(-max(fit_points, 2), None)
+    h = elev[top] - datum
+    ok = stor[top] > 0
+    exponent = np.polyfit(np.log(h[ok]), np.log(stor[top][ok]), 1)[0]
+    # scale so the curve passes through the last surveyed point
+    coefficient = stor[-1] / (elev[-1] - datum) ** exponent
+    return lambda new_elev: coefficient * (new_elev - datum) ** exponent
+
+
+def prism_model(elev, stor, fit_points=10):
+    top = slice(-max(fit_points, 2) - 1, None)
+    e = elev[top]
+    s = stor[top]
+    # surface area of each segment (ac) at its mid elevation, and how fast it grows with elevation
+    area = np.diff(s) / np.diff(e)
+    mid = (e[1:] + e[:-1]) / 2
+    area_growth = max(np.polyfit(mid, area, 1)[0], 0.0) if len(area) > 1 else 0.0
+    top_area = area[-1] + area_growth * (elev[-1] - mid[-1])
+    return lambda new_elev: stor[-1] + top_area * (new_elev - elev[-1]) + 0.5 * area_growth * (new_elev - elev[-1]) ** 2
+
+
+EXTRAPOLATION_MODELS = {
+    "slope": slope_model,
+    "power": power_model,
+    "prism": prism_model,
+}
+
+
+def extension_grid(last_elev, max_elev, step=0.1, decimals=9):
+    """
+    Elevations last_elev + k * step for k = 1.. until max_elev is reached. Like the original loop the
+    last point is the first one at or above max_elev.
+    """
+    if step <= 0:
+        raise ValueError("step must be positive")
+    if max_elev <= last_elev:
+        return np.empty(0)
+    # a small tolerance so 0.1-ft steps that land on max_elev don't add an extra step from rounding
+    count = int(np.ceil((max_elev - last_elev) / step - 1e-9))
+    return np.round(last_elev + step * np.arange(1, count + 1), decimals)
+
+
+def extend_curve(df, max_elev=None, step=0.1, model="slope", grid=None, fit_points=10,
+                 elev_col=ELEV_COLUMN, stor_col=STORAGE_COLUMN):
+    """
+    Extend an elevation-storage dataframe above its last elevation.
+
+    Either give max_elev (and step) to extend on last + k*step, or give `grid`, any array of target
+    elevations; points of the grid at or below the top of the survey are ignored.
+    """
+    elev = df[elev_col].to_numpy(dtype=np.float64)
+    stor = df[stor_col].to_numpy(dtype=np.float64)
+    if len(elev) < 2:
+        raise ValueError("need at least two points to extrapolate the curve")
+    if grid is not None:
+        new_elev = np.unique(np.asarray(grid, dtype=np.float64))
+        new_elev = new_elev[new_elev > elev[-1]]
+    elif max_elev is not None:
+        new_elev = extension_grid(elev[-1], max_elev, step)
+    else:
+        raise ValueError("give either max_elev or grid")
+    if len(new_elev) == 0:
+        return df
+
+    build = EXTRAPOLATION_MODELS[model] if isinstance(model, str) else model
+    storage_at = build(elev, stor, fit_points)
+    extension = pd.DataFrame({elev_col: new_elev, stor_col: storage_at(new_elev)})
+    return pd.concat([df, extension], ignore_index=True)
@@ -0,0 +1,168 @@
+"""
+Monte Carlo frequency events and the outflow-frequency curve with uncertainty bands.
+
+Annual peak inflows are sampled from the Bulletin 17C Log-Pearson III parameters (mean, standard
+deviation and skew of log10 Q), each sampled peak scales the deterministic SSP hydrograph shape
+("RES FLOW-IN ... SSP {year}yr") closest to it, and the events are routed through the reservoir's
+storage-discharge curve with puls_routing. The work is split into realizations, each run in a worker
+process with its own seed spawned from --seed, so results don't depend on the number of workers.
+A realization only sends back the outflow quantiles at the requested return periods, never the
+hydrographs, and the bands are taken across realizations.
+
+    python ensemble_events.py --lake lawtonka --mean 3.1 --std 0.45 --skew -0.2 --realizations 200
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from puls_routing import LAKES, PulsReservoir, event_years
+
+RETURN_PERIODS = (2, 5, 10, 25, 50, 100, 200, 500)
+
+
+def sample_lp3(rng, mean, std, skew, size):
+    """Log-Pearson III sample of Q: log10 Q is Pearson III with the given mean, std and skew."""
+    if abs(skew) < 1e-6:
+        return 10 ** rng.normal(mean, std, size)
+    alpha = 4.0 / skew ** 2
+    beta = std * skew / 2.0
+    return 10 ** (mean - alpha * beta + beta * rng.gamma(alpha, 1.0, size))
+
+
+def scale_shapes(shapes, peaks):
+    """
+    One hydrograph per sampled peak: the shape whose own peak is closest (in log space) scaled to the peak.
+    shapes is (n shapes x timesteps), returns (len(peaks) x timesteps).
+    """
+    shape_peaks = shapes.max(axis=1)
+    if len(shapes) == 1:
+        nearest = np.zeros(len(peaks), dtype=np.intp)
+    else:
+        order = np.argsort(shape_peaks)
+        log_shape = np.log(shape_peaks[order])
+        log_peaks = np.log(peaks)
+        idx = np.clip(np.searchsorted(log_shape, log_peaks), 1, len(order) - 1)
+        lower = log_peaks - log_shape[idx - 1] <= log_shape[idx] - log_peaks
+        nearest = order[idx - lower]
+    return shapes[nearest] * (peaks / shape_peaks[nearest])[:, None]
+
+
+def empirical_quantiles(peaks, return_periods):
+    """Peak values at return periods from the Weibull plotting position of a sample of annual peaks."""
+    ordered = np.sort(peaks)
+    n = len(ordered)
+    # non-exceedance probability of each ordered value is i / (n + 1)
+    p = np.arange(1, n + 1) / (n + 1)
+    return np.interp(1.0 - 1.0 / np.asarray(return_periods, dtype=np.float64), p, ordered)
+
+
+def run_realization(job):
+    """Worker: sample, route and summarize one realization. Returns (inflow quantiles, outflow quantiles)."""
+    rng = np.random.default_rng(job["seed"])
+    mean, std, skew = job["mean"], job["std"], job["skew"]
+    if job["se"] is not None:
+        # parameter uncertainty: each realization gets its own log-space moments
+        se_mean, se_std, se_skew = job["se"]
+        mean = rng.normal(mean, se_mean)
+        std = abs(rng.normal(std, se_std))
+        skew = rng.normal(skew, se_skew)
+    reservoir = PulsReservoir(job["storage"], job["outflow"], job["dt_hours"])
+    peaks_in = sample_lp3(rng, mean, std, skew, job["events"])
+    peaks_out = np.empty(job["events"])
+    # route in batches so memory stays bounded by batch x timesteps
+    for lo in range(0, job["events"], job["batch"]):
+        hi = min(lo + job["batch"], job["events"])
+        peaks_out[lo:hi] = reservoir.route(scale_shapes(job["shapes"], peaks_in[lo:hi])).peak_outflow
+    return (empirical_quantiles(peaks_in, job["return_periods"]),
+            empirical_quantiles(peaks_out, job["return_periods"]))
+
+
+def run_ensemble(reservoir, shapes, mean, std, skew, se=None, realizations=100, events=10_000, batch=2_000,
+                 return_periods=RETURN_PERIODS, seed=0, workers=None, bands=(5, 95)):
+    """
+    Outflow-frequency curve with uncertainty bands.
+    Returns a dataframe per return period with the median peak inflow and outflow across realizations
+    and the `bands` percentiles of the peak outflow.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(realizations)
+    base = {"storage": reservoir.storage, "outflow": reservoir.outflow, "dt_hours": reservoir.dt_hours,
+            "shapes": np.asarray(shapes, dtype=np.float64), "mean": mean, "std": std, "skew": skew, "se": se,
+            "events": events, "batch": batch, "return_periods": np.asarray(return_periods, dtype=np.float64)}
+    jobs = [dict(base, seed=s) for s in seeds]
+
+    inflow_q = np.empty((realizations, len(return_periods)))
+    outflow_q = np.empty((realizations, len(return_periods)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map keeps the realization order, so the result is the same for any number of workers
+        for i, (q_in, q_out) in enumerate(pool.map(run_realization, jobs, chunksize=max(1, realizations // 64))):
+            inflow_q[i] = q_in
+            outflow_q[i] = q_out
+
+    lo, hi = bands
+    return pd.DataFrame({
+        "Return Period (yr)": return_periods,
+        "AEP": 1.0 / np.asarray(return_periods, dtype=np.float64),
+        "Peak Inflow (cfs)": np.median(inflow_q, axis=0),
+        "Peak Outflow (cfs)": np.median(outflow_q, axis=0),
+        f"Peak Outflow {lo}% (cfs)": np.percentile(outflow_q, lo, axis=0),
+        f"Peak Outflow {hi}% (cfs)": np.percentile(outflow_q, hi, axis=0),
+    })
+
+
+def load_shapes(dss_file, lake, n_steps=24 * 14, start="01JAN2000 00:00:00"):
+    """The deterministic SSP event hydrographs of a lake as an (events x timesteps) array."""
+    from dss_bulk import read_events
+
+    years = event_years(dss_file, lake["a"], lake["b"])
+    if not years:
+        raise KeyError(f"no 'SSP {{year}}yr' RES FLOW-IN events for {lake['a']} in {dss_file}")
+    template = f"/{lake['a']}/{lake['b']}/RES FLOW-IN//1HOUR/SSP {{year}}yr/"
+    return read_events(dss_file, template, [{"year": y} for y in years], n_steps, start, timedelta(hours=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dss", default="lake_inflow_frequency_events.dss")
+    parser.add_argument("--lake", choices=sorted(LAKES), required=True)
+    parser.add_argument("--mean", type=float, required=True, help="mean of log10 annual peak inflow")
+    parser.add_argument("--std", type=float, required=True, help="standard deviation of log10 annual peak inflow")
+    parser.add_argument("--skew", type=float, required=True, help="skew of log10 annual peak inflow")
+    parser.add_argument("--se", type=float, nargs=3, default=None, metavar=("SE_MEAN", "SE_STD", "SE_SKEW"),
+                        help="standard errors of the three moments, sampled once per realization")
+    parser.add_argument("--realizations", type=int, default=100)
+    parser.add_argument("--events", type=int, default=10_000, help="annual peaks sampled per realization")
+    parser.add_argument("--batch", type=int, default=2_000, help="events routed at once inside a worker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="write the frequency curve to this csv")
+    parser.add_argument("--write-dss", action="store_true",
+                        help="also write the curve as FREQ-FLOW-OUT paired data (F-part SSP ENSEMBLE)")
+    args = parser.parse_args()
+
+    lake = LAKES[args.lake]
+    reservoir = PulsReservoir.from_csv(lake["storage_discharge"], 1.0)
+    shapes = load_shapes(args.dss, lake)
+    start = time.perf_counter()
+    curve = run_ensemble(reservoir, shapes, args.mean, args.std, args.skew, args.se, args.realizations, args.events,
+                         args.batch, seed=args.seed, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(curve.to_string(index=False))
+    print(f"{args.realizations * args.events} events routed in {elapsed:.1f}s")
+    if args.output:
+        curve.to_csv(args.output, index=False)
+    if args.write_dss:
+        from pydsstools.heclib.dss import HecDss
+        from dss_bulk import write_paired
+
+        columns = [c for c in curve.columns if c.startswith("Peak Outflow")]
+        with HecDss.Open(args.dss) as dss:
+            write_paired(dss, f"/{lake['a']}/{lake['b']}/FREQ-FLOW-OUT///SSP ENSEMBLE/", curve["Return Period (yr)"],
+                         curve[columns].to_numpy().T, columns, "years", "cfs")
+
+
+if __name__ == "__main__":
+    main()
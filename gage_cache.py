@@ -0,0 +1,164 @@
+"""
+Local columnar cache of cleaned gage time series.
+
+Each record, keyed by the DSS file's absolute path and the pathname (D-part ignored), gets a directory
+under .gage_cache/ with two flat binary columns, times.i8 (int64 epoch seconds) and values.f4 (float32),
+and a meta.json holding the pathname, the number of committed values and the DSS file's mtime and size at
+the last update. Columns are append-only: an update only reads the DSS record after the last cached
+timestamp and appends it, and readers open the columns with np.memmap instead of going back through the
+DSS library. If the DSS file changed since the last update and no longer holds the last cached value, the
+record was rewritten rather than appended to, and the cache of it is rebuilt.
+
+    cache = GageCache("gages.dss")
+    with HecDss.Open("gages.dss") as dss:
+        cache.update_from_dss(dss, pathname, start=datetime(2007, 10, 1))
+    series = cache.open(pathname)       # GageSeries backed by np.memmap
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from gage_series import GageSeries
+from stream_convert import read_window, split_pathname, with_part, yearly_windows
+
+CACHE_DIR = ".gage_cache"
+TIMES_FILE = "times.i8"
+VALUES_FILE = "values.f4"
+META_FILE = "meta.json"
+
+
+class GageCache:
+    def __init__(self, dss_file, root=CACHE_DIR):
+        self.dss_file = os.path.abspath(dss_file)
+        self.root = root
+
+    def path(self, pathname):
+        # one directory per record of this DSS file, the D-part doesn't identify a record so it is left out
+        key = with_part(pathname, "D", "").upper()
+        parts = split_pathname(key)
+        name = "".join(c if c.isalnum() else "_" for c in parts[1] or parts[0])[:40]
+        digest = hashlib.sha1(f"{os.path.normcase(self.dss_file)}|{key}".encode()).hexdigest()[:12]
+        return os.path.join(self.root, f"{name}-{digest}")
+
+    def _meta(self, pathname):
+        meta_path = os.path.join(self.path(pathname), META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def __contains__(self, pathname):
+        return self._meta(pathname) is not None
+
+    def count(self, pathname):
+        meta = self._meta(pathname)
+        return meta["count"] if meta else 0
+
+    def last_time(self, pathname):
+        """Epoch seconds of the last cached value, None if nothing is cached."""
+        meta = self._meta(pathname)
+        return meta["last_time"] if meta and meta["count"] else None
+
+    def append(self, pathname, series):
+        """
+        Append the values of `series` that are newer than the last cached value.
+        Nodata values are dropped. Returns the number of values appended.
+        """
+        series = series.clean()
+        last = self.last_time(pathname)
+        times = series.times
+        values = series.values.astype(np.float32, copy=False)
+        if last is not None:
+            newer = times > last
+            times, values = times[newer], values[newer]
+        if len(times) == 0:
+            return 0
+        if np.any(np.diff(times) <= 0):
+            order = np.argsort(times, kind="stable")
+            times, values = times[order], values[order]
+            unique = np.concatenate(([True], np.diff(times) > 0))
+            times, values = times[unique], values[unique]
+
+        directory = self.path(pathname)
+        os.makedirs(directory, exist_ok=True)
+        count = self.count(pathname)
+        for name, column, itemsize in ((TIMES_FILE, times, 8), (VALUES_FILE, values, 4)):
+            with open(os.path.join(directory, name), "ab") as f:
+                # anything past the committed count is left over from an interrupted append
+                f.truncate(count * itemsize)
+                f.seek(count * itemsize)
+                f.write(np.ascontiguousarray(column).tobytes())
+        # meta.json is written last, it is what commits the new values
+        self._commit(pathname, count + len(times), int(times[-1]))
+        return len(times)
+
+    def _commit(self, pathname, count, last_time):
+        directory = self.path(pathname)
+        os.makedirs(directory, exist_ok=True)
+        stat = os.stat(self.dss_file) if os.path.exists(self.dss_file) else None
+        meta = {"pathname": with_part(pathname, "D", ""), "dss_file": self.dss_file, "count": count,
+                "last_time": last_time, "dss_mtime": stat and stat.st_mtime, "dss_size": stat and stat.st_size}
+        tmp = os.path.join(directory, META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, META_FILE))
+
+    def clear(self, pathname):
+        """Drop the cached values of a record, the column files are cut back on the next append."""
+        if pathname in self:
+            self._commit(pathname, 0, None)
+
+    def changed(self, pathname):
+        """True if the DSS file was written since the record was last updated from it."""
+        meta = self._meta(pathname)
+        if not meta or not os.path.exists(self.dss_file):
+            return False
+        stat = os.stat(self.dss_file)
+        return (meta.get("dss_mtime"), meta.get("dss_size")) != (stat.st_mtime, stat.st_size)
+
+    def open(self, pathname, mmap=True):
+        """The cached series as a GageSeries, memory-mapped read-only unless mmap=False."""
+        count = self.count(pathname)
+        directory = self.path(pathname)
+        if count == 0:
+            return GageSeries(np.empty(0, np.int64), np.empty(0, np.float32))
+        if mmap:
+            times = np.memmap(os.path.join(directory, TIMES_FILE), dtype=np.int64, mode="r", shape=(count,))
+            values = np.memmap(os.path.join(directory, VALUES_FILE), dtype=np.float32, mode="r", shape=(count,))
+        else:
+            times = np.fromfile(os.path.join(directory, TIMES_FILE), dtype=np.int64, count=count)
+            values = np.fromfile(os.path.join(directory, VALUES_FILE), dtype=np.float32, count=count)
+        return GageSeries(times, values, np.zeros(count, dtype=bool))
+
+    def update_from_dss(self, dss, pathname, start=None, end=None, block_years=1):
+        """
+        Read the part of the DSS record after the last cached value, in yearly windows, and append it.
+        start is only used when nothing is cached yet; end defaults to now. Returns the number of values appended.
+        dss is the open self.dss_file.
+        """
+        last = self.last_time(pathname)
+        if last is not None and self.changed(pathname):
+            # new readings appended to the record keep the last cached one, a rewritten record may not
+            at = datetime(1970, 1, 1) + timedelta(seconds=last)
+            stored = read_window(dss, pathname, at, at, last=True)
+            cached = self.open(pathname, mmap=False)
+            if not (len(stored) and stored.times[-1] == last
+                    and np.float32(stored.values[-1]) == cached.values[-1]):
+                self.clear(pathname)
+                last = None
+        if last is not None:
+            start = datetime(1970, 1, 1) + timedelta(seconds=last + 1)
+        elif start is None:
+            raise ValueError(f"{pathname} is not cached yet, give a start time")
+        end = end or datetime.now(timezone.utc).replace(tzinfo=None)
+        windows = yearly_windows(start, end, block_years)
+        appended = 0
+        for i, window in enumerate(windows):
+            appended += self.append(pathname, read_window(dss, pathname, *window, last=i == len(windows) - 1))
+        if not appended and pathname in self:
+            # nothing new, still note the file state that was checked
+            self._commit(pathname, self.count(pathname), self.last_time(pathname))
+        return appended
@@ -0,0 +1,152 @@
+"""
+Compact time series type for gage data.
+
+A GageSeries holds an int64 array of epoch seconds, a float array of values and a boolean nodata mask.
+Conversions to pandas and to pydsstools containers go through whole NumPy arrays, so a multi-year
+15-minute record is not turned into millions of Python datetime and float objects along the way.
+"""
+import numpy as np
+import pandas as pd
+
+# DSS stores missing values as -3.4028235e+38
+NODATA_THRESHOLD = -3.4e+38
+DSS_TIME_FORMAT = "%d%b%Y %H:%M:%S"
+# irregular DSS times are integers in units of the granularity (60 s by default) from a julian base day,
+# julian day 0 is 31Dec1899 so 01Jan1970 is day 25568
+JULIAN_1970 = 25568
+MINUTE_GRANULARITY = 60
+
+
+def dss_times_to_epoch(times, granularity=MINUTE_GRANULARITY, julian_base=0):
+    """Epoch seconds (int64) from DSS integer times."""
+    return np.asarray(times, dtype=np.int64) * int(granularity) + (int(julian_base) - JULIAN_1970) * 86400
+
+
+def epoch_to_dss_times(seconds, granularity=MINUTE_GRANULARITY, julian_base=0):
+    """
+    DSS integer times from the julian base day for epoch seconds, which have to be whole units of the
+    granularity and fit in DSS's int32 times (second granularity needs a julian base near the data).
+    """
+    offset = np.asarray(seconds, dtype=np.int64) - (int(julian_base) - JULIAN_1970) * 86400
+    times, rest = np.divmod(offset, int(granularity))
+    if rest.any():
+        raise ValueError(f"times are not whole multiples of the {granularity}s DSS granularity")
+    info = np.iinfo(np.int32)
+    if times.size and (times.min() < info.min or times.max() > info.max):
+        raise ValueError(f"times don't fit in DSS int32 times with a {granularity}s granularity "
+                         f"from julian day {julian_base}")
+    return times.astype(np.int32)
+
+
+def dss_time_base(ts):
+    """(granularity, julian base date) of the integer times of a pydsstools TimeSeriesStruct."""
+    granularity = getattr(ts, "granularity", None)
+    base = getattr(ts, "_julian_base_date", None)
+    if not granularity or not base or "julianBaseDate" not in base:
+        raise ValueError("time series has no granularity and julian base date (TimeSeriesStruct.granularity, "
+                         "._julian_base_date), its integer times can't be decoded")
+    return int(granularity), int(base["julianBaseDate"])
+
+
+class GageSeries:
+    __slots__ = ("times", "values", "mask")
+
+    def __init__(self, times, values, mask=None):
+        """
+        times: epoch seconds (int64), values: float32 or float64, mask: True where the value is nodata.
+        If mask is not given it is built from NaN and DSS nodata values.
+        """
+        self.times = np.asarray(times, dtype=np.int64)
+        self.values = np.asarray(values)
+        if self.values.dtype not in (np.float32, np.float64):
+            self.values = self.values.astype(np.float64)
+        if self.times.shape != self.values.shape or self.times.ndim != 1:
+            raise ValueError("times and values must be 1-D arrays of the same length")
+        if mask is None:
+            mask = np.isnan(self.values) | (self.values <= NODATA_THRESHOLD)
+        self.mask = np.asarray(mask, dtype=bool)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __repr__(self):
+        if not len(self):
+            return "GageSeries(empty)"
+        return (f"GageSeries({len(self)} values, {np.count_nonzero(self.mask)} nodata, "
+                f"{self.datetimes[0]} - {self.datetimes[-1]}, {self.values.dtype})")
+
+    @property
+    def datetimes(self):
+        """Times as a datetime64[s] view, no copy."""
+        return self.times.view("datetime64[s]")
+
+    @classmethod
+    def from_datetime64(cls, times, values, mask=None):
+        return cls(np.asarray(times).astype("datetime64[s]").view(np.int64), values, mask)
+
+    @classmethod
+    def from_dss(cls, ts, dtype=np.float32):
+        """
+        From the TimeSeriesStruct returned by HecDss.read_ts. DSS values are float32 so that is kept by default.
+        Irregular records are decoded from their integer times with the struct's granularity and julian base date.
+        """
+        if ts.empty:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=dtype))
+        values = np.asarray(ts.values, dtype=dtype)
+        mask = getattr(ts, "nodata", None)
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool) | (values <= NODATA_THRESHOLD)
+        if ts.interval <= 0:
+            return cls(dss_times_to_epoch(ts.times, *dss_time_base(ts)), values, mask)
+        # regular records only expose their times as datetimes
+        return cls.from_datetime64(np.array(ts.pytimes, dtype="datetime64[s]"), values, mask)
+
+    @classmethod
+    def from_pandas(cls, series):
+        """From a Series with a DatetimeIndex. Timezone aware indexes are converted to UTC."""
+        index = pd.DatetimeIndex(series.index)
+        if index.tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        return cls(index.as_unit("s").asi8, series.to_numpy())
+
+    def clean(self):
+        """A copy without the nodata values."""
+        keep = ~self.mask
+        return GageSeries(self.times[keep], self.values[keep], np.zeros(np.count_nonzero(keep), dtype=bool))
+
+    def window(self, start=None, end=None):
+        """Values with start <= time < end, start/end are anything np.datetime64 accepts."""
+        lo = 0 if start is None else np.searchsorted(self.times, np.datetime64(start, "s").astype(np.int64), "left")
+        hi = len(self) if end is None else np.searchsorted(self.times, np.datetime64(end, "s").astype(np.int64), "left")
+        return GageSeries(self.times[lo:hi], self.values[lo:hi], self.mask[lo:hi])
+
+    def with_values(self, values):
+        """Same times and mask with new values, e.g. after a rating table lookup."""
+        return GageSeries(self.times, values, self.mask)
+
+    def to_pandas(self, name="value", tz="UTC"):
+        """Series on a DatetimeIndex (UTC by default) with NaN for nodata."""
+        values = self.values
+        if self.mask.any():
+            values = np.where(self.mask, np.nan, values)
+        index = pd.DatetimeIndex(self.datetimes, name="time")
+        if tz is not None:
+            index = index.tz_localize(tz)
+        return pd.Series(values, index=index, name=name)
+
+    def to_container(self, pathname, units, data_type="INST"):
+        """Irregular pydsstools TimeSeriesContainer, nodata values are written as UNDEFINED."""
+        from pydsstools.core import TimeSeriesContainer, UNDEFINED
+
+        tsc = TimeSeriesContainer()
+        tsc.pathname = pathname
+        tsc.startDateTime = self.datetimes[0].astype(object).strftime(DSS_TIME_FORMAT)
+        tsc.numberValues = len(self)
+        tsc.units = units
+        tsc.type = data_type
+        tsc.interval = -1
+        tsc.values = np.where(self.mask, UNDEFINED, self.values).astype(np.float32)
+        # integer minutes from julian day 0, the DSS representation, instead of one datetime per value
+        tsc.granularity = MINUTE_GRANULARITY
+        tsc.times = epoch_to_dss_times(self.times, MINUTE_GRANULARITY)
+        return tsc
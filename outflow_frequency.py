@@ -0,0 +1,202 @@
+"""
+Outflow frequency analysis of the RES FLOW-OUT records written by elev-q_to_flow.py.
+
+The irregular outflow record is read in yearly windows, annual maxima per water year (Oct 1 - Sep 30)
+are taken with a vectorized group-by on the int64 time axis, and a Log-Pearson III curve is fitted by
+Bulletin 17-style moments of log10 Q, optionally with the station skew weighted against a regional skew.
+Years without outflow (a zero peak) are left out of the fit and the curve is adjusted for them with the
+Bulletin 17 conditional probability, so it is the unconditional AEP of the whole record.
+This is a moments fit only, not the full B17C EMA with low-outlier screening. The curve is written
+back to DSS as FREQ-FLOW-OUT paired data with the F-part of the record plus " LP3".
+
+    python outflow_frequency.py gages.dss                       # every RES FLOW-OUT record in the file
+    python outflow_frequency.py gages.dss --b 07309500 --regional-skew -0.1 --regional-skew-mse 0.302
+"""
+import argparse
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+AEPS = (0.5, 0.2, 0.1, 0.04, 0.02, 0.01, 0.005, 0.002)
+SECONDS_PER_DAY = 86400
+
+
+def water_years(times):
+    """Water year of each epoch second, Oct 1 starts the next water year."""
+    months = times.view("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    return months // 12 + 1970 + (months % 12 >= 9)
+
+
+class AnnualMaxima:
+    """
+    Accumulates the water-year maxima of a series fed in time-ordered, non-overlapping chunks
+    (e.g. the yearly windows of a DSS read), so the whole record never has to be in memory.
+    """
+
+    def __init__(self):
+        self.peaks = {}      # water year -> (peak, epoch second of the peak)
+        self.days = {}       # water year -> days with at least one value
+
+    def update(self, series):
+        series = series.clean()
+        if len(series) == 0:
+            return self
+        times, values = series.times, series.values.astype(np.float64)
+        wy = water_years(times)
+        # times are sorted so every water year is one contiguous run
+        starts = np.flatnonzero(np.concatenate(([True], wy[1:] != wy[:-1])))
+        maxima = np.maximum.reduceat(values, starts)
+        group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+        # first time each group reaches its max
+        at_max = np.flatnonzero(values == maxima[group])
+        _, first = np.unique(group[at_max], return_index=True)
+        peak_times = times[at_max[first]]
+        day = times // SECONDS_PER_DAY
+        new_day = np.concatenate(([True], (day[1:] != day[:-1]) | (wy[1:] != wy[:-1])))
+        day_counts = np.add.reduceat(new_day.astype(np.int64), starts)
+
+        for year, peak, peak_time, n_days in zip(wy[starts].tolist(), maxima.tolist(), peak_times.tolist(),
+                                                 day_counts.tolist()):
+            if year not in self.peaks or peak > self.peaks[year][0]:
+                self.peaks[year] = (peak, peak_time)
+            self.days[year] = self.days.get(year, 0) + n_days
+        return self
+
+    def to_frame(self, min_coverage=0.0):
+        """Water year, peak, peak time and coverage (fraction of days with data), dropping poorly covered years."""
+        years = sorted(self.peaks)
+        # 365 or 366 days from Oct 1 to Oct 1
+        year_days = (np.array([f"{y}-10-01" for y in years], dtype="datetime64[D]")
+                     - np.array([f"{y - 1}-10-01" for y in years], dtype="datetime64[D]"))
+        frame = pd.DataFrame({
+            "Water Year": years,
+            "Peak (cfs)": [self.peaks[y][0] for y in years],
+            "Peak Time": pd.to_datetime([self.peaks[y][1] for y in years], unit="s", utc=True),
+            "Coverage": np.array([self.days[y] for y in years], dtype=np.float64) / year_days.astype(np.int64),
+        })
+        return frame[frame["Coverage"] >= min_coverage].reset_index(drop=True)
+
+
+def station_skew_mse(skew, n):
+    """Mean square error of the station skew (Bulletin 17B approximation)."""
+    g = abs(skew)
+    a = -0.33 + 0.08 * g if g <= 0.90 else -0.52 + 0.30 * g
+    b = 0.94 - 0.26 * g if g <= 1.50 else 0.55
+    return 10 ** (a - b * np.log10(n / 10.0))
+
+
+def fit_lp3(peaks, regional_skew=None, regional_skew_mse=None):
+    """
+    Moments of log10 of the positive peaks: {"mean", "std", "skew", "station_skew", "n", "n_total",
+    "p_nonzero"}. n counts the positive peaks, n_total all of them, p_nonzero = n / n_total is the
+    probability of a year with outflow that lp3_curve uses to adjust for the zero years.
+    """
+    peaks = np.asarray(peaks, dtype=np.float64)
+    n_total = len(peaks)
+    logs = np.log10(peaks[peaks > 0])
+    n = len(logs)
+    if n < 3:
+        raise ValueError(f"need at least 3 positive annual peaks to fit a curve, got {n} of {n_total}")
+    mean = logs.mean()
+    std = logs.std(ddof=1)
+    skew = n * np.sum((logs - mean) ** 3) / ((n - 1) * (n - 2) * std ** 3) if std > 0 else 0.0
+    weighted = skew
+    if regional_skew is not None and regional_skew_mse is not None:
+        mse = station_skew_mse(skew, n)
+        weighted = (regional_skew_mse * skew + mse * regional_skew) / (regional_skew_mse + mse)
+    return {"mean": mean, "std": std, "skew": weighted, "station_skew": skew, "n": n, "n_total": n_total,
+            "p_nonzero": n / n_total}
+
+
+def frequency_factor(skew, aep):
+    """Pearson III frequency factor (Wilson-Hilferty approximation)."""
+    z = np.array([NormalDist().inv_cdf(1.0 - p) for p in np.atleast_1d(aep)])
+    if abs(skew) < 1e-6:
+        return z
+    return (2.0 / skew) * ((1.0 + skew * z / 6.0 - skew ** 2 / 36.0) ** 3 - 1.0)
+
+
+def lp3_curve(fit, aeps=AEPS):
+    """
+    Q at each AEP. The fit only describes the years with outflow, so the AEP of the whole record is
+    p = p_c * p_nonzero (Bulletin 17 conditional probability adjustment): Q at p is read from the fitted
+    curve at p_c = p / p_nonzero, and is 0 where p_c >= 1.
+    """
+    aeps = np.asarray(aeps, dtype=np.float64)
+    conditional = aeps / fit.get("p_nonzero", 1.0)
+    flows = np.zeros(len(aeps))
+    flowing = conditional < 1.0
+    if flowing.any():
+        flows[flowing] = 10 ** (fit["mean"] + frequency_factor(fit["skew"], conditional[flowing]) * fit["std"])
+    return pd.DataFrame({"AEP": aeps, "Return Period (yr)": 1.0 / aeps, "Q (cfs)": flows})
+
+
+def record_maxima(dss, pathname, start, end, block_years=1):
+    """Annual maxima of a DSS record, read in yearly windows."""
+    from stream_convert import read_window, yearly_windows
+
+    maxima = AnnualMaxima()
+    windows = yearly_windows(start, end, block_years)
+    for i, window in enumerate(windows):
+        maxima.update(read_window(dss, pathname, *window, last=i == len(windows) - 1))
+    return maxima
+
+
+def analyze(dss_file, pathnames=None, min_coverage=0.8, aeps=AEPS, regional_skew=None, regional_skew_mse=None,
+            write=True, log=print, **parts):
+    """
+    Frequency curves for the RES FLOW-OUT records of dss_file (or the given pathnames).
+    Returns {condensed pathname: (annual maxima dataframe, fit dict, curve dataframe)}.
+    """
+    from pydsstools.heclib.dss import HecDss
+    from dss_bulk import write_paired
+    from dss_catalog import DssCatalog
+    from stream_convert import split_pathname
+
+    catalog = DssCatalog.open(dss_file)
+    if pathnames is None:
+        # irregular records only, the 1HOUR RES FLOW-OUT records are the routed SSP events
+        pathnames = catalog.condensed(**{"C": "RES FLOW-OUT", "E": "IR-*", **parts})
+    results = {}
+    with HecDss.Open(dss_file) as dss:
+        for pathname in pathnames:
+            t0 = time.perf_counter()
+            start, end = catalog.time_range(pathname, dss)
+            annual = record_maxima(dss, pathname, start, end).to_frame(min_coverage)
+            fit = fit_lp3(annual["Peak (cfs)"], regional_skew, regional_skew_mse)
+            curve = lp3_curve(fit, aeps)
+            results[pathname] = (annual, fit, curve)
+            if write:
+                a, b, _, _, _, f = split_pathname(pathname)
+                write_paired(dss, f"/{a}/{b}/FREQ-FLOW-OUT///{f} LP3/", curve["AEP"] * 100.0,
+                             [curve["Q (cfs)"]], ["Computed curve"], "percent", "cfs", x_type="Probability")
+            if log:
+                log(f"{pathname}: {fit['n']} of {fit['n_total']} water years with outflow, mean {fit['mean']:.3f} std {fit['std']:.3f} "
+                    f"skew {fit['skew']:.3f} ({time.perf_counter() - t0:.2f}s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dss_file")
+    parser.add_argument("pathnames", nargs="*", help="records to analyze (default: every RES FLOW-OUT record)")
+    parser.add_argument("--b", default=None, help="only records with this B-part (wildcards allowed)")
+    parser.add_argument("--min-coverage", type=float, default=0.8,
+                        help="drop water years with data on fewer than this fraction of days")
+    parser.add_argument("--regional-skew", type=float, default=None)
+    parser.add_argument("--regional-skew-mse", type=float, default=None)
+    parser.add_argument("--no-write", action="store_true", help="don't write the curves to DSS")
+    args = parser.parse_args()
+
+    results = analyze(args.dss_file, args.pathnames or None, args.min_coverage,
+                      regional_skew=args.regional_skew, regional_skew_mse=args.regional_skew_mse,
+                      write=not args.no_write, B=args.b)
+    for pathname, (_, _, curve) in results.items():
+        print(pathname)
+        print(curve.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
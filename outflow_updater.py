@@ -0,0 +1,201 @@
+"""
+Near-real-time outflow updater.
+
+Watches a drop directory for new gage data and appends the converted outflow to the RES FLOW-OUT
+records, instead of re-running elev-q_to_flow.py over the whole record:
+
+    python outflow_updater.py gages_manifest.json --drop-dir incoming
+    python outflow_updater.py gages_manifest.json --drop-dir incoming --once      # process what is there and exit
+
+The gages and their rating curves come from the batch_convert manifest. Files dropped in the directory:
+
+    "<site number> - <site name>.csv"   a USGS download, matched to a gage by site number (the B-part)
+    "*.dss"                             any DSS file with ELEVATION records for the gages (matched on the B-part)
+
+Only readings newer than the last value already in the RES FLOW-OUT record are converted. The rating
+tables are built once at start-up and stay in memory between updates, so an update costs the new
+readings, one DSS open and the appends. With --store-elevation the new elevations are also appended
+to the gage's ELEVATION record (with the irregular E-part of the output). Processed files are moved to
+<drop-dir>/processed, files that fail to <drop-dir>/failed with the error logged.
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from pydsstools.heclib.dss import HecDss
+
+from batch_convert import load_manifest, load_rating
+from csv_import import csv_pathname, last_stored_time, read_chunks
+from dss_catalog import DssCatalog, escape
+from gage_series import GageSeries
+from stream_convert import read_window, split_pathname, with_part, write_irregular
+
+PATTERNS = ("*.csv", "*.dss")
+
+
+def newer_than(series, last):
+    """Readings of series after epoch second `last` (None for all), sorted, nodata and repeated times removed."""
+    series = series.clean()
+    order = np.argsort(series.times, kind="stable")
+    times, values = series.times[order], series.values[order]
+    keep = np.concatenate(([True], np.diff(times) > 0)) if len(times) else np.zeros(0, dtype=bool)
+    if last is not None:
+        keep &= times > last
+    return GageSeries(times[keep], values[keep])
+
+
+class OutflowUpdater:
+    def __init__(self, manifest, drop_dir, store_elevation=False, settle=0.5, log=print):
+        self.dss_file = manifest["out_dss_file"]
+        self.drop_dir = drop_dir
+        self.store_elevation = store_elevation
+        self.settle = settle
+        self.log = log
+        # one entry per gage keyed by site number (B-part), with its rating table kept warm
+        self.gages = {}
+        for gage in manifest["gages"]:
+            site = split_pathname(gage["pathname"])[1]
+            self.gages[site] = {
+                "output": with_part(gage["output"], "D", ""),
+                "elevation": with_part(with_part(gage["pathname"], "D", ""), "E", split_pathname(gage["output"])[4]),
+                "rating": load_rating(gage, gage.get("base_dir", ".")),
+                "method": gage.get("method", "nearest"),
+                "last": None,
+            }
+        with HecDss.Open(self.dss_file) as dss:
+            for site, gage in self.gages.items():
+                gage["last"] = last_stored_time(dss, gage["output"])
+                last = "empty" if gage["last"] is None else np.datetime64(gage["last"], "s")
+                self.log(f"{site}: {gage['output']} last value {last}")
+
+    def pending(self):
+        """Files in the drop directory that haven't been written to for `settle` seconds, oldest first."""
+        now = time.time()
+        files = [path for pattern in PATTERNS for path in glob.glob(os.path.join(self.drop_dir, pattern))]
+        files = [path for path in files if now - os.path.getmtime(path) >= self.settle]
+        return sorted(files, key=os.path.getmtime)
+
+    def append(self, dss, site, elevations):
+        """Convert and append the readings newer than the output record, returns the number appended."""
+        gage = self.gages[site]
+        new = newer_than(elevations, gage["last"])
+        if len(new) == 0:
+            return 0
+        flows = new.with_values(gage["rating"].lookup(new.values, method=gage["method"]))
+        if self.store_elevation:
+            write_irregular(dss, gage["elevation"], new, units="feet")
+        write_irregular(dss, gage["output"], flows, units="cfs")
+        gage["last"] = int(new.times[-1])
+        return len(new)
+
+    def read_csv(self, path):
+        """{site: elevations} from a USGS csv, the site number comes from the file name."""
+        site = split_pathname(csv_pathname(path))[1]
+        if site not in self.gages:
+            raise KeyError(f"site {site} of {os.path.basename(path)} is not in the manifest")
+        chunks = list(read_chunks(path))
+        if not chunks:
+            return {}
+        times = np.concatenate([chunk.times for chunk in chunks])
+        values = np.concatenate([chunk.values for chunk in chunks])
+        return {site: GageSeries(times, values)}
+
+    def read_dss(self, path):
+        """{site: elevations} from the ELEVATION records of a dropped DSS file, newer than each output."""
+        found = {}
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with HecDss.Open(path) as drop:
+            catalog = DssCatalog(drop.getPathnameList("*"))
+            for site, gage in self.gages.items():
+                for record in catalog.condensed(B=escape(site), C="ELEVATION"):
+                    try:
+                        start, end = catalog.time_range(record, drop)
+                    except KeyError:
+                        continue
+                    if gage["last"] is not None:
+                        start = max(start, datetime(1970, 1, 1) + timedelta(seconds=gage["last"] + 1))
+                    if start > end:
+                        continue
+                    series = read_window(drop, record, start, min(end, now), last=True)
+                    if site in found:
+                        series = GageSeries(np.concatenate((found[site].times, series.times)),
+                                            np.concatenate((found[site].values, series.values)))
+                    found[site] = series
+        return found
+
+    def process(self, path):
+        """Apply one dropped file, returns {site: values appended}."""
+        start = time.perf_counter()
+        readings = self.read_csv(path) if path.lower().endswith(".csv") else self.read_dss(path)
+        counts = {}
+        with HecDss.Open(self.dss_file) as dss:
+            for site, elevations in readings.items():
+                counts[site] = self.append(dss, site, elevations)
+        self.log(f"{os.path.basename(path)}: " + (", ".join(f"{site} +{n}" for site, n in counts.items()) or "no gages")
+                 + f" in {time.perf_counter() - start:.3f}s")
+        return counts
+
+    def _move(self, path, folder):
+        target_dir = os.path.join(self.drop_dir, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path))
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(target)
+            target = f"{stem}.{datetime.now():%Y%m%d%H%M%S%f}{ext}"
+        shutil.move(path, target)
+
+    def poll(self):
+        """Process every pending file once, returns the number of values appended."""
+        total = 0
+        for path in self.pending():
+            try:
+                total += sum(self.process(path).values())
+            except Exception as e:
+                self.log(f"FAILED {os.path.basename(path)}: {type(e).__name__}: {e}")
+                self._move(path, "failed")
+                continue
+            self._move(path, "processed")
+        return total
+
+    def run(self, interval=5.0):
+        """Poll the drop directory every `interval` seconds until interrupted."""
+        self.log(f"watching {os.path.abspath(self.drop_dir)} every {interval:g}s, Ctrl+C to stop")
+        try:
+            while True:
+                started = time.monotonic()
+                self.poll()
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.log("stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="batch_convert JSON manifest of gages and rating curves")
+    parser.add_argument("--drop-dir", default="incoming")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between polls of the drop directory")
+    parser.add_argument("--settle", type=float, default=0.5,
+                        help="only pick up files that haven't changed for this many seconds")
+    parser.add_argument("--dense-step", type=float, default=None,
+                        help="compile the ratings to dense lookup tables on this step, e.g. 0.01")
+    parser.add_argument("--store-elevation", action="store_true",
+                        help="also append the new elevations to the gage's irregular ELEVATION record")
+    parser.add_argument("--once", action="store_true", help="process the files already there and exit")
+    args = parser.parse_args()
+
+    os.makedirs(args.drop_dir, exist_ok=True)
+    updater = OutflowUpdater(load_manifest(args.manifest, dense_step=args.dense_step), args.drop_dir,
+                             store_elevation=args.store_elevation, settle=args.settle)
+    if args.once:
+        updater.settle = 0.0
+        print(f"{updater.poll()} values appended")
+    else:
+        updater.run(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Lazy plotting for the notebook scripts.
+
+matplotlib is only imported when plots are actually wanted. The mode comes from --plots on the command
+line or the PLOTS environment variable:
+
+    none  - no plots, matplotlib is never imported (the default for `python script.py`)
+    png   - every figure is written to --plot-dir as a PNG with the Agg backend by one background thread,
+            the script doesn't wait for them until plotter.close(). Threads rather than processes, so the
+            notebook scripts (top-level code, no __main__ guard) are never re-imported by spawned workers
+            on Windows
+    show  - the original plt.show() figures (the default inside Jupyter / IPython)
+
+Long series are cut down to screen resolution before plotting with min/max decimation: each of
+`bins` slices keeps its lowest and highest point, so peaks and troughs survive and a 600k point record
+becomes a few thousand points that look the same at figure width.
+
+    python elev-q_to_flow.py --plots png --plot-dir plots
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+MODES = ("none", "png", "show")
+DEFAULT_BINS = 2000
+
+
+def decimate_minmax(x, y, bins=DEFAULT_BINS):
+    """
+    Keep the min and max of y in each of `bins` equal slices, in their original order.
+    Series shorter than 2 * bins are returned unchanged. NaN values are never picked over real ones.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * bins:
+        return x, y
+    width = -(-n // bins)
+    padded = np.full(bins * width, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(bins, width)
+    missing = np.isnan(rows)
+    lo = np.where(missing, np.inf, rows).argmin(axis=1)
+    hi = np.where(missing, -np.inf, rows).argmax(axis=1)
+    offset = np.arange(bins) * width
+    # the two picks of a slice in time order, a slice with a single distinct pick keeps it once
+    idx = np.unique(np.concatenate((offset + np.minimum(lo, hi), offset + np.maximum(lo, hi))))
+    idx = idx[idx < n]
+    return x[idx], y[idx]
+
+
+def _plain_x(x):
+    """Timezone-aware indexes as naive datetime64 so they plot without object arrays."""
+    if isinstance(x, pd.DatetimeIndex):
+        return (x.tz_convert(None) if x.tz is not None else x).to_numpy()
+    if isinstance(x, (pd.Series, pd.Index)):
+        return x.to_numpy()
+    return np.asarray(x)
+
+
+def render(figure, path=None):
+    """Draw one figure spec ({x, y, title, xlabel, ylabel, label}), saved to path or shown."""
+    if path is not None:
+        return _save(figure, path)
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 5))
+    plt.plot(figure["x"], figure["y"], label=figure["label"])
+    plt.title(figure["title"])
+    plt.xlabel(figure["xlabel"])
+    plt.ylabel(figure["ylabel"])
+    plt.legend()
+    plt.grid()
+    plt.show()
+    return None
+
+
+def _save(figure, path):
+    # a Figure on the Agg canvas directly, without pyplot, so nothing is tied to the interactive backend
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(figure["x"], figure["y"], label=figure["label"])
+    ax.set_title(figure["title"])
+    ax.set_xlabel(figure["xlabel"])
+    ax.set_ylabel(figure["ylabel"])
+    ax.legend()
+    ax.grid()
+    fig.savefig(path, dpi=100)
+    return path
+
+
+class Plotter:
+    def __init__(self, mode="none", plot_dir="plots", bins=DEFAULT_BINS):
+        if mode not in MODES:
+            raise ValueError(f"plot mode must be one of {MODES}, got {mode!r}")
+        self.mode = mode
+        self.plot_dir = plot_dir
+        self.bins = bins
+        self._pool = None
+        self._futures = []
+
+    @classmethod
+    def from_args(cls, argv=None):
+        """
+        Mode from --plots / --plot-dir on the command line, else the PLOTS and PLOT_DIR environment variables.
+        Unknown arguments are ignored so this also works inside Jupyter.
+        """
+        interactive = "IPython" in sys.modules
+        parser = argparse.ArgumentParser(add_help=False)
+        parser.add_argument("--plots", choices=MODES, default=os.environ.get("PLOTS", "show" if interactive else "none"))
+        parser.add_argument("--plot-dir", default=os.environ.get("PLOT_DIR", "plots"))
+        args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+        return cls(args.plots, args.plot_dir)
+
+    @property
+    def enabled(self):
+        return self.mode != "none"
+
+    def line(self, x, y, title, xlabel, ylabel, label, filename=None):
+        """A line figure like the ones in the scripts. Nothing happens (and nothing is imported) in "none" mode."""
+        if not self.enabled:
+            return None
+        x, y = decimate_minmax(_plain_x(x), _plain_x(y), self.bins)
+        figure = {"x": x, "y": y, "title": title, "xlabel": xlabel, "ylabel": ylabel, "label": label}
+        if self.mode == "show":
+            return render(figure)
+        os.makedirs(self.plot_dir, exist_ok=True)
+        path = os.path.join(self.plot_dir, filename or title.replace(" ", "_").replace("/", "-") + ".png")
+        if self._pool is None:
+            # one thread: the figures are drawn one after the other while the script carries on
+            self._pool = ThreadPoolExecutor(max_workers=1)
+        self._futures.append(self._pool.submit(render, figure, path))
+        return path
+
+    def close(self):
+        """Wait for the PNGs still being rendered, returns their paths."""
+        if self._pool is None:
+            return []
+        paths = [future.result() for future in self._futures]
+        self._pool.shutdown()
+        self._pool = None
+        self._futures = []
+        return paths
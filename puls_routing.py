@@ -0,0 +1,252 @@
+"""
+Level-pool (modified Puls) reservoir routing on the storage-discharge curves made by elev-stor-q.py.
+
+The 2S/dt + O indication table is built once per reservoir. Each time step then solves
+
+    I1 + I2 + (2S1/dt - O1) = 2S2/dt + O2
+
+for every event at once: the events are the rows of an (events x timesteps) inflow array and the only
+Python loop is over time steps. Routing the SSP frequency events in lake_inflow_frequency_events.dss:
+
+    python puls_routing.py                 # both lakes, every "SSP {year}yr" event in the file
+    python puls_routing.py --lake lawtonka --dt 0.25
+
+The events are 1HOUR records. With another --dt the inflow is interpolated onto that step before routing
+and the results are written with the matching E-part (15MINUTE, 2HOUR, ...).
+
+Inflow that pushes the pool past the top of the storage-discharge curve is routed on the extension of the
+last segment of the curve, so no volume is lost; the events that needed it are still reported.
+"""
+import argparse
+import re
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from curve_check import repair_curve
+
+FT3_PER_ACFT = 43560.0
+
+LAKES = {
+    "lawtonka": {
+        "storage_discharge": "Lawtonka_Storage-Discharge_Curve.csv",
+        "elev_storage": "Lawtonka_Elev-Stor_Curve.csv",
+        "a": "Lake Lawtonka near Lawton, OK",
+        "b": "07309500",
+    },
+    "ellsworth": {
+        "storage_discharge": "Ellsworth_Storage-Discharge_Curve.csv",
+        "elev_storage": "Ellsworth_Elev-Stor_Curve.csv",
+        "a": "Lake Ellsworth near Elgin, OK",
+        "b": "07308990",
+    },
+}
+
+
+class RoutingResult:
+    def __init__(self, outflow, storage, stage, exceeded):
+        self.outflow = outflow          # events x timesteps, cfs
+        self.storage = storage          # events x timesteps, ac-ft
+        self.stage = stage              # events x timesteps, ft, None without an elevation-storage curve
+        self.exceeded = exceeded        # events that went past the top of the storage-discharge curve
+
+    @property
+    def peak_outflow(self):
+        return self.outflow.max(axis=-1)
+
+    @property
+    def peak_storage(self):
+        return self.storage.max(axis=-1)
+
+    @property
+    def peak_stage(self):
+        return None if self.stage is None else self.stage.max(axis=-1)
+
+
+class PulsReservoir:
+    """
+    storage (ac-ft) and outflow (cfs) are the storage-discharge curve, dt_hours the routing time step.
+    elevation_storage is an optional (elevation, storage) pair of arrays used to report stage.
+    """
+
+    def __init__(self, storage, outflow, dt_hours=1.0, elevation_storage=None):
+        # level-pool routing needs a single valued curve: keep the first of repeated storages
+        # and fit outflow non-decreasing, the curve_check actions are kept in self.repairs
+        self.storage, self.outflow, self.repairs = repair_curve(storage, outflow,
+                                                                strategies=("dropna", "dedupe", "isotonic"), keep="first")
+        self.dt_hours = float(dt_hours)
+        # 2S/dt in cfs for S in ac-ft
+        self.k = 2.0 * FT3_PER_ACFT / (self.dt_hours * 3600.0)
+        self.indication = self.k * self.storage + self.outflow
+        # storage and outflow per unit of 2S/dt + O along the last segment, used above the top of the curve
+        if len(self.storage) > 1:
+            d_ind = self.indication[-1] - self.indication[-2]
+            self.top_slope = ((self.storage[-1] - self.storage[-2]) / d_ind, (self.outflow[-1] - self.outflow[-2]) / d_ind)
+        else:
+            self.top_slope = (1.0 / self.k, 0.0)
+        if elevation_storage is not None:
+            elev, stor = (np.asarray(a, dtype=np.float64) for a in elevation_storage)
+            order = np.argsort(stor, kind="stable")
+            self.elev_storage = (elev[order], stor[order])
+        else:
+            self.elev_storage = None
+
+    @classmethod
+    def from_csv(cls, storage_discharge_csv, dt_hours=1.0, elev_storage_csv=None):
+        curve = pd.read_csv(storage_discharge_csv)
+        elevation_storage = None
+        if elev_storage_csv is not None:
+            es = pd.read_csv(elev_storage_csv).dropna(subset=["Elevation (ft)", "Storage (ac-ft)"])
+            elevation_storage = (es["Elevation (ft)"].to_numpy(), es["Storage (ac-ft)"].to_numpy())
+        return cls(curve["Storage (ac-ft)"], curve["Q (CFS)"], dt_hours, elevation_storage)
+
+    def initial_storage(self, initial_outflow):
+        """Largest storage on the curve whose outflow is <= initial_outflow (top of the pool for zero flow)."""
+        idx = np.searchsorted(self.outflow, np.asarray(initial_outflow, dtype=np.float64), side="right") - 1
+        return self.storage[np.clip(idx, 0, len(self.storage) - 1)]
+
+    def stage(self, storage):
+        if self.elev_storage is None:
+            return None
+        elev, stor = self.elev_storage
+        stage = np.interp(storage, stor, elev)
+        # above the survey, continue the last rising segment like the routing does
+        rising = np.flatnonzero(np.diff(stor) > 0)
+        above = storage > stor[-1]
+        if len(rising) and above.any():
+            i = rising[-1]
+            stage[above] = elev[i + 1] + (storage[above] - stor[i + 1]) * (elev[i + 1] - elev[i]) / (stor[i + 1] - stor[i])
+        return stage
+
+    def on_curve(self, indication):
+        """Storage and outflow for 2S/dt + O values, extrapolated along the last segment above the curve."""
+        storage = np.interp(indication, self.indication, self.storage)
+        outflow = np.interp(indication, self.indication, self.outflow)
+        above = indication > self.indication[-1]
+        if above.any():
+            extra = indication[above] - self.indication[-1]
+            storage[above] += extra * self.top_slope[0]
+            outflow[above] += extra * self.top_slope[1]
+        return storage, outflow
+
+    def route(self, inflow, initial_storage=None):
+        """
+        Route an (events x timesteps) inflow array (cfs), or a single 1-D hydrograph.
+        initial_storage defaults to the pool at the first inflow, see initial_storage().
+        """
+        inflow = np.asarray(inflow, dtype=np.float64)
+        single = inflow.ndim == 1
+        inflow = np.atleast_2d(inflow)
+        n_events, n_steps = inflow.shape
+
+        storage = np.empty((n_events, n_steps))
+        outflow = np.empty((n_events, n_steps))
+        if initial_storage is None:
+            s0 = self.initial_storage(inflow[:, 0])
+        else:
+            s0 = np.broadcast_to(np.asarray(initial_storage, dtype=np.float64), (n_events,))
+        storage[:, 0] = s0
+        outflow[:, 0] = np.interp(s0, self.storage, self.outflow)
+        top = self.indication[-1]
+        exceeded = np.zeros(n_events, dtype=bool)
+
+        for t in range(1, n_steps):
+            # I1 + I2 + (2S1/dt - O1) = 2S2/dt + O2
+            ind = inflow[:, t - 1] + inflow[:, t] + self.k * storage[:, t - 1] - outflow[:, t - 1]
+            exceeded |= ind > top
+            storage[:, t], outflow[:, t] = self.on_curve(ind)
+
+        stage = self.stage(storage)
+        if single:
+            return RoutingResult(outflow[0], storage[0], None if stage is None else stage[0], exceeded[0])
+        return RoutingResult(outflow, storage, stage, exceeded)
+
+
+def resample_events(events, from_hours, to_hours):
+    """Linearly interpolate (events x timesteps) hydrographs onto another time step with the same start."""
+    events = np.atleast_2d(np.asarray(events, dtype=np.float64))
+    n = events.shape[1]
+    if from_hours == to_hours or n < 2:
+        return events
+    pos = np.arange(0.0, (n - 1) * from_hours + 1e-9 * from_hours, to_hours) / from_hours
+    lo = np.minimum(pos.astype(np.intp), n - 2)
+    frac = pos - lo
+    return events[:, lo] * (1.0 - frac) + events[:, lo + 1] * frac
+
+
+def event_years(dss_file, a, b, c="RES FLOW-IN"):
+    """Return years of the "SSP {year}yr" events stored for a lake, from the DSS catalog."""
+    from dss_catalog import DssCatalog, escape
+
+    years = set()
+    for path in DssCatalog.open(dss_file).find(A=escape(a), B=escape(b), C=escape(c), F="SSP *yr"):
+        match = re.search(r"SSP\s+([\d.]+)yr", path, re.IGNORECASE)
+        if match:
+            years.add(match.group(1))
+    return sorted(years, key=float)
+
+
+def route_frequency_events(dss_file, lake, dt_hours=1.0, n_steps=24 * 14, start="01JAN2000 00:00:00", log=print):
+    """
+    Route every SSP frequency event of a lake (a LAKES entry) and write back to dss_file:
+    RES FLOW-OUT and ELEV time series per event, and FREQ-FLOW-OUT / FREQ-ELEV paired data of the peaks.
+    n_steps is the number of hourly inflow values read. Returns a dataframe of peaks per return year.
+    """
+    from pydsstools.heclib.dss import HecDss
+    from dss_bulk import read_events, write_events, write_paired
+    from regularize import interval_epart
+
+    # the E-part of the results, this raises for a step DSS has no regular interval for
+    epart = interval_epart(int(round(dt_hours * 3600))).upper()
+    reservoir = PulsReservoir.from_csv(lake["storage_discharge"], dt_hours, lake["elev_storage"])
+    years = event_years(dss_file, lake["a"], lake["b"])
+    if not years:
+        raise KeyError(f"no 'SSP {{year}}yr' RES FLOW-IN events for {lake['a']} in {dss_file}")
+    keys = [{"year": year} for year in years]
+    base = f"/{lake['a']}/{lake['b']}/{{c}}//{{e}}/SSP {{year}}yr/"
+    step = timedelta(hours=dt_hours)
+
+    hourly = read_events(dss_file, base.format(c="RES FLOW-IN", e="1HOUR", year="{year}"), keys, n_steps, start,
+                         timedelta(hours=1))
+    inflow = resample_events(hourly, 1.0, dt_hours)
+    t0 = time.perf_counter()
+    result = reservoir.route(inflow)
+    if log:
+        log(f"{lake['a']}: routed {len(years)} events x {inflow.shape[1]} steps of {dt_hours:g}h "
+            f"in {time.perf_counter() - t0:.4f}s")
+
+    write_events(dss_file, result.outflow, base.format(c="RES FLOW-OUT", e=epart, year="{year}"), keys, start, step,
+                 units="cfs", log=log)
+    write_events(dss_file, result.stage, base.format(c="ELEV", e=epart, year="{year}"), keys, start, step,
+                 units="ft", log=log)
+    return_period = np.array([float(year) for year in years])
+    with HecDss.Open(dss_file) as dss:
+        write_paired(dss, f"/{lake['a']}/{lake['b']}/FREQ-FLOW-OUT///SSP PULS/", return_period,
+                     [result.peak_outflow], ["Peak outflow"], "years", "cfs")
+        write_paired(dss, f"/{lake['a']}/{lake['b']}/FREQ-ELEV///SSP PULS/", return_period,
+                     [result.peak_stage], ["Peak stage"], "years", "ft")
+
+    peaks = pd.DataFrame({"Return Year": return_period, "Peak Inflow (cfs)": inflow.max(axis=1),
+                          "Peak Outflow (cfs)": result.peak_outflow, "Peak Storage (ac-ft)": result.peak_storage,
+                          "Peak Stage (ft)": result.peak_stage, "Exceeded Curve": result.exceeded})
+    if result.exceeded.any() and log:
+        log(f"{lake['a']}: {int(result.exceeded.sum())} events went past the top of the storage-discharge curve "
+            f"and were routed on its extension")
+    return peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dss", default="lake_inflow_frequency_events.dss")
+    parser.add_argument("--lake", choices=sorted(LAKES), nargs="+", default=sorted(LAKES))
+    parser.add_argument("--dt", type=float, default=1.0, help="routing time step in hours, the 1HOUR events are interpolated onto it")
+    parser.add_argument("--steps", type=int, default=24 * 14, help="hourly inflow values to read per event")
+    args = parser.parse_args()
+    for name in args.lake:
+        print(route_frequency_events(args.dss, LAKES[name], args.dt, args.steps).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
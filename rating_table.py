@@ -0,0 +1,104 @@
+"""
+Rating table used to convert reservoir elevations to discharge (or storage).
+The curve is sorted once and whole arrays of elevations are resolved in a single np.searchsorted pass,
+instead of searching the full table again for every gage reading.
+"""
+import numpy as np
+
+METHODS = ("nearest", "linear", "loglog")
+
+
+class RatingTable:
+    """
+    Sorted elevation -> value curve.
+
+    Rows with a missing elevation or value are dropped. When an elevation appears more than once
+    the first value is kept, which is what the original equality lookup in elev-q_to_flow.py returned.
+    Elevations outside the table are clamped to the first/last knot for every method.
+    """
+
+    def __init__(self, elevations, values, datum=None):
+        elevations = np.asarray(elevations, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if elevations.ndim != 1 or elevations.shape != values.shape:
+            raise ValueError("elevations and values must be 1-D arrays of the same length")
+        keep = ~(np.isnan(elevations) | np.isnan(values))
+        elevations = elevations[keep]
+        values = values[keep]
+        if len(elevations) == 0:
+            raise ValueError("rating table has no valid (elevation, value) pairs")
+
+        # stable sort so duplicate elevations keep the row that came first in the source table
+        order = np.argsort(elevations, kind="stable")
+        elevations = elevations[order]
+        values = values[order]
+        first = np.concatenate(([True], np.diff(elevations) > 0))
+        self.elevations = elevations[first]
+        self.values = values[first]
+
+        # log-log interpolation is done on (elevation - datum); by default the datum is the
+        # highest elevation that still has zero flow (e.g. the spillway crest or gate sill)
+        if datum is None:
+            zero = self.elevations[self.values <= 0]
+            datum = zero.max() if len(zero) else 0.0
+        self.datum = float(datum)
+
+    @classmethod
+    def from_dataframe(cls, df, elev_col="Elevation (ft NAVD88)", value_col="Q (CFS)", datum=None):
+        return cls(np.asarray(df[elev_col], dtype=np.float64), np.asarray(df[value_col], dtype=np.float64), datum=datum)
+
+    def __len__(self):
+        return len(self.elevations)
+
+    def __repr__(self):
+        return (f"RatingTable({len(self)} knots, "
+                f"elevation {self.elevations[0]:g} - {self.elevations[-1]:g})")
+
+    def nearest_index(self, elevations):
+        """Index of the closest knot for each elevation. Ties go to the lower knot."""
+        x = np.asarray(elevations, dtype=np.float64)
+        n = len(self.elevations)
+        if n == 1:
+            return np.zeros(x.shape, dtype=np.intp)
+        idx = np.clip(np.searchsorted(self.elevations, x, side="left"), 1, n - 1)
+        lower = self.elevations[idx - 1]
+        upper = self.elevations[idx]
+        return idx - ((x - lower) <= (upper - x))
+
+    def lookup(self, elevations, method="nearest"):
+        """
+        Resolve an array of elevations to values.
+        method is one of "nearest" (closest knot, the original behaviour), "linear" or "loglog".
+        NaN elevations give NaN.
+        """
+        x = np.asarray(elevations, dtype=np.float64)
+        if method == "nearest":
+            out = self.values[self.nearest_index(x)]
+        elif method == "linear":
+            out = np.interp(x, self.elevations, self.values)
+        elif method == "loglog":
+            out = self._loglog(x)
+        else:
+            raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+        out = np.array(out, dtype=np.float64, copy=True)
+        out[np.isnan(x)] = np.nan
+        return out
+
+    def _loglog(self, x):
+        e, v = self.elevations, self.values
+        linear = np.interp(x, e, v)
+        n = len(e)
+        if n < 2:
+            return linear
+        xc = np.clip(x, e[0], e[-1])
+        hi = np.clip(np.searchsorted(e, xc, side="right"), 1, n - 1)
+        lo = hi - 1
+        h = xc - self.datum
+        h_lo = e[lo] - self.datum
+        h_hi = e[hi] - self.datum
+        # segments touching zero flow or the datum can't be done in log space, those fall back to linear
+        ok = (v[lo] > 0) & (v[hi] > 0) & (h_lo > 0) & (h > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            exponent = np.log(v[hi] / v[lo]) / np.log(h_hi / h_lo)
+            out = v[lo] * (h / h_lo) ** exponent
+        return np.where(ok, out, linear)
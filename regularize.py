@@ -0,0 +1,188 @@
+"""
+Regularization of irregular gage series before they are written to DSS.
+
+An irregular record (IR-CENTURY) is resampled onto a regular grid (15Minute, 1Hour, ...) aligned to
+multiples of the interval. Grid points between two readings no more than max_gap apart are
+interpolated, all others (outages, the time before the first reading) are kept as missing and written
+as DSS UNDEFINED, so the regular record has one value per interval and the gaps stay visible.
+Regular records are smaller and much faster for HMS and DSSVue to read than irregular ones.
+
+    python regularize.py gages.dss "/Lake Lawtonka near Lawton, OK/07309500/RES FLOW-OUT//IR-CENTURY/USGS/" \\
+        --interval 15MIN --max-gap 2HOUR
+
+The record is streamed in yearly windows like stream_convert.convert_record, carrying the last reading
+of each window into the next so interpolation across the window boundary is seamless.
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+
+from gage_series import DSS_TIME_FORMAT, GageSeries
+from stream_convert import delete_record, read_window, record_windows, split_pathname, with_part
+
+UNITS = {"MIN": 60, "MINUTE": 60, "HR": 3600, "HOUR": 3600, "DAY": 86400}
+# E-parts for the regular intervals, as DSS 7 writes them
+E_PARTS = {60: "1Minute", 300: "5Minute", 600: "10Minute", 900: "15Minute", 1800: "30Minute",
+           3600: "1Hour", 7200: "2Hour", 21600: "6Hour", 86400: "1Day"}
+METHODS = ("linear", "previous")
+
+
+def parse_duration(text):
+    """Seconds in "15MIN", "15Minute", "1HOUR", "2Hour", "1DAY", or a plain number of seconds."""
+    if isinstance(text, (int, float)):
+        return int(text)
+    match = re.fullmatch(r"\s*(\d+)\s*([A-Za-z]*?)S?\s*", str(text))
+    if not match:
+        raise ValueError(f"can't read a duration from {text!r}")
+    count, unit = int(match.group(1)), match.group(2).upper()
+    if not unit:
+        return count
+    if unit not in UNITS:
+        raise ValueError(f"unknown unit {unit!r} in {text!r}, expected one of {sorted(UNITS)}")
+    return count * UNITS[unit]
+
+
+def interval_epart(seconds):
+    if seconds not in E_PARTS:
+        raise ValueError(f"no DSS E-part for an interval of {seconds}s, use one of {sorted(E_PARTS)}")
+    return E_PARTS[seconds]
+
+
+def regular_grid(first, last, interval):
+    """Multiples of interval (epoch seconds) from the first at or after `first` to the last at or before `last`."""
+    start = -(-first // interval) * interval
+    stop = last // interval * interval
+    return np.arange(start, stop + 1, interval, dtype=np.int64)
+
+
+def regularize(series, interval, max_gap=None, method="linear", grid=None):
+    """
+    Resample a GageSeries onto a regular grid, returns a GageSeries with a nodata mask.
+
+    interval and max_gap are seconds (or "15MIN"-style strings). A grid point gets a value when it
+    falls on a reading or between two readings at most max_gap apart (no limit for None).
+    method "linear" interpolates between the two readings, "previous" holds the earlier one.
+    grid defaults to the interval multiples covering the readings.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+    interval = parse_duration(interval)
+    series = series.clean()
+    times, values = series.times, series.values.astype(np.float64)
+    if grid is None:
+        if len(times) == 0:
+            return GageSeries(np.empty(0, np.int64), np.empty(0))
+        grid = regular_grid(times[0], times[-1], interval)
+    n = len(times)
+    if n == 0:
+        return GageSeries(grid, np.zeros(len(grid)), np.ones(len(grid), dtype=bool))
+
+    # reading at or before each grid point, and the one after it
+    after = np.searchsorted(times, grid, side="right")
+    before = after - 1
+    has_before = before >= 0
+    on_reading = has_before & (times[np.maximum(before, 0)] == grid)
+    inside = has_before & (after < n)
+    if max_gap is not None:
+        gap = times[np.minimum(after, n - 1)] - times[np.maximum(before, 0)]
+        inside &= gap <= parse_duration(max_gap)
+    valid = on_reading | inside
+
+    if method == "linear":
+        out = np.interp(grid, times, values)
+    else:
+        out = values[np.maximum(before, 0)]
+    return GageSeries(grid, out, ~valid)
+
+
+def to_regular_container(series, pathname, units, data_type="INST"):
+    """Regular pydsstools TimeSeriesContainer from a regularized GageSeries, missing values as UNDEFINED."""
+    from pydsstools.core import TimeSeriesContainer, UNDEFINED
+
+    tsc = TimeSeriesContainer()
+    tsc.pathname = pathname
+    tsc.startDateTime = series.datetimes[0].astype(object).strftime(DSS_TIME_FORMAT)
+    tsc.numberValues = len(series)
+    tsc.units = units
+    tsc.type = data_type
+    tsc.interval = 1
+    tsc.values = np.where(series.mask, UNDEFINED, series.values).astype(np.float32)
+    return tsc
+
+
+def regularize_record(dss_file, in_path, out_path=None, interval="15MIN", max_gap="1HOUR", method="linear",
+                      start=None, end=None, block_years=1, units="cfs", data_type="INST", out_dss_file=None,
+                      replace=True, log=print):
+    """
+    Regularize the irregular record in_path one window at a time and write it as a regular record.
+    out_path defaults to in_path with the E-part of the interval, start/end to the first and last value
+    stored in in_path. Returns (values written, values missing).
+    """
+    from pydsstools.heclib.dss import HecDss
+
+    seconds = parse_duration(interval)
+    if out_path is None:
+        out_path = with_part(with_part(in_path, "D", ""), "E", interval_epart(seconds))
+    written = missing = 0
+    carry = None
+    next_point = None
+    with HecDss.Open(dss_file) as dss:
+        windows = record_windows(in_path, start, end, block_years, dss=dss)
+        out = dss if out_dss_file is None else HecDss.Open(out_dss_file)
+        try:
+            if replace:
+                delete_record(out, out_path)
+            for i, (window_start, window_end) in enumerate(windows):
+                readings = read_window(dss, in_path, window_start, window_end, last=i == len(windows) - 1)
+                if len(readings) == 0:
+                    continue
+                if carry is not None:
+                    readings = GageSeries(np.concatenate((carry.times, readings.times)),
+                                          np.concatenate((carry.values, readings.values)))
+                first = readings.times[0] if next_point is None else next_point
+                grid = regular_grid(first, readings.times[-1], seconds)
+                carry = GageSeries(readings.times[-1:], readings.values[-1:])
+                if len(grid) == 0:
+                    continue
+                regular = regularize(readings, seconds, max_gap, method, grid)
+                out.put_ts(to_regular_container(regular, out_path, units, data_type))
+                next_point = int(grid[-1]) + seconds
+                written += len(regular)
+                missing += int(np.count_nonzero(regular.mask))
+                if log:
+                    log(f"{out_path} {window_start:%d%b%Y} - {window_end:%d%b%Y}: {len(regular)} values, "
+                        f"{np.count_nonzero(regular.mask)} missing")
+        finally:
+            if out is not dss:
+                out.close()
+    return written, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dss_file")
+    parser.add_argument("pathnames", nargs="+", help="irregular records to regularize")
+    parser.add_argument("--interval", default="15MIN", help="regular interval, e.g. 15MIN or 1HOUR")
+    parser.add_argument("--max-gap", default="1HOUR",
+                        help="longest stretch without readings that is still interpolated, 'none' for no limit")
+    parser.add_argument("--method", choices=METHODS, default="linear")
+    parser.add_argument("--units", default=None, help="units of the output (default: ft for ELEVATION, else cfs)")
+    parser.add_argument("--block-years", type=int, default=1)
+    parser.add_argument("--out-dss", default=None, help="write to this DSS file instead of dss_file")
+    args = parser.parse_args()
+
+    max_gap = None if args.max_gap.lower() == "none" else args.max_gap
+    start = time.perf_counter()
+    for pathname in args.pathnames:
+        units = args.units or ("ft" if split_pathname(pathname)[2].upper().startswith("ELEV") else "cfs")
+        written, missing = regularize_record(args.dss_file, pathname, interval=args.interval, max_gap=max_gap,
+                                             method=args.method, block_years=args.block_years, units=units,
+                                             out_dss_file=args.out_dss)
+        print(f"{pathname}: {written} regular values, {missing} missing")
+    print(f"done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
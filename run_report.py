@@ -0,0 +1,184 @@
+"""
+Stage timing for the conversion scripts.
+
+Each pipeline stage (Excel parsing, DSS decode, nodata filtering, the rating lookup, put_ts, ...) runs
+inside a span that records its wall time, the rows it processed, rows/s and the peak RSS of the process
+so far. Spans are always measured; they are only written out when a report file is set, one JSON object
+per line so reports from many runs can simply be concatenated and loaded with pd.read_json(lines=True).
+
+    with span("lookup") as s:
+        flows = rating.lookup(values)
+        s.rows = len(values)
+
+    @stage("excel_parse", rows=len)
+    def parse(...): ...
+
+Configured from the environment so the notebook scripts need no arguments:
+
+    RUN_REPORT=runs.jsonl           append the spans of this run to runs.jsonl
+    RUN_PROFILE=lookup              cProfile every "lookup" span, stats dumped to lookup.<run>.<n>.prof
+    RUN_TRACEMALLOC=excel_parse     trace allocations in "excel_parse", top lines to excel_parse.<run>.<n>.tracemalloc.txt
+    RUN_PROFILE_DIR=profiles        where the profile dumps go (default: the current directory)
+
+<n> counts the spans of a stage, so a stage that runs many times gets one dump per span. A profiled span
+inside another profiled span isn't profiled separately (only one cProfile can be active); its time is in
+the outer dump. Only the per-stage totals and the last `keep` records stay in memory, so long-running
+processes like outflow_updater.py don't grow.
+"""
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None if it can't be read on this platform."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Span:
+    __slots__ = ("stage", "rows", "fields")
+
+    def __init__(self, stage, rows=None, fields=None):
+        self.stage = stage
+        self.rows = rows
+        self.fields = fields or {}
+
+
+class RunReport:
+    def __init__(self, path=None, profile=(), trace_memory=(), profile_dir=".", run=None, keep=1000):
+        self.path = path
+        self.profile = set(profile)
+        self.trace_memory = set(trace_memory)
+        self.profile_dir = profile_dir
+        self.run = run or f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{os.getpid()}"
+        # the most recent records, and (seconds, rows, calls) per stage for summary()
+        self.records = deque(maxlen=keep)
+        self.totals = {}
+        self._stack = []
+        self._profiling = False
+        self._dumps = {}
+
+    @classmethod
+    def from_env(cls):
+        split = lambda name: [s.strip() for s in os.environ.get(name, "").split(",") if s.strip()]
+        return cls(os.environ.get("RUN_REPORT") or None, split("RUN_PROFILE"), split("RUN_TRACEMALLOC"),
+                   os.environ.get("RUN_PROFILE_DIR", "."))
+
+    @contextmanager
+    def span(self, stage, rows=None, **fields):
+        """Time the block, set .rows on the yielded Span if the row count is only known inside it."""
+        current = Span(stage, rows, fields)
+        profiler = cProfile.Profile() if stage in self.profile and not self._profiling else None
+        tracing = stage in self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        self._stack.append(stage)
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        if profiler:
+            try:
+                profiler.enable()
+                self._profiling = True
+            except ValueError:
+                # another profiler is already running (Python 3.12+ allows only one)
+                profiler = None
+        try:
+            yield current
+        finally:
+            if profiler:
+                profiler.disable()
+                self._profiling = False
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            if tracing:
+                self._dump_tracemalloc(stage)
+            if profiler:
+                profiler.dump_stats(self._dump_path(stage, "prof"))
+            self._record(current, started, seconds)
+
+    def stage(self, name=None, rows=None):
+        """
+        Decorator form of span(). rows is a function of the return value giving the row count,
+        e.g. rows=len.
+        """
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__) as current:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        current.rows = rows(result)
+                return result
+            return wrapper
+        return decorate
+
+    def _record(self, current, started, seconds):
+        record = {
+            "run": self.run,
+            "stage": current.stage,
+            "parent": "/".join(self._stack) or None,
+            "start": started.isoformat(timespec="milliseconds"),
+            "seconds": round(seconds, 6),
+            "rows": current.rows,
+            "rows_per_s": round(current.rows / seconds, 1) if current.rows and seconds > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+            **current.fields,
+        }
+        self.records.append(record)
+        seconds, rows, count = self.totals.get(current.stage, (0.0, 0, 0))
+        self.totals[current.stage] = (seconds + record["seconds"], rows + (current.rows or 0), count + 1)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def _dump_path(self, stage, suffix):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        n = self._dumps[stage, suffix] = self._dumps.get((stage, suffix), 0) + 1
+        return os.path.join(self.profile_dir, f"{stage}.{self.run}.{n}.{suffix}")
+
+    def _dump_tracemalloc(self, stage, top=25):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(self._dump_path(stage, "tracemalloc.txt"), "w") as f:
+            f.write(f"{stage}: traced current {current / 2 ** 20:.1f} MB, peak {peak / 2 ** 20:.1f} MB\n")
+            for stat in snapshot.statistics("lineno")[:top]:
+                f.write(f"{stat}\n")
+
+    def summary(self):
+        """Seconds and rows per stage over the spans of this run, largest total first."""
+        lines = [f"{'stage':>24} {'calls':>6} {'seconds':>10} {'rows':>12} {'rows/s':>14}"]
+        for name, (seconds, rows, count) in sorted(self.totals.items(), key=lambda item: -item[1][0]):
+            rate = f"{rows / seconds:14,.0f}" if rows and seconds > 0 else f"{'':>14}"
+            lines.append(f"{name:>24} {count:>6} {seconds:10.3f} {rows:>12} {rate}")
+        return "\n".join(lines)
+
+
+# the report of this process, configured from the environment
+report = RunReport.from_env()
+
+
+def span(stage, rows=None, **fields):
+    return report.span(stage, rows, **fields)
+
+
+def stage(name=None, rows=None):
+    return report.stage(name, rows)
@@ -0,0 +1,68 @@
+"""
+Storage-discharge curves for HMS built from an elevation-storage curve and an elevation-discharge table.
+
+The two curves are joined on elevation in one sorted pass with a RatingTable (nearest elevation like the
+original loop, or linear interpolation). The repairs are curve_check.repair_curve strategies: storage and
+discharge are fitted non-decreasing in elevation (isotonic), storage is made strictly increasing by keeping
+the highest discharge of equal storages, and collinear points, like the inside of a flat run of discharge
+(e.g. zero flow below the gate sill), are thinned out, which loses nothing for linear interpolation.
+"""
+import numpy as np
+import pandas as pd
+
+from curve_check import repair_curve
+from rating_table import RatingTable
+
+STORAGE_COLUMN = "Storage (ac-ft)"
+Q_COLUMN = "Q (CFS)"
+
+
+def build_curve(elev_storage_df, elev_discharge_df, method="nearest",
+                elev_storage_cols=("Elevation (ft)", "Storage (ac-ft)"),
+                elev_discharge_cols=("Elevation (ft NAVD88)", "Q (CFS)"),
+                decimals=2, include_elevation=False, dense_step=None):
+    """
+    Storage-discharge table for one reservoir.
+
+    method is passed to RatingTable.lookup ("nearest", "linear" or "loglog").
+    With dense_step the discharge table is compiled to a dense_table.DenseTable on that step (cached in
+    .curve_cache/) and the join is a single array index; survey elevations on the step give the same Q.
+    The returned dataframe has df.attrs["repairs"] with the curve_check actions applied to the
+    elevation-storage, elevation-discharge and storage-discharge curves.
+    """
+    elev_col, stor_col = elev_storage_cols
+    # repeated survey elevations are averaged, storage fitted non-decreasing
+    elev, stor, storage_actions = repair_curve(elev_storage_df[elev_col], elev_storage_df[stor_col],
+                                               strategies=("dropna", "dedupe", "isotonic"), keep="mean")
+
+    rating = RatingTable.from_dataframe(elev_discharge_df, *elev_discharge_cols)
+    if dense_step is not None:
+        from dense_table import compile_table
+        rating = compile_table(rating, method, dense_step)
+    _, q, discharge_actions = repair_curve(elev, rating.lookup(elev, method=method), strategies=("isotonic",))
+    if decimals is not None:
+        # rounding never makes a non-decreasing column decrease
+        q = np.round(q, decimals)
+
+    # storage has to be strictly increasing for HMS: keep the last (highest Q) row of equal storages,
+    # then drop the points linear interpolation doesn't need
+    curve_stor, curve_q, curve_actions = repair_curve(stor, q, strategies=("dedupe", "thin"), keep="last",
+                                                      max_error=0.0)
+
+    columns = {STORAGE_COLUMN: curve_stor, Q_COLUMN: curve_q}
+    if include_elevation:
+        # kept storages are values of `stor`, the last of equal ones like dedupe keeps
+        columns = {elev_col: elev[np.searchsorted(stor, curve_stor, side="right") - 1], **columns}
+    curve = pd.DataFrame(columns)
+    curve.attrs["repairs"] = {"elev_storage": storage_actions, "elev_discharge": discharge_actions,
+                              "storage_discharge": curve_actions}
+    return curve
+
+
+def build_curves(reservoirs, **kwargs):
+    """
+    Build curves for many reservoirs in one call.
+    reservoirs is {name: (elev_storage_df, elev_discharge_df)}, returns {name: storage-discharge df}.
+    """
+    return {name: build_curve(elev_storage_df, elev_discharge_df, **kwargs)
+            for name, (elev_storage_df, elev_discharge_df) in reservoirs.items()}
@@ -0,0 +1,139 @@
+"""
+Streaming elevation -> outflow conversion over DSS time series.
+
+The ELEVATION record is read in bounded time windows (yearly blocks by default), each window is masked
+for nodata, run through the rating table and written to the RES FLOW-OUT record before the next one is
+read, so peak memory depends on the window length and not on the length of the record.
+"""
+from datetime import datetime
+
+import numpy as np
+from pydsstools.heclib.dss import HecDss
+
+from gage_series import DSS_TIME_FORMAT, GageSeries
+from run_report import span
+
+
+def split_pathname(pathname):
+    """Return the A-F parts of a /A/B/C/D/E/F/ pathname."""
+    parts = pathname.split("/")
+    if len(parts) != 8 or parts[0] != "" or parts[-1] != "":
+        raise ValueError(f"not a DSS pathname: {pathname!r}")
+    return parts[1:7]
+
+
+def with_part(pathname, part, value):
+    """Replace one of the A-F parts of a pathname, e.g. with_part(path, "C", "RES FLOW-OUT")."""
+    parts = split_pathname(pathname)
+    parts["ABCDEF".index(part.upper())] = value
+    return "/" + "/".join(parts) + "/"
+
+
+def dpart_range(pathname):
+    """Parse a condensed D-part such as "01Oct2007 - 25Jun2025" into (start, end) datetimes."""
+    dpart = split_pathname(pathname)[3]
+    if " - " not in dpart:
+        raise ValueError(f"D-part {dpart!r} is not a date range, pass start and end explicitly")
+    start, end = (datetime.strptime(text.strip(), "%d%b%Y") for text in dpart.split(" - "))
+    # the D-part only has the day, so include everything up to the end of the last day
+    return start, end.replace(hour=23, minute=59, second=59)
+
+
+def yearly_windows(start, end, years=1):
+    """Split [start, end] into blocks that start on Jan 1st, each `years` long."""
+    if years < 1:
+        raise ValueError("years must be >= 1")
+    windows = []
+    window_start = start
+    while window_start <= end:
+        window_end = datetime(window_start.year + years, 1, 1)
+        windows.append((window_start, min(window_end, end)))
+        window_start = window_end
+    return windows
+
+
+def read_window(dss, pathname, window_start, window_end, last=False):
+    """
+    Read one window of a record as a GageSeries without the nodata values.
+    DSS windows include both ends, so values on the end time are left for the next window unless last=True.
+    """
+    with span("dss_decode", pathname=pathname) as s:
+        ts = dss.read_ts(with_part(pathname, "D", ""),
+                         window=(window_start.strftime(DSS_TIME_FORMAT), window_end.strftime(DSS_TIME_FORMAT)))
+        series = GageSeries.from_dss(ts, dtype=np.float64)
+        s.rows = len(series)
+    with span("nodata_filter", rows=len(series)):
+        series = series.clean()
+        if not last:
+            series = series.window(end=window_end)
+    return series
+
+
+def delete_record(dss, pathname):
+    """
+    Delete every block of a record. deletePathname only removes the one block named exactly, so the
+    blocks are listed from the file; the D-part of `pathname` is ignored. Returns the number deleted.
+    """
+    blocks = dss.getPathnameList(with_part(pathname, "D", "*"))
+    for block in blocks:
+        dss.deletePathname(block)
+    return len(blocks)
+
+
+def write_irregular(dss, pathname, series, units="cfs", data_type="INST"):
+    with span("put_ts", rows=len(series), pathname=pathname):
+        dss.put_ts(series.to_container(pathname, units, data_type))
+
+
+def record_windows(elev_path, start=None, end=None, block_years=1, dss=None):
+    """
+    Windows covering [start, end]. With the open `dss` they default to the range of the values stored in
+    the record (see DssCatalog.time_range), otherwise to the range in the D-part of `elev_path`.
+    """
+    if start is None or end is None:
+        if dss is not None:
+            from dss_catalog import DssCatalog
+
+            blocks = dss.getPathnameList(with_part(elev_path, "D", "*"))
+            d_start, d_end = DssCatalog(blocks).time_range(elev_path, dss)
+        else:
+            d_start, d_end = dpart_range(elev_path)
+        start = start or d_start
+        end = end or d_end
+    return yearly_windows(start, end, block_years)
+
+
+def iter_converted(dss, elev_path, rating, windows, method="nearest"):
+    """Yield (window, outflow GageSeries) for each window of the elevation record that has data."""
+    for i, window in enumerate(windows):
+        elevations = read_window(dss, elev_path, *window, last=i == len(windows) - 1)
+        if len(elevations) == 0:
+            continue
+        with span("lookup", rows=len(elevations)):
+            flows = elevations.with_values(rating.lookup(elevations.values, method=method))
+        yield window, flows
+
+
+def convert_record(dss_file, elev_path, out_path, rating, method="nearest", start=None, end=None,
+                   block_years=1, out_dss_file=None, replace=True, log=print):
+    """
+    Convert the elevation record `elev_path` to outflow with `rating` (a RatingTable) one window at a time
+    and write it to the irregular record `out_path`. start/end default to the range of the values stored
+    in `elev_path`. Returns the number of values written.
+    """
+    total = 0
+    with HecDss.Open(dss_file) as dss:
+        windows = record_windows(elev_path, start, end, block_years, dss=dss)
+        out = dss if out_dss_file is None else HecDss.Open(out_dss_file)
+        try:
+            if replace:
+                delete_record(out, out_path)
+            for (window_start, window_end), flows in iter_converted(dss, elev_path, rating, windows, method):
+                write_irregular(out, out_path, flows)
+                total += len(flows)
+                if log:
+                    log(f"{out_path} {window_start:%d%b%Y} - {window_end:%d%b%Y}: {len(flows)} values")
+        finally:
+            if out is not dss:
+                out.close()
+    return total
@@ -0,0 +1,93 @@
+"""
+Synthetic inputs shaped like the real ones, for benchmarks and for trying the scripts without gages.dss
+or the SSP workbooks.
+
+    elev_storage_curve     - Elevation (ft) / Storage (ac-ft) survey like Lawtonka_Elev-Stor_Curve.csv
+    discharge_sheet        - a raw "... DISCHARGE RATES" sheet in the LAKE DISCHARGE CALCULATOR.xlsx layout
+                             (as read with header=None, so it goes through parse_discharge_sheet)
+    write_discharge_workbook
+    elevation_series       - irregular 15-minute gage elevations with DSS nodata values and gaps
+
+Everything takes a seed so a benchmark run sees the same data every time.
+"""
+import numpy as np
+import pandas as pd
+
+from discharge_sheets import DATA_ROW, ELEV_COL, HEADER_ROW, Q_COL, UNITS_ROW
+from gage_series import GageSeries
+
+DSS_NODATA = -3.4028235e+38
+BOTTOM = 1337.9
+SILL = 1343.35
+TOP = 1355.55
+
+
+def elev_storage_curve(n, bottom=BOTTOM, top=TOP, seed=0):
+    """n point elevation-storage survey, storage grows like depth ** 2.2 with a little survey noise."""
+    rng = np.random.default_rng(seed)
+    elev = np.round(np.linspace(bottom, top, n), 6)
+    depth = elev - (bottom - 40.0)
+    storage = 15.0 * depth ** 2.2
+    # noise well below the step between points so the survey stays increasing
+    storage += rng.normal(0, 0.01, n) * np.gradient(storage)
+    return pd.DataFrame({"Elevation (ft)": elev, "Storage (ac-ft)": np.round(storage, 2)})
+
+
+def rating_curve(n, sill=SILL, top=TOP):
+    """Elevation / Q of a gated spillway: zero flow at the sill, then a weir-like power curve."""
+    elev = np.round(np.linspace(sill, top, n), 6)
+    q = np.round(300.0 * (elev - sill) ** 1.5, 2)
+    return elev, q
+
+
+def discharge_sheet(n, sill=SILL, top=TOP):
+    """
+    A raw discharge sheet with n rating rows: the header and units rows where parse_discharge_sheet
+    looks for them, the elevations in the LAKE ELEVATION column and the flow in the TOTAL column.
+    """
+    elev, q = rating_curve(n, sill, top)
+    raw = pd.DataFrame(np.full((DATA_ROW + n, Q_COL + 1), np.nan, dtype=object))
+    raw.iat[0, 0] = "SYNTHETIC LAKE DISCHARGE RATES"
+    raw.iat[HEADER_ROW, 0] = "TOP OF GATE EL."
+    raw.iat[HEADER_ROW, ELEV_COL] = "LAKE ELEVATION"
+    raw.iat[HEADER_ROW, Q_COL] = "TOTAL"
+    raw.iat[UNITS_ROW, 0] = "(NGVD FT)."
+    raw.iat[UNITS_ROW, ELEV_COL] = "(NGVD FT)"
+    raw.iat[UNITS_ROW, Q_COL] = "Q (cfs)"
+    raw.iloc[DATA_ROW:, 0] = sill
+    raw.iloc[DATA_ROW:, ELEV_COL] = elev
+    raw.iloc[DATA_ROW:, Q_COL] = q
+    return raw
+
+
+def write_discharge_workbook(path, sheets):
+    """Write {sheet name: number of rating rows} as an .xlsx in the calculator layout."""
+    with pd.ExcelWriter(path) as writer:
+        for name, n in sheets.items():
+            discharge_sheet(n).to_excel(writer, sheet_name=name, header=False, index=False)
+    return path
+
+
+def elevation_series(n, nodata_rate=0.01, gap_rate=0.0005, step_minutes=15, start="2005-10-01",
+                     bottom=BOTTOM, top=TOP, seed=0):
+    """
+    n irregular readings about step_minutes apart: a slow random walk between bottom and top, a fraction
+    nodata_rate of the values set to the DSS nodata value and a fraction gap_rate followed by a missing
+    stretch of up to a few days, like the outages in the USGS records.
+    """
+    rng = np.random.default_rng(seed)
+    step = step_minutes * 60
+    # jitter of up to a minute, and gaps of 1 hour to 3 days
+    dt = np.full(n, step, dtype=np.int64) + rng.integers(-60, 61, n)
+    gaps = rng.random(n) < gap_rate
+    dt[gaps] += rng.integers(3600, 3 * 86400, np.count_nonzero(gaps))
+    dt[0] = 0
+    times = np.datetime64(start, "s").astype(np.int64) + np.cumsum(dt)
+
+    walk = np.cumsum(rng.normal(0, 0.01, n))
+    span = walk.max() - walk.min() or 1.0
+    values = bottom + (walk - walk.min()) / span * (top - bottom)
+    values = np.round(values, 2)
+    nodata = rng.random(n) < nodata_rate
+    values[nodata] = DSS_NODATA
+    return GageSeries(times, values.astype(np.float32))
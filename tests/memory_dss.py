@@ -0,0 +1,61 @@
+"""
+Irregular DSS records held in memory, for tests of the code that only needs getPathnameList, read_ts,
+put_ts and deletePathname. read_ts returns the integer times with the granularity and julian base date the
+way pydsstools 2.x TimeSeriesStruct does.
+"""
+import fnmatch
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from gage_series import DSS_TIME_FORMAT, JULIAN_1970, MINUTE_GRANULARITY
+from stream_convert import split_pathname, with_part
+
+
+class MemoryTs:
+    interval = -1
+    granularity = MINUTE_GRANULARITY
+    _julian_base_date = {"julianBaseDate": 0, "startJulianDate": 0}
+
+    def __init__(self, times, values):
+        self.times = (np.asarray(times, dtype=np.int64) // 60 + JULIAN_1970 * 1440).tolist()
+        self.values = np.asarray(values, dtype=np.float32)
+        self.nodata = np.zeros(len(self.values), dtype=bool)
+        self.empty = len(self.values) == 0
+
+
+class MemoryDss:
+    def __init__(self, records=None):
+        # {block pathname: (epoch seconds, values)}
+        self.records = dict(records or {})
+
+    def getPathnameList(self, pattern):
+        return [path for path in self.records if fnmatch.fnmatchcase(path.upper(), pattern.upper())]
+
+    def deletePathname(self, pathname):
+        self.records.pop(pathname, None)
+
+    def put_ts(self, tsc):
+        # irregular container with integer minute times, merged into the block of its first value
+        times = (np.asarray(tsc.times, dtype=np.int64) - JULIAN_1970 * 1440) * 60
+        century = (datetime(1970, 1, 1) + timedelta(seconds=int(times[0]))).year // 100 * 100
+        block = block_path(tsc.pathname, f"01Jan{century}")
+        stored = dict(zip(*(np.asarray(column).tolist() for column in self.records.get(block, ([], [])))))
+        stored.update(zip(times.tolist(), np.asarray(tsc.values, dtype=np.float64).tolist()))
+        merged = sorted(stored.items())
+        self.records[block] = ([t for t, _ in merged], [v for _, v in merged])
+
+    def read_ts(self, pathname, window):
+        start, end = (int((datetime.strptime(text, DSS_TIME_FORMAT) - datetime(1970, 1, 1)).total_seconds())
+                      for text in window)
+        blocks = [self.records[path] for path in self.getPathnameList(with_part(pathname, "D", "*"))]
+        times = np.concatenate([np.asarray(t, dtype=np.int64) for t, _ in blocks] or [np.empty(0, np.int64)])
+        values = np.concatenate([np.asarray(v, dtype=np.float64) for _, v in blocks] or [np.empty(0)])
+        inside = (times >= start) & (times <= end)
+        order = np.argsort(times[inside], kind="stable")
+        return MemoryTs(times[inside][order], values[inside][order])
+
+
+def block_path(pathname, dpart):
+    a, b, c, _, e, f = split_pathname(pathname)
+    return f"/{a}/{b}/{c}/{dpart}/{e}/{f}/"
@@ -0,0 +1,74 @@
+"""Incremental CSV import: repeated timestamps and rows out of time order."""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import csv_import
+from gage_series import MINUTE_GRANULARITY, GageSeries, epoch_to_dss_times
+from memory_dss import MemoryDss
+
+PATH = "/Lake Lawtonka near Lawton, OK/07309500/ELEVATION//IR-CENTURY/USGS/"
+
+
+@pytest.fixture(autouse=True)
+def plain_containers(monkeypatch):
+    # the fields put_ts reads, without the pydsstools 2.x TimeSeriesContainer
+    def to_container(self, pathname, units, data_type="INST"):
+        return SimpleNamespace(pathname=pathname, units=units, type=data_type, interval=-1,
+                               granularity=MINUTE_GRANULARITY, times=epoch_to_dss_times(self.times),
+                               values=self.values.astype(np.float32))
+    monkeypatch.setattr(GageSeries, "to_container", to_container)
+
+
+def write_csv(path, stamps, values):
+    times = pd.to_datetime(stamps).strftime(csv_import.TIME_FORMAT)
+    pd.DataFrame({csv_import.TIME_COLUMN: times, csv_import.VALUE_COLUMN: values}).to_csv(path, index=False)
+    return str(path)
+
+
+def stored(dss):
+    ts = dss.read_ts(PATH, ("01Jan1900 00:00:00", "31Dec2099 23:59:59"))
+    return GageSeries.from_dss(ts)
+
+
+def epoch(stamp):
+    return int(pd.Timestamp(stamp).timestamp())
+
+
+def test_csv_pathname():
+    assert csv_import.csv_pathname("data/07309500 - Lake Lawtonka near Lawton, OK.csv") == PATH
+    with pytest.raises(ValueError):
+        csv_import.csv_pathname("lawtonka.csv")
+
+
+def test_repeated_and_out_of_order_rows(tmp_path):
+    dss = MemoryDss()
+    # 00:15 repeated within the first chunk, 00:30 repeated across chunks,
+    # 00:45 and 00:05 turn up after later readings were written
+    stamps = ["2024-06-01 00:15", "2024-06-01 00:00", "2024-06-01 00:15",
+              "2024-06-01 01:00", "2024-06-01 00:30", "2024-06-01 01:15",
+              "2024-06-01 00:30", "2024-06-01 00:45", "2024-06-01 00:05"]
+    values = [2.0, 1.0, 9.0, 5.0, 3.0, 6.0, 9.0, 4.0, 1.5]
+    csv_file = write_csv(tmp_path / "a.csv", stamps, values)
+
+    written, skipped = csv_import.import_csv(dss, csv_file, PATH, chunksize=3, log=None)
+    assert (written, skipped) == (7, 2)
+    series = stored(dss)
+    minutes = [0, 5, 15, 30, 45, 60, 75]
+    assert np.array_equal(series.times, [epoch("2024-06-01") + 60 * m for m in minutes])
+    # the first of each repeated timestamp is kept
+    assert np.array_equal(series.values, np.float32([1.0, 1.5, 2.0, 3.0, 4.0, 5.0, 6.0]))
+
+
+def test_reimport_only_writes_newer_readings(tmp_path):
+    dss = MemoryDss()
+    stamps = ["2024-06-01 00:00", "2024-06-01 00:15", "2024-06-01 00:30"]
+    csv_import.import_csv(dss, write_csv(tmp_path / "a.csv", stamps, [1.0, 2.0, 3.0]), PATH, log=None)
+
+    # the refreshed CSV repeats the stored readings with other values and adds two new ones
+    stamps += ["2024-06-01 00:45", "2024-06-01 01:00"]
+    csv_file = write_csv(tmp_path / "b.csv", stamps, [7.0, 7.0, 7.0, 4.0, 5.0])
+    assert csv_import.import_csv(dss, csv_file, PATH, chunksize=2, log=None) == (2, 3)
+    assert np.array_equal(stored(dss).values, np.float32([1.0, 2.0, 3.0, 4.0, 5.0]))
@@ -0,0 +1,51 @@
+"""Pool adjacent violators and Douglas-Peucker thinning of curve_check.py."""
+import numpy as np
+
+from curve_check import isotonic, repair_curve, thin
+
+
+def test_isotonic_is_monotone_and_least_squares():
+    rng = np.random.default_rng(5)
+    y = np.cumsum(rng.normal(0.2, 1.0, 500))
+    w = rng.uniform(0.5, 3.0, len(y))
+    for weights in (None, w):
+        fitted = isotonic(y, weights)
+        assert np.all(np.diff(fitted) >= 0)
+        # each pooled block is the weighted mean of its points, so the weighted total is unchanged
+        total = np.ones(len(y)) if weights is None else weights
+        assert np.isclose(np.sum(total * fitted), np.sum(total * y))
+    # a dip is averaged with its neighbour instead of raised to the peak
+    assert np.array_equal(isotonic([1.0, 3.0, 2.0, 4.0]), [1.0, 2.5, 2.5, 4.0])
+    assert np.allclose(isotonic([1.0, 3.0, 2.0, 4.0], [1.0, 1.0, 3.0, 1.0]), [1.0, 2.25, 2.25, 4.0])
+
+
+def test_isotonic_leaves_monotone_input_unchanged():
+    y = np.array([0.0, 0.0, 1.0, 1.5, 1.5, 10.0])
+    assert np.array_equal(isotonic(y), y)
+    assert np.array_equal(isotonic(y, np.arange(1.0, 7.0)), y)
+    x, fitted, actions = repair_curve(np.arange(6.0), y)
+    assert np.array_equal(fitted, y) and actions[-1]["changed"] == 0
+
+
+def test_thin_keeps_the_endpoints_and_stays_within_tolerance():
+    x = np.linspace(1300.0, 1360.0, 2001)
+    y = 50.0 * (x - 1300.0) ** 1.5 + np.where(x > 1340.0, 400.0 * (x - 1340.0) ** 2, 0.0)
+    for max_error in (0.5, 5.0, 50.0):
+        keep, error = thin(x, y, max_error)
+        assert keep[0] and keep[-1]
+        assert error <= max_error
+        assert np.abs(np.interp(x, x[keep], y[keep]) - y).max() == error
+    # a looser tolerance never needs more knots
+    counts = [np.count_nonzero(thin(x, y, e)[0]) for e in (0.5, 5.0, 50.0)]
+    assert counts == sorted(counts, reverse=True) and counts[-1] < len(x) // 10
+
+    keep, _ = thin(x, y, 0.5, max_points=10)
+    assert np.count_nonzero(keep) == 10 and keep[0] and keep[-1]
+
+
+def test_thin_without_tolerance_only_drops_collinear_points():
+    x = np.arange(7.0)
+    y = np.array([0.0, 1.0, 2.0, 3.0, 5.0, 7.0, 7.5])
+    keep, error = thin(x, y)
+    assert keep.tolist() == [True, False, False, True, False, True, True]
+    assert error == 0.0
@@ -0,0 +1,56 @@
+"""Compiled DenseTable lookups against the RatingTable they come from."""
+import os
+
+import numpy as np
+import pytest
+
+from bench_rating_table import synthetic_rating
+from dense_table import DenseTable, compile_table
+from rating_table import RatingTable
+
+
+@pytest.fixture(scope="module")
+def rating():
+    return RatingTable.from_dataframe(synthetic_rating())
+
+
+def readings(rating, n=200_000, seed=3):
+    rng = np.random.default_rng(seed)
+    low, high = rating.elevations[0], rating.elevations[-1]
+    x = rng.uniform(low - 1.0, high + 1.0, n)
+    mid = 0.5 * (rating.elevations[1:] + rating.elevations[:-1])
+    # gage heights to 0.01 ft, arbitrary floats, and the knot midpoints where nearest switches knot
+    return np.concatenate((np.round(x[: n // 2], 2), x[n // 2:], mid, mid + 1e-12, mid - 1e-12))
+
+
+def test_nearest_equals_the_rating(rating, tmp_path):
+    table = compile_table(rating, "nearest", cache_dir=str(tmp_path))
+    assert table.max_error == 0.0
+    for x in (readings(rating), readings(rating).astype(np.float32)):
+        assert np.array_equal(table.lookup(x), rating.lookup(x, "nearest"))
+    assert np.isnan(table.lookup([np.nan])[0])
+
+
+@pytest.mark.parametrize("method", ["linear", "loglog"])
+def test_interpolated_tables_stay_within_tolerance(rating, method, tmp_path):
+    tolerance = 0.001 * float(np.ptp(rating.values))
+    table = compile_table(rating, method, cache_dir=str(tmp_path))
+    assert table.max_error <= tolerance
+    x = readings(rating)
+    error = np.abs(table.lookup(x) - rating.lookup(x, method))
+    assert error.max() <= tolerance
+    # a tighter tolerance halves the step until it holds
+    fine = compile_table(rating, method, tolerance=tolerance / 100, cache_dir=None)
+    assert fine.step < table.step
+    assert np.abs(fine.lookup(x) - rating.lookup(x, method)).max() <= tolerance / 100
+    with pytest.raises(ValueError):
+        table.lookup(x, "nearest")
+
+
+def test_cached_table_loads_back(rating, tmp_path):
+    table = compile_table(rating, "nearest", cache_dir=str(tmp_path))
+    (cached,) = os.listdir(tmp_path)
+    loaded = compile_table(rating, "nearest", cache_dir=str(tmp_path))
+    assert np.array_equal(loaded.values, table.values) and np.array_equal(loaded.ambiguous, table.ambiguous)
+    x = readings(rating, n=10_000)
+    assert np.array_equal(DenseTable.load(os.path.join(tmp_path, cached)).lookup(x), rating.lookup(x, "nearest"))
@@ -0,0 +1,75 @@
+"""DssCatalog queries on in-memory pathname lists."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from dss_catalog import DssCatalog, block_end, escape
+from memory_dss import MemoryDss, block_path
+
+LAWTONKA = "/Lake Lawtonka near Lawton, OK/07309500/ELEVATION/{}/IR-CENTURY/USGS/"
+ELLSWORTH = "/Lake Ellsworth near Elgin, OK/07308990/ELEVATION/{}/15Minute/USGS/"
+PATHS = ([LAWTONKA.format(d) for d in ("01Jan1900", "01Jan2000")]
+         + [ELLSWORTH.format(f"01Jan{year}") for year in (2025, 2007, 2016)]
+         + ["/Lake Ellsworth near Elgin, OK/07308990/STOR-ELEV///SURVEY/"])
+
+
+def epoch(*args):
+    return int((datetime(*args) - datetime(1970, 1, 1)).total_seconds())
+
+
+def test_condensed_collapses_the_block_dparts():
+    catalog = DssCatalog(PATHS)
+    assert catalog.condensed(C="ELEVATION") == [
+        "/Lake Ellsworth near Elgin, OK/07308990/ELEVATION/01Jan2007 - 01Jan2025/15Minute/USGS/",
+        "/Lake Lawtonka near Lawton, OK/07309500/ELEVATION/01Jan1900 - 01Jan2000/IR-CENTURY/USGS/",
+    ]
+    # records without a dated D-part keep an empty one, parts match case-insensitively
+    assert catalog.condensed(c="stor-*") == ["/Lake Ellsworth near Elgin, OK/07308990/STOR-ELEV///SURVEY/"]
+    assert len(catalog.find(B="07308990", C="ELEVATION")) == 3
+
+
+def test_literal_values_are_escaped():
+    names = ["Lake [North]", "Lake N", "Lake *", "Lake X", "Lake (A).?", "Lake (A).B"]
+    catalog = DssCatalog([f"/{name}/1/FLOW/01Jan2000/IR-CENTURY/USGS/" for name in names])
+    # unescaped, "[North]" is a character class and "*" / "?" are wildcards
+    assert len(catalog.find(A="Lake [North]")) == 1 and catalog.find(A="Lake [North]")[0].startswith("/Lake N/")
+    assert len(catalog.find(A="Lake *")) == len(names)
+    for name in names:
+        assert [path.split("/")[1] for path in catalog.find(A=escape(name))] == [name]
+
+
+def test_time_range_of_the_blocks_and_of_the_stored_values():
+    catalog = DssCatalog(PATHS)
+    path = LAWTONKA.format("")
+    assert catalog.time_range(path) == (datetime(1900, 1, 1), datetime(2100, 1, 1))
+    assert catalog.time_range(ELLSWORTH.format("")) == (datetime(2007, 1, 1), datetime(2026, 1, 1))
+
+    dss = MemoryDss({block_path(path, "01Jan1900"): ([epoch(1999, 12, 31, 23, 45)], [1340.0]),
+                     block_path(path, "01Jan2000"): ([epoch(2007, 10, 1), epoch(2025, 6, 25, 12)], [1341.0, 1342.0])})
+    assert catalog.time_range(path, dss) == (datetime(1999, 12, 31, 23, 45), datetime(2025, 6, 25, 12))
+    assert catalog.last_time(dss, path) == epoch(2025, 6, 25, 12)
+
+    # nodata only in the last block: the range ends in the block before it
+    dss.records[block_path(path, "01Jan2000")] = ([epoch(2007, 10, 1)], [-3.4028235e+38])
+    assert catalog.time_range(path, dss) == (datetime(1999, 12, 31, 23, 45), datetime(1999, 12, 31, 23, 45))
+    dss.records.clear()
+    assert catalog.value_range(dss, path) is None
+    with pytest.raises(KeyError):
+        catalog.time_range(path, dss)
+
+
+def test_block_end():
+    assert block_end(datetime(2024, 2, 1), "IR-MONTH") == datetime(2024, 2, 29, 23, 59, 59)
+    assert block_end(datetime(2024, 2, 3), "IR-DAY") == datetime(2024, 2, 3, 23, 59, 59)
+    assert block_end(datetime(2000, 1, 1), "IR-DECADE") == datetime(2010, 1, 1)
+    assert block_end(datetime(2007, 1, 1), "1Day") == datetime(2017, 1, 1)
+    assert block_end(datetime(2007, 1, 1), "1Month") == datetime(2107, 1, 1)
+
+
+def test_saved_catalog_round_trip(tmp_path):
+    catalog = DssCatalog(PATHS)
+    catalog.save(str(tmp_path / "x.catalog.npz"), 1.0, 2)
+    with np.load(tmp_path / "x.catalog.npz") as npz:
+        loaded = DssCatalog.from_parts(npz["parts"])
+    assert loaded.condensed() == catalog.condensed()
@@ -0,0 +1,52 @@
+"""extend_curve against the 0.1 ft loop it replaced in elev-stor-q.py."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from discharge_sheets import load_discharge_sheet
+from elev_storage import extend_curve
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAKES = [("Lawtonka_Elev-Stor_Curve.xlsx", "LAWTONKA DISCHARGE RATES"),
+         ("Ellsworth_Elev-Stor_Curve.xlsx", "ELLSWORTH DISCHARGE RATES")]
+
+
+# the original loop from elev-stor-q.py
+def extrapolate_elev_storage(df, slope, max_elev):
+    last_elev = df["Elevation (ft)"].iloc[-1]
+    last_storage = df["Storage (ac-ft)"].iloc[-1]
+    new_rows = []
+    while last_elev < max_elev:
+        last_elev += 0.1  # increment elevation by 0.1 ft
+        last_storage += slope * 0.1  # calculate new storage using the slope
+        new_rows.append({"Elevation (ft)": last_elev, "Storage (ac-ft)": last_storage})
+    if new_rows:
+        df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
+    return df
+
+
+@pytest.mark.parametrize("survey, sheet", LAKES)
+def test_slope_extension_matches_loop(survey, sheet, tmp_path):
+    df = pd.read_excel(os.path.join(ROOT, survey))
+    # the cleaning the script did before extrapolating
+    df = df.drop_duplicates(subset=["Elevation (ft)"], keep="first").dropna(subset=["Elevation (ft)"])
+    max_elev = load_discharge_sheet(os.path.join(ROOT, "LAKE DISCHARGE CALCULATOR.xlsx"), sheet,
+                                    cache_dir=str(tmp_path))["Elevation (ft NAVD88)"].max()
+    slope = ((df["Storage (ac-ft)"].iloc[-1] - df["Storage (ac-ft)"].iloc[-2])
+             / (df["Elevation (ft)"].iloc[-1] - df["Elevation (ft)"].iloc[-2]))
+
+    expected = extrapolate_elev_storage(df, slope, max_elev)
+    result = extend_curve(df, max_elev, step=0.1, model="slope")
+
+    assert len(result) == len(expected) > len(df)
+    np.testing.assert_allclose(result["Elevation (ft)"], expected["Elevation (ft)"], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(result["Storage (ac-ft)"], expected["Storage (ac-ft)"], rtol=1e-12, atol=1e-6)
+
+
+def test_grid_extension_skips_surveyed_points():
+    df = pd.DataFrame({"Elevation (ft)": [100.0, 101.0], "Storage (ac-ft)": [10.0, 20.0]})
+    result = extend_curve(df, grid=[100.5, 101.0, 101.5, 102.0])
+    assert result["Elevation (ft)"].tolist() == [100.0, 101.0, 101.5, 102.0]
+    assert result["Storage (ac-ft)"].tolist() == [10.0, 20.0, 25.0, 30.0]
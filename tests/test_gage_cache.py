@@ -0,0 +1,89 @@
+"""GageCache keys, appends and truncation of interrupted appends."""
+import os
+from datetime import datetime
+
+import numpy as np
+
+from gage_cache import TIMES_FILE, VALUES_FILE, GageCache
+from gage_series import GageSeries
+from memory_dss import MemoryDss, block_path
+
+PATH = "/Lake Lawtonka near Lawton, OK/07309500/ELEVATION//IR-CENTURY/USGS/"
+
+
+def epoch(*args):
+    return int((datetime(*args) - datetime(1970, 1, 1)).total_seconds())
+
+
+def series(times, values):
+    return GageSeries(np.asarray(times, dtype=np.int64), np.asarray(values, dtype=np.float64))
+
+
+def test_appends_only_newer_values(tmp_path):
+    cache = GageCache(tmp_path / "gages.dss", root=str(tmp_path / "cache"))
+    assert cache.append(PATH, series([900, 0, 900, 1800], [2.0, 1.0, 2.0, 3.0])) == 3
+    # older and already cached times are skipped, nodata is dropped
+    assert cache.append(PATH, series([1800, 2700, 3600], [9.0, -3.4028235e+38, 5.0])) == 1
+    cached = cache.open(PATH)
+    assert np.array_equal(cached.times, [0, 900, 1800, 3600])
+    assert np.array_equal(cached.values, np.float32([1.0, 2.0, 3.0, 5.0]))
+    assert cache.last_time(PATH) == 3600
+    # the D-part doesn't change the key
+    assert cache.path(PATH.replace("//", "/01Jan2000/", 1)) == cache.path(PATH)
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    cache = GageCache(tmp_path / "gages.dss", root=str(tmp_path / "cache"))
+    cache.append(PATH, series([0, 900], [1.0, 2.0]))
+    directory = cache.path(PATH)
+    # an append that wrote the columns but died before committing meta.json
+    with open(os.path.join(directory, TIMES_FILE), "ab") as f:
+        f.write(np.int64([1800, 2700, 3600]).tobytes())
+    with open(os.path.join(directory, VALUES_FILE), "ab") as f:
+        f.write(np.float32([7.0]).tobytes())
+    assert cache.count(PATH) == 2 and len(cache.open(PATH)) == 2
+
+    cache.append(PATH, series([1800], [3.0]))
+    assert os.path.getsize(os.path.join(directory, TIMES_FILE)) == 3 * 8
+    assert os.path.getsize(os.path.join(directory, VALUES_FILE)) == 3 * 4
+    assert np.array_equal(cache.open(PATH, mmap=False).values, np.float32([1.0, 2.0, 3.0]))
+
+    cache.clear(PATH)
+    assert cache.count(PATH) == 0 and cache.last_time(PATH) is None
+    cache.append(PATH, series([60], [4.0]))
+    assert os.path.getsize(os.path.join(directory, TIMES_FILE)) == 8
+    assert np.array_equal(cache.open(PATH).times, [60])
+
+
+def test_same_pathname_in_two_files_dont_collide(tmp_path):
+    root = str(tmp_path / "cache")
+    first, second = GageCache(tmp_path / "a.dss", root), GageCache(tmp_path / "b.dss", root)
+    assert first.path(PATH) != second.path(PATH)
+    first.append(PATH, series([0], [1.0]))
+    assert PATH in first and PATH not in second
+    second.append(PATH, series([0, 900], [5.0, 6.0]))
+    assert np.array_equal(first.open(PATH).values, np.float32([1.0]))
+
+
+def test_update_from_dss_reads_new_values_and_rebuilds_rewritten_records(tmp_path):
+    dss_file = tmp_path / "gages.dss"
+    dss_file.write_bytes(b"1")
+    cache = GageCache(dss_file, root=str(tmp_path / "cache"))
+    block = block_path(PATH, "01Jan2000")
+    times = [epoch(2024, 6, 1), epoch(2024, 6, 1, 0, 15)]
+    dss = MemoryDss({block: (times, [1340.0, 1340.5])})
+    end = datetime(2025, 12, 31)
+    assert cache.update_from_dss(dss, PATH, start=datetime(2024, 1, 1), end=end) == 2
+
+    # readings appended to the record
+    dss.records[block] = (times + [epoch(2025, 2, 1)], [1340.0, 1340.5, 1341.0])
+    dss_file.write_bytes(b"12")
+    assert cache.update_from_dss(dss, PATH, end=end) == 1
+    assert cache.count(PATH) == 3 and not cache.changed(PATH)
+
+    # the record rewritten with different values: the cache starts over from the given start
+    dss.records[block] = ([epoch(2024, 7, 1)], [1338.0])
+    dss_file.write_bytes(b"123")
+    assert cache.changed(PATH)
+    assert cache.update_from_dss(dss, PATH, start=datetime(2024, 1, 1), end=end) == 1
+    assert np.array_equal(cache.open(PATH).times, [epoch(2024, 7, 1)])
@@ -0,0 +1,68 @@
+"""DSS integer times and the GageSeries conversions around them."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from gage_series import JULIAN_1970, GageSeries, dss_time_base, dss_times_to_epoch, epoch_to_dss_times
+from memory_dss import MemoryTs
+
+
+def epoch(*args):
+    return int((datetime(*args) - datetime(1970, 1, 1)).total_seconds())
+
+
+def test_integer_times_round_trip():
+    seconds = np.array([epoch(1900, 1, 1), epoch(1969, 12, 31, 23, 59), 0, epoch(2007, 10, 1, 0, 15),
+                        epoch(2025, 6, 25, 12, 45)], dtype=np.int64)
+    times = epoch_to_dss_times(seconds)
+    assert times.dtype == np.int32
+    # minutes since julian day 0, 31Dec1899
+    assert times[0] == 1440 and times[2] == JULIAN_1970 * 1440
+    assert np.array_equal(dss_times_to_epoch(times), seconds)
+    # second granularity only fits int32 within about 68 years of its base date
+    recent = seconds[-2:]
+    assert np.array_equal(dss_times_to_epoch(epoch_to_dss_times(recent, 1, JULIAN_1970), 1, JULIAN_1970), recent)
+
+
+def test_julian_base_offsets_the_times():
+    # the same instant counted from a base date 10 days later
+    assert dss_times_to_epoch([0], 60, JULIAN_1970 + 10)[0] == 10 * 86400
+    assert dss_times_to_epoch([60], 1, JULIAN_1970)[0] == 60
+
+
+def test_times_dss_cant_store_raise():
+    with pytest.raises(ValueError):
+        epoch_to_dss_times([epoch(2025, 6, 25, 12, 45) + 30])
+    with pytest.raises(ValueError):
+        epoch_to_dss_times([90], granularity=60)
+    with pytest.raises(ValueError):
+        epoch_to_dss_times([epoch(2025, 1, 1)], granularity=1)
+
+
+def test_from_dss_decodes_irregular_times_and_nodata():
+    times = np.array([epoch(2007, 10, 1), epoch(2007, 10, 1, 0, 15), epoch(2007, 10, 1, 0, 30)])
+    ts = MemoryTs(times, [1340.0, -3.4028235e+38, 1340.5])
+    series = GageSeries.from_dss(ts)
+    assert np.array_equal(series.times, times)
+    assert series.values.dtype == np.float32
+    assert np.array_equal(series.mask, [False, True, False])
+    assert len(series.clean()) == 2
+
+
+def test_missing_time_base_raises():
+    ts = MemoryTs([0], [1.0])
+    ts._julian_base_date = None
+    with pytest.raises(ValueError):
+        dss_time_base(ts)
+    with pytest.raises(ValueError):
+        GageSeries.from_dss(ts)
+
+
+def test_pandas_round_trip():
+    series = GageSeries(np.array([0, 900, 1800]), np.array([1.0, np.nan, 3.0]))
+    frame = series.to_pandas()
+    assert str(frame.index.tz) == "UTC"
+    back = GageSeries.from_pandas(frame)
+    assert np.array_equal(back.times, series.times)
+    assert np.array_equal(back.mask, [False, True, False])
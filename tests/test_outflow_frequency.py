@@ -0,0 +1,60 @@
+"""Log-Pearson III moments, skew weighting and the zero-year adjustment of outflow_frequency.py."""
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from outflow_frequency import fit_lp3, frequency_factor, lp3_curve, station_skew_mse
+
+# log10 of the peaks are 1, 2 and 6: mean 3, deviations -2, -1, 3
+PEAKS = [10.0, 100.0, 1e6]
+
+
+def test_moments_of_the_log_peaks():
+    fit = fit_lp3(PEAKS)
+    assert fit["mean"] == pytest.approx(3.0)
+    # sample variance (4 + 1 + 9) / 2
+    assert fit["std"] == pytest.approx(7 ** 0.5)
+    # n * sum(d^3) / ((n - 1)(n - 2) s^3) = 3 * 18 / (2 * 7^1.5)
+    assert fit["skew"] == pytest.approx(27 / 7 ** 1.5)
+    assert fit["skew"] == fit["station_skew"]
+    assert (fit["n"], fit["n_total"], fit["p_nonzero"]) == (3, 3, 1.0)
+    with pytest.raises(ValueError):
+        fit_lp3([0.0, 10.0, 100.0])
+
+
+def test_weighted_skew():
+    station = 27 / 7 ** 1.5
+    mse = station_skew_mse(station, 3)
+    # equal mean square errors weight the two skews equally
+    assert fit_lp3(PEAKS, -0.1, mse)["skew"] == pytest.approx((station - 0.1) / 2)
+    # weights are inverse to the mean square errors
+    fit = fit_lp3(PEAKS, regional_skew=-0.1, regional_skew_mse=0.302)
+    assert fit["skew"] == pytest.approx((0.302 * station - 0.1 * mse) / (0.302 + mse))
+    assert fit["station_skew"] == pytest.approx(station)
+
+
+def test_wilson_hilferty_frequency_factor():
+    # zero skew is the normal quantile
+    assert frequency_factor(0.0, [0.01])[0] == pytest.approx(NormalDist().inv_cdf(0.99))
+    z = NormalDist().inv_cdf(0.99)
+    assert frequency_factor(1.0, [0.01])[0] == pytest.approx(2.0 * ((1.0 + z / 6.0 - 1.0 / 36.0) ** 3 - 1.0))
+    # within 0.01 of the Pearson III tables (3.02330 and 1.21618)
+    assert frequency_factor(1.0, [0.01])[0] == pytest.approx(3.02330, abs=0.01)
+    assert frequency_factor(-0.5, [0.1])[0] == pytest.approx(1.21618, abs=0.01)
+    # the 1% flow of the sample, log Q = mean + K * std
+    fit = fit_lp3(PEAKS)
+    k = 2.0 / fit["skew"] * ((1.0 + fit["skew"] * z / 6.0 - fit["skew"] ** 2 / 36.0) ** 3 - 1.0)
+    assert lp3_curve(fit, aeps=[0.01])["Q (cfs)"][0] == pytest.approx(10 ** (3.0 + k * 7 ** 0.5))
+
+
+def test_zero_years_adjust_the_aep():
+    fit = fit_lp3([0.0] + PEAKS)
+    assert (fit["n"], fit["n_total"], fit["p_nonzero"]) == (3, 4, 0.75)
+    assert fit["mean"] == pytest.approx(3.0)
+    curve = lp3_curve(fit, aeps=[0.9, 0.75, 0.3, 0.01])
+    unconditional = lp3_curve(fit_lp3(PEAKS), aeps=[0.4, 0.01 / 0.75])
+    # the fitted curve is read at p / p_nonzero, no outflow at or above p_nonzero
+    assert np.array_equal(curve["Q (cfs)"][:2], [0.0, 0.0])
+    assert np.allclose(curve["Q (cfs)"][2:], unconditional["Q (cfs)"])
+    assert np.allclose(curve["Return Period (yr)"], [1 / 0.9, 1 / 0.75, 1 / 0.3, 100.0])
@@ -0,0 +1,75 @@
+"""The drop directory standing in for the live gage feed of outflow_updater.py."""
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_convert import load_manifest
+from run_report import report
+
+SITE = "07309500"
+GAGE = f"/Lake Lawtonka near Lawton, OK/{SITE}/ELEVATION//IR-CENTURY/USGS/"
+CSV_NAME = f"{SITE} - Lake Lawtonka near Lawton, OK.csv"
+
+
+def dss_available():
+    # the updater is written against the pydsstools 2.x containers
+    try:
+        from pydsstools.core import TimeSeriesContainer
+        TimeSeriesContainer()
+    except Exception:
+        return False
+    return True
+
+
+pytestmark = pytest.mark.skipif(not dss_available(), reason="needs pydsstools 2.x")
+
+
+def drop_csv(drop_dir, start, periods, name=CSV_NAME):
+    times = pd.date_range(start, periods=periods, freq="15min", tz="UTC")
+    elevations = 1340.0 + np.round(np.sin(np.arange(periods) / 20.0), 2)
+    pd.DataFrame({"datetime": times.strftime("%Y-%m-%d %H:%M:%S+00:00"), "Gage height, feet": elevations}) \
+        .to_csv(os.path.join(drop_dir, name), index=False)
+    return times
+
+
+@pytest.fixture
+def updater(tmp_path):
+    from outflow_updater import OutflowUpdater
+
+    pd.DataFrame({"Elevation (ft NAVD88)": np.arange(1335.0, 1346.0, 0.5),
+                  "Q (CFS)": np.arange(22) * 150.0}).to_csv(tmp_path / "rating.csv", index=False)
+    with open(tmp_path / "manifest.json", "w") as f:
+        json.dump({"dss_file": "gages.dss", "gages": [{"pathname": GAGE, "curve": "rating.csv"}]}, f)
+    drop_dir = tmp_path / "incoming"
+    drop_dir.mkdir()
+    return OutflowUpdater(load_manifest(str(tmp_path / "manifest.json")), str(drop_dir), settle=0.0,
+                          log=lambda message: None)
+
+
+def test_dropped_csv_is_appended_within_a_second(updater):
+    drop_csv(updater.drop_dir, "2025-06-01", 96)
+    start = time.perf_counter()
+    assert updater.poll() == 96
+    assert time.perf_counter() - start < 1.0
+    assert os.listdir(os.path.join(updater.drop_dir, "processed")) == [CSV_NAME]
+
+    # the next download overlaps the last one, only the new readings are appended
+    drop_csv(updater.drop_dir, "2025-06-01 12:00", 96)
+    start = time.perf_counter()
+    assert updater.poll() == 48
+    assert time.perf_counter() - start < 1.0
+    assert updater.gages[SITE]["last"] == int(pd.Timestamp("2025-06-02 11:45").timestamp())
+
+
+def test_report_stays_bounded_while_polling(updater, monkeypatch):
+    monkeypatch.setattr(report, "records", deque(maxlen=10))
+    for day in range(1, 31):
+        drop_csv(updater.drop_dir, f"2025-06-{day:02d}", 96)
+        updater.poll()
+    assert len(report.records) == 10
+    assert report.totals["put_ts"][2] >= 30
@@ -0,0 +1,50 @@
+"""Modified Puls routing on a small synthetic storage-discharge curve."""
+import numpy as np
+
+from puls_routing import FT3_PER_ACFT, PulsReservoir, resample_events
+
+# storage in ac-ft, outflow rising faster than linearly like a spillway
+STORAGE = np.array([0.0, 1000.0, 2000.0, 4000.0, 8000.0, 16000.0])
+OUTFLOW = np.array([0.0, 50.0, 200.0, 800.0, 3000.0, 10000.0])
+
+
+def hydrograph(peak, rise=12, fall=36, base=10.0):
+    # triangular inflow on a base flow, hourly
+    return np.r_[np.linspace(base, peak, rise + 1), np.linspace(peak, base, fall + 1)[1:], np.full(48, base)]
+
+
+def volume_error(reservoir, inflow, result):
+    # inflow - outflow - change in storage over the event, ac-ft
+    dt = reservoir.dt_hours * 3600.0 / FT3_PER_ACFT
+    net = inflow - result.outflow
+    return (net[..., 1:] + net[..., :-1]).sum(axis=-1) * dt / 2 - (result.storage[..., -1] - result.storage[..., 0])
+
+
+def test_mass_balance_and_peak_attenuation():
+    reservoir = PulsReservoir(STORAGE, OUTFLOW, dt_hours=1.0)
+    inflow = hydrograph(5000.0)
+    result = reservoir.route(inflow)
+
+    assert abs(volume_error(reservoir, inflow, result)) < 1e-6 * result.peak_storage
+    assert not result.exceeded
+    # the pool attenuates and delays the peak, which falls on the recession where outflow meets inflow
+    assert result.peak_outflow < inflow.max()
+    peak = np.argmax(result.outflow)
+    assert peak > np.argmax(inflow)
+    assert abs(result.outflow[peak] - inflow[peak]) < 0.05 * result.peak_outflow
+    # every state is on the curve
+    assert np.allclose(result.outflow, np.interp(result.storage, STORAGE, OUTFLOW))
+
+
+def test_events_route_independently():
+    reservoir = PulsReservoir(STORAGE, OUTFLOW, dt_hours=0.5)
+    events = resample_events(np.vstack([hydrograph(p) for p in (1000.0, 5000.0, 20000.0)]), 1.0, 0.5)
+    result = reservoir.route(events)
+    for i, event in enumerate(events):
+        single = reservoir.route(event)
+        assert np.allclose(result.outflow[i], single.outflow) and result.exceeded[i] == single.exceeded
+    assert np.all(np.abs(volume_error(reservoir, events, result)) < 1e-6 * result.peak_storage)
+    assert np.all(np.diff(result.peak_outflow) > 0)
+    # only the largest event goes past the top of the curve, extrapolated along its last segment
+    assert result.exceeded.tolist() == [False, False, True]
+    assert result.peak_storage[2] > STORAGE[-1]
@@ -0,0 +1,60 @@
+"""RatingTable lookups against the original per-reading loop and hand-computed interpolation."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_rating_table import legacy_get_flow_from_elevation, synthetic_rating
+from rating_table import RatingTable
+
+# zero flow up to the sill at 100.0, then Q = 10 * h^2 above it
+TABLE = pd.DataFrame({"Elevation (ft NAVD88)": [99.0, 100.0, 101.0, 102.0, 104.0],
+                      "Q (CFS)": [0.0, 0.0, 10.0, 40.0, 160.0]})
+
+
+@pytest.fixture
+def rating():
+    return RatingTable.from_dataframe(TABLE)
+
+
+def test_exact_elevations_give_the_table_values(rating):
+    elevations = TABLE["Elevation (ft NAVD88)"].to_numpy()
+    for method in ("nearest", "linear", "loglog"):
+        assert np.array_equal(rating.lookup(elevations, method), TABLE["Q (CFS)"].to_numpy())
+
+
+def test_nearest_matches_the_original_loop():
+    table = synthetic_rating()
+    rating = RatingTable.from_dataframe(table)
+    rng = np.random.default_rng(1)
+    readings = np.round(rng.uniform(1340.0, 1360.0, 500), 2)
+    # the original argsort picks either knot on an exact midpoint, keep those out
+    knots = table["Elevation (ft NAVD88)"].to_numpy()
+    midpoints = (knots[1:] + knots[:-1]) / 2
+    readings = readings[np.abs(readings[:, None] - midpoints).min(axis=1) > 1e-9]
+    expected = legacy_get_flow_from_elevation(pd.DataFrame({"value": readings}), table)["Outflow (cfs)"]
+    assert np.array_equal(rating.lookup(readings, "nearest"), expected.to_numpy())
+
+
+def test_between_rows(rating):
+    x = np.array([100.25, 101.5, 103.0])
+    assert np.array_equal(rating.lookup(x, "nearest"), [0.0, 10.0, 40.0])
+    assert np.allclose(rating.lookup(x, "linear"), [2.5, 25.0, 100.0])
+    # head above the 100 ft datum is 1.5 and 3, the power law through the knots gives 10 * h^2
+    # (the first segment starts at zero flow, so it stays linear)
+    assert rating.datum == 100.0
+    assert np.allclose(rating.lookup(x, "loglog"), [2.5, 22.5, 90.0])
+
+
+def test_ties_outside_and_nan(rating):
+    # a midpoint goes to the lower knot, elevations outside the table are clamped
+    assert np.array_equal(rating.lookup([100.5, 103.0, 98.0, 110.0], "nearest"), [0.0, 40.0, 0.0, 160.0])
+    assert np.array_equal(rating.lookup([98.0, 110.0], "linear"), [0.0, 160.0])
+    assert np.isnan(rating.lookup([np.nan], "linear")[0])
+    with pytest.raises(ValueError):
+        rating.lookup([100.0], "cubic")
+
+
+def test_duplicate_elevations_keep_the_first_row():
+    rating = RatingTable([100.0, 101.0, 101.0, np.nan], [0.0, 5.0, 7.0, 1.0])
+    assert np.array_equal(rating.elevations, [100.0, 101.0])
+    assert np.array_equal(rating.values, [0.0, 5.0])
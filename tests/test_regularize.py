@@ -0,0 +1,58 @@
+"""Gap masking of regularize and the windows regularize_record reads."""
+from datetime import datetime
+
+import numpy as np
+
+from gage_series import GageSeries
+from memory_dss import MemoryDss, block_path
+from regularize import regular_grid, regularize
+from stream_convert import record_windows
+
+HOUR = 3600
+PATH = "/LAKE/07309500/RES FLOW-OUT/01Jan2000 - 01Jan2000/IR-CENTURY/USGS/"
+
+
+def test_short_gaps_are_interpolated_and_long_gaps_masked():
+    # readings every 15 minutes, a 45 minute gap after 01:00 and a 3 hour gap after 02:00
+    times = np.array([0, 900, 1800, 2700, 3600, 6300, 7200, 18000], dtype=np.int64)
+    series = GageSeries(times, times / 100.0)
+    regular = regularize(series, "15MIN", max_gap="1HOUR")
+
+    assert np.array_equal(regular.times, regular_grid(0, 18000, 900))
+    inside_short = (regular.times > 3600) & (regular.times < 6300)
+    inside_long = (regular.times > 7200) & (regular.times < 18000)
+    assert not regular.mask[inside_short].any()
+    # the values are linear in time, so interpolation gives them back exactly
+    assert np.allclose(regular.values[~regular.mask], regular.times[~regular.mask] / 100.0)
+    assert regular.mask[inside_long].all()
+    assert not regular.mask[np.isin(regular.times, times)].any()
+
+
+def test_previous_holds_and_no_limit_fills_every_gap():
+    times = np.array([0, 900, 4 * HOUR], dtype=np.int64)
+    series = GageSeries(times, np.array([1.0, 2.0, 3.0]))
+    held = regularize(series, 900, max_gap=None, method="previous")
+    assert not held.mask.any()
+    assert np.array_equal(held.values, np.r_[1.0, np.full(15, 2.0), 3.0])
+
+
+def test_nodata_readings_open_a_gap():
+    times = np.arange(0, 4 * HOUR + 1, 900, dtype=np.int64)
+    values = np.ones(len(times))
+    values[4:12] = -3.4028235e+38
+    regular = regularize(GageSeries(times, values), "15MIN", max_gap="1HOUR")
+    assert regular.mask[4:12].all()
+    assert not regular.mask[:4].any() and not regular.mask[12:].any()
+
+
+def test_windows_cover_the_stored_values_not_the_condensed_dpart():
+    # one IR-CENTURY block: the condensed D-part only names the block start, 01Jan2000
+    first = int((datetime(2007, 10, 1) - datetime(1970, 1, 1)).total_seconds())
+    last = int((datetime(2025, 6, 25, 12) - datetime(1970, 1, 1)).total_seconds())
+    times = np.linspace(first, last, 1000).astype(np.int64) // 900 * 900
+    dss = MemoryDss({block_path(PATH, "01Jan2000"): (times, np.ones(len(times)))})
+
+    windows = record_windows(PATH, dss=dss)
+    assert windows[0][0] == datetime(2007, 10, 1)
+    assert windows[-1][1] == np.datetime64(int(times[-1]), "s").astype(datetime)
+    assert len(windows) == 2025 - 2007 + 1
@@ -4,9 +4,6 @@
 
 # %%
 import pandas as pd
-from pydsstools.heclib.dss import HecDss
-from pydsstools.core import TimeSeriesContainer, UNDEFINED
-import os
 
 # %%
 lawtonka_uh_file = r"C:\Users\MBMcManus\OneDrive - Garver\Documents\Work\Lawton\SSP\B17c_Lawtonka_Inflow.xlsx"
@@ -24,52 +21,20 @@ df_lawtonka
 # in a single DSS file for all lakes and years, 
 # for each unique Return Year, create UH timeseries and put it in the DSS file
 dss_file = "lake_inflow_frequency_events.dss"
-# create the list of times starting at 01JAN2000 00:00 for 14 days, adding zeros after the first 24 values
-times = pd.date_range(start="01JAN2000 00:00", periods=24*14, freq="H").tolist()
+# each event starts at 01JAN2000 00:00 and runs for 14 days of hourly values, with zeros after the UH ordinates
+n_steps = 24*14
 # %%
-with HecDss.Open(dss_file) as dss:
-    for year in df_lawtonka["Return Year"].unique():
-        # filter the dataframe for the current year
-        lawtonka_year_df = df_lawtonka[df_lawtonka["Return Year"] == year]
-        ellsworth_year_df = df_ellsworth[df_ellsworth["Return Year"] == year]
-
-        # create the values list for each lake, add zeros the end of the Q (cfs) values 
-        # until the length matches the times list
-        lawtonka_values = lawtonka_year_df["Q (cfs)"].to_list()
-        lawtonka_values.extend([0] * (len(times) - len(lawtonka_values)))
-
-        ellsworth_values = ellsworth_year_df["Q (cfs)"].to_list()
-        ellsworth_values.extend([0] * (len(times) - len(ellsworth_values)))
-
-        # create a TimeSeriesContainer for Lawtonka
-        tsc_lawtonka = TimeSeriesContainer()
-        tsc_lawtonka.startDateTime = "01JAN2000 00:00:00"  # start time for the time series
-        tsc_lawtonka.pathname = f"/Lake Lawtonka near Lawton, OK/07309500/RES FLOW-IN//1HOUR/SSP {year}yr/"
-        tsc_lawtonka.numberValues = len(times)
-        # tsc_lawtonka.times = times
-        tsc_lawtonka.values = lawtonka_values
-        tsc_lawtonka.units = "cfs"
-        tsc_lawtonka.type = "INST"
-        tsc_lawtonka.interval = 1  # irregular time series
-
-        # delete the pathname if it exists
-        dss.deletePathname(tsc_lawtonka.pathname)
-        # write the TimeSeriesContainer to the DSS file
-        dss.put_ts(tsc_lawtonka)
-
-        # create a TimeSeriesContainer for Ellsworth
-        tsc_ellsworth = TimeSeriesContainer()
-        tsc_ellsworth.pathname = f"/Lake Ellsworth near Elgin, OK/07308990/RES FLOW-IN//1HOUR/SSP {year}yr//"
-        tsc_ellsworth.numberValues = len(times)
-        tsc_ellsworth.startDateTime = "01JAN2000 00:00:00"
-        # tsc_ellsworth.times = ellsworth_year_df["Time"].to_list()
-        tsc_ellsworth.values = ellsworth_values
-        tsc_ellsworth.units = "cfs"
-        tsc_ellsworth.type = "INST"
-        tsc_ellsworth.interval = 1
-
-        # delete the pathname if it exists
-        dss.deletePathname(tsc_ellsworth.pathname)
-        # write the TimeSeriesContainer to the DSS file
-        dss.put_ts(tsc_ellsworth)
+# stack the UH of every Return Year into an (events x timesteps) array, zero padded to 14 days,
+# and write all of them in one DSS session. records that are already in the file with the same values are skipped
+from dss_bulk import pad_events, write_events
+
+for df, pathname_template in [
+    (df_lawtonka, "/Lake Lawtonka near Lawton, OK/07309500/RES FLOW-IN//1HOUR/SSP {year}yr/"),
+    (df_ellsworth, "/Lake Ellsworth near Elgin, OK/07308990/RES FLOW-IN//1HOUR/SSP {year}yr/"),
+]:
+    groups = df.groupby("Return Year", sort=False)["Q (cfs)"]
+    years = df["Return Year"].unique()
+    events = pad_events([groups.get_group(year).to_numpy() for year in years], n_steps)
+    write_events(dss_file, events, pathname_template, [{"year": year} for year in years],
+                 start="01JAN2000 00:00:00", units="cfs", data_type="INST", skip_unchanged=True)
 # %%